@@ -0,0 +1,189 @@
+import asyncio
+import os
+import re
+from collections import Counter, defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from auth import verify_token
+
+# --- Контроль допуска запросов (admission control) ---
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Доля очереди класса, которую может занять один тип пользователя
+ADMISSION_FAIR_SHARE = float(os.getenv("ADMISSION_FAIR_SHARE", "0.5"))
+
+# Класс -> (одновременных запросов, длина очереди, ожидание в очереди, сек, Retry-After, сек)
+DEFAULT_LIMITS = {
+    "auth": (20, 100, 10.0, 1),
+    "read": (50, 200, 5.0, 1),
+    "heavy": (8, 32, 5.0, 5),
+    "ai": (4, 8, 2.0, 10),
+    "moderator": (2, 8, 5.0, 10),
+}
+
+# Правила классификации: первое совпадение по пути; None — без ограничений
+ROUTE_RULES: List[Tuple[re.Pattern, Optional[str]]] = [(re.compile(pattern), route_class) for pattern, route_class in (
+    (r"^/api/health", None),
+    (r"^/api/auth/", "auth"),
+    (r"^/api/ai/|^/api/vacancy_touch/[^/]+/generate_summary$", "ai"),
+    (r"^/api/moderator/", "moderator"),
+    (r"^/api/vacancies/[^/]+/(responses|ranking)$|^/api/vacancies/stats/|^/api/users/stats/|^/api/analytics/"
+     r"|^/api/candidates/search$|^/api/vacancy_responses/company$|^/api/companies/my-vacancies$"
+     r"|^/api/universities/cohorts$|^/api/companies/funnel$", "heavy"),
+    (r"^/api/", "read"),
+)]
+
+
+def parse_limits(spec: str) -> Dict[str, tuple]:
+    """ADMISSION_LIMITS="ai=4/8,heavy=16/64": одновременных запросов/длина очереди по классам."""
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, values = item.partition("=")
+        concurrency, _, queue = values.partition("/")
+        _, default_queue, timeout, retry_after = limits[name]
+        limits[name] = (int(concurrency), int(queue or default_queue), timeout, retry_after)
+    return limits
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class RouteClass:
+    """
+    Бюджет одновременных запросов одного класса маршрутов с очередью.
+    Освободившийся слот передаётся ожидающему того типа пользователя,
+    у которого сейчас меньше всего активных запросов, поэтому всплеск
+    от одного типа не вытесняет остальных. Переполнение очереди — 503,
+    превышение доли очереди одним типом пользователя — 429.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float, retry_after: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._active_by_type: Counter = Counter()
+        self._waiters: Dict[str, Deque[asyncio.Future]] = defaultdict(deque)
+        self.waiting = 0
+        self.counters = Counter()
+
+    def _reject(self, status_code: int, detail: str, counter: str):
+        self.counters[counter] += 1
+        raise Rejected(status_code, detail, self.retry_after)
+
+    async def acquire(self, user_type: str):
+        if self.active < self.concurrency and self.waiting == 0:
+            self.active += 1
+            self._active_by_type[user_type] += 1
+            self.counters["admitted"] += 1
+            return
+        if self.waiting >= self.queue:
+            self._reject(503, "Сервер перегружен, повторите запрос позже", "rejected_overload")
+        if len(self._waiters[user_type]) >= max(1, int(self.queue * ADMISSION_FAIR_SHARE)):
+            self._reject(429, "Слишком много запросов, повторите позже", "rejected_fair_share")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[user_type].append(future)
+        self.waiting += 1
+        self.counters["queued"] += 1
+        try:
+            done, _ = await asyncio.wait([future], timeout=self.timeout)
+        except BaseException:
+            self._abandon(user_type, future)
+            raise
+        if not done:
+            self._abandon(user_type, future)
+            self._reject(503, "Сервер перегружен, повторите запрос позже", "rejected_timeout")
+        self.counters["admitted"] += 1
+
+    def _abandon(self, user_type: str, future: asyncio.Future):
+        if future.done() and not future.cancelled():
+            # Слот уже был передан этому запросу — возвращаем его
+            self.release(user_type)
+            return
+        future.cancel()
+        self._waiters[user_type].remove(future)
+        self.waiting -= 1
+
+    def release(self, user_type: str):
+        self._active_by_type[user_type] -= 1
+        while self.waiting:
+            next_type = min((t for t, q in self._waiters.items() if q), key=lambda t: self._active_by_type[t])
+            future = self._waiters[next_type].popleft()
+            self.waiting -= 1
+            if future.done():
+                continue
+            self._active_by_type[next_type] += 1
+            future.set_result(None)
+            return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {"active": self.active, "waiting": self.waiting, "concurrency": self.concurrency,
+                "queue": self.queue, **self.counters}
+
+
+class AdmissionController:
+    def __init__(self, limits: Dict[str, tuple]):
+        self.classes = {name: RouteClass(name, *values) for name, values in limits.items()}
+
+    def classify(self, path: str) -> Optional[RouteClass]:
+        for pattern, route_class in ROUTE_RULES:
+            if pattern.search(path):
+                return self.classes[route_class] if route_class else None
+        return None
+
+    def stats(self) -> dict:
+        return {name: route_class.stats() for name, route_class in self.classes.items()}
+
+
+def _user_type(scope) -> str:
+    """Тип пользователя из JWT (те же claims, что и в get_current_user); без токена — anonymous."""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            header = value.decode("latin-1")
+            if header.startswith("Bearer "):
+                try:
+                    return verify_token(header.split(" ")[1]).get("user_type") or "anonymous"
+                except Exception:
+                    # Битый токен — просто анонимный запрос; 401 вернёт сам эндпоинт, если нужен вход
+                    pass
+            break
+    return "anonymous"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: ограничивает запросы к /api по классам маршрутов ещё до обработки."""
+
+    def __init__(self, app, controller: "AdmissionController" = None):
+        self.app = app
+        self.controller = controller or admission
+
+    async def __call__(self, scope, receive, send):
+        route_class = self.controller.classify(scope["path"]) if scope["type"] == "http" and ADMISSION_ENABLED else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+        user_type = _user_type(scope)
+        try:
+            await route_class.acquire(user_type)
+        except Rejected as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code,
+                                    headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release(user_type)
+
+
+admission = AdmissionController(parse_limits(os.getenv("ADMISSION_LIMITS", "")))
@@ -1,26 +1,59 @@
-from cryptography.hazmat.backends.openssl import backend
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from enum import Enum
 import json
+import os
+import re
+import sys
+import time
+import uuid
 
-from config import supabase, openai_client, logger
+from config import supabase, openai_client, clients, logger
 from models import (
     StudentProfile, Resume, Vacancy, CompanyProfile, UniversityProfile,
-    Appointment, ChatMessage, AIQuery, ResumeUpdate, VacancyTouch, VacancyTouchCreate
+    Appointment, ChatMessage, AIQuery, ResumeUpdate, VacancyTouch, VacancyTouchCreate, VacancyTouchStatusUpdate,
+    ModerationBatch
 )
-from auth import get_current_user, get_current_moderator
+from auth import get_current_user, get_current_moderator, get_optional_user
+from ranking import RANKING_SELECT, ranking_cache, top_n
+from responses import FastJSONResponse
+from search import search_index
+from feed import FEED_SIZE, feed_store, student_terms
+from jobs import job_queue, PermanentJobError, PRIORITY_LOW
+from repository import repository
+from batching import chat_messages_writer, vacancy_touch_writer
+from singleflight import flights, flight_key
+from admission import admission
+from usage import usage_ledger, usage_tokens
+from skills import skill_dictionary, SUGGEST_MAX
+from funnel import funnel, conversion, empty_counts, FUNNEL_STATUSES
+from moderation import moderation_queue, split_ids, MODERATION_BATCH_MAX, MODERATION_PAGE_MAX, IN_CHUNK
+from scheduling import scheduler, resource_key, student_key, to_utc, MAX_RANGE_DAYS
 
 router = APIRouter(prefix="/api", tags=["API"])
 
 # --- Health Check ---
 @router.get("/health")
 async def health_check():
-    return {"status": "healthy", "supabase_connected": supabase is not None, "openai_configured": openai_client is not None}
+    return {"status": "healthy", "supabase_connected": bool(supabase), "openai_configured": bool(openai_client)}
+
+@router.get("/health/pools")
+async def health_pools():
+    stats = clients.pool_stats()
+    stats["write_batches"] = {"chat_messages": chat_messages_writer.stats(), "vacancy_touch": vacancy_touch_writer.stats()}
+    stats["single_flight"] = flights.stats()
+    stats["admission"] = admission.stats()
+    # AI-модули и аналитика вузов импортируются лениво: пока к ним не обращались, статистики нет
+    assistant_module = sys.modules.get("assistant")
+    stats["assistant"] = assistant_module.assistant.stats() if assistant_module else None
+    cohorts_module = sys.modules.get("cohorts")
+    stats["cohorts"] = cohorts_module.cohort_engine.stats() if cohorts_module else None
+    return stats
 
 # --- Поиск Кандидатов для Работодателей ---
-@router.get("/candidates/search")
+@router.get("/candidates/search", response_class=FastJSONResponse)
 async def search_candidates(
     current_user: dict = Depends(get_current_user),
     skills: Optional[str] = Query(None, description="Навыки через запятую, например: Python,SQL,FastAPI"),
@@ -36,7 +69,7 @@ async def search_candidates(
     try:
         query = supabase.table("student_profiles").select("*, users(full_name, email)")
         if skills:
-            skills_list = [skill.strip() for skill in skills.split(',')]
+            skills_list = skill_dictionary.normalize(skills.split(','))
             query = query.cs("skills", skills_list)
         if major:
             query = query.ilike("major", f"%{major}%")
@@ -48,7 +81,7 @@ async def search_candidates(
             query = query.lte("graduation_year", grad_year_to)
 
         candidates_response = query.execute()
-        if not candidates_response.data: return []
+        if not candidates_response.data: return FastJSONResponse([])
         
         candidates = candidates_response.data
         
@@ -57,7 +90,7 @@ async def search_candidates(
 
         if not company_vacancy_ids:
             for candidate in candidates: candidate['my_company_responses'] = []
-            return candidates
+            return FastJSONResponse(candidates)
 
         candidate_ids = [c['user_id'] for c in candidates]
         
@@ -73,116 +106,176 @@ async def search_candidates(
             })
         for candidate in candidates:
             candidate['my_company_responses'] = responses_map.get(candidate['user_id'], [])
-        return candidates
+        return FastJSONResponse(candidates)
     except Exception as e:
         logger.error(f"Candidate search error for company {company_user_id}: {e}")
         raise HTTPException(status_code=500, detail="An error occurred during candidate search.")
 
-@router.post("/vacancy_touch/{touch_id}/generate_summary", dependencies=[Depends(get_current_user)])
+@router.post("/vacancy_touch/{touch_id}/generate_summary", dependencies=[Depends(get_current_user)], status_code=202)
 async def generate_ai_summary(touch_id: str, current_user: dict = Depends(get_current_user)):
+    """Ставит AI-анализ отклика в очередь; статус — GET /api/jobs/{job_id}."""
     if not supabase or not openai_client:
         raise HTTPException(status_code=500, detail="Services not configured")
 
     company_user_id = current_user.get("sub")
 
     try:
-        # 1. Получаем отклик и связанные с ним данные, проверяя права доступа
-        touch_req = supabase.table("vacancy_touch") \
-            .select("*, vacancies(*), resumes(*)") \
-            .eq("id", touch_id) \
-            .single() \
-            .execute()
-
+        touch_req = supabase.table("vacancy_touch").select("id, vacancies(company_id)").eq("id", touch_id).execute()
         if not touch_req.data:
             raise HTTPException(status_code=404, detail="Vacancy touch not found")
-
-        touch_data = touch_req.data
-        vacancy_data = touch_data.get("vacancies")
-        resume_data = touch_data.get("resumes")
-
-        if not vacancy_data or not resume_data:
-            raise HTTPException(status_code=400, detail="Missing vacancy or resume data for analysis.")
-
-        if vacancy_data.get("company_id") != company_user_id:
+        if (touch_req.data[0].get("vacancies") or {}).get("company_id") != company_user_id:
             raise HTTPException(status_code=403, detail="Access denied: you do not own this vacancy")
+        if usage_ledger.over_quota(company_user_id):
+            raise HTTPException(status_code=429, detail="Месячный лимит AI-анализа исчерпан")
 
-        # 2. Формируем промпт для AI
-        prompt = f"""
-        Проанализируй отклик студента на вакансию.
-
-        **Информация о вакансии:**
-        - Название: {vacancy_data.get('title', 'N/A')}
-        - Описание: {vacancy_data.get('description', 'N/A')}
-        - Требования: {vacancy_data.get('requirements', 'N/A')}
-
-        **Информация о кандидате из резюме:**
-        - Заголовок резюме: {resume_data.get('title', 'N/A')}
-        - Образование: {resume_data.get('education', 'N/A')}
-        - Опыт работы: {resume_data.get('experience', 'N/A')}
-        - Навыки: {', '.join(resume_data.get('skills', []))}
-        - Языки: {', '.join(resume_data.get('languages', []))}
-        - Достижения: {resume_data.get('achievements', 'N/A')}
-
-        **Сопроводительная информация от студента:**
-        {touch_data.get('additional_info', 'Кандидат не предоставил дополнительной информации.')}
-
-        **Твоя задача:**
-        Верни JSON объект со следующими полями:
-        1. "ai_summary": Краткое (3-4 предложения) и нейтральное резюме по кандидату. Опиши, насколько его опыт и навыки соответствуют требованиям вакансии.
-        2. "meets_criteria_rating": Оценка от 1 до 100, насколько кандидат соответствует **техническим требованиям** вакансии. Оценивай строго по совпадению навыков и опыта.
-        3. "motivation_rating": Оценка от 1 до 100, насколько кандидат кажется мотивированным, основываясь на его сопроводительной информации и достижениях.
-
-        Пример JSON ответа:
-        {{
-          "ai_summary": "Студент с опытом в Python и SQL, что частично соответствует требованиям. Проекты в портфолио релевантны, но не хватает опыта работы с FastAPI. Мотивационное письмо демонстрирует явный интерес к задачам компании.",
-          "meets_criteria_rating": 75,
-          "motivation_rating": 85
-        }}
-        """
-
-        # 3. Отправляем запрос в OpenAI
-        completion = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Ты — опытный HR-аналитик, который помогает компаниям оценивать кандидатов. Твой ответ всегда должен быть в формате JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5
-        )
-
-        response_content = completion.choices[0].message.content
-        
-        # 4. Парсим ответ и обновляем БД
-        try:
-            ai_data = json.loads(response_content)
-            update_payload = {
-                "ai_summary": ai_data.get("ai_summary"),
-                "meets_criteria_rating": ai_data.get("meets_criteria_rating"),
-                "motivation_rating": ai_data.get("motivation_rating"),
-                "updated_at": datetime.utcnow().isoformat()
-            }
-            
-            # Обновляем запись в vacancy_touch
-            updated_touch_req = supabase.table("vacancy_touch") \
-                .update(update_payload) \
-                .eq("id", touch_id) \
-                .execute()
-            
-            if not updated_touch_req.data:
-                 raise HTTPException(status_code=500, detail="Failed to save AI analysis.")
-
-            return updated_touch_req.data[0]
-
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.error(f"Failed to parse AI response: {e}\nResponse: {response_content}")
-            raise HTTPException(status_code=500, detail="Failed to parse AI response.")
+        job_id = job_queue.enqueue("ai_summary", {"touch_id": touch_id, "company_id": company_user_id}, owner_id=company_user_id)
+        return {"job_id": job_id, "status": "queued"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Generate AI summary error for touch {touch_id}: {e}")
+        logger.error(f"Enqueue AI summary error for touch {touch_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+AI_SUMMARY_MODEL = os.getenv("AI_SUMMARY_MODEL", "gpt-3.5-turbo")
+AI_SUMMARY_PROMPT_TOKENS = int(os.getenv("AI_SUMMARY_PROMPT_TOKENS", "1500"))
+AI_SUMMARY_MAX_TOKENS = int(os.getenv("AI_SUMMARY_MAX_TOKENS", "300"))
+
+AI_SUMMARY_PROMPT = """
+Проанализируй отклик студента на вакансию.
+
+**Информация о вакансии:**
+- Название: {title}
+- Описание: {description}
+- Требования: {requirements}
+
+**Информация о кандидате из резюме:**
+- Заголовок резюме: {resume_title}
+- Образование: {education}
+- Опыт работы: {experience}
+- Навыки: {skills}
+- Языки: {languages}
+- Достижения: {achievements}
+
+**Сопроводительная информация от студента:**
+{additional_info}
+
+**Твоя задача:**
+Верни JSON объект со следующими полями:
+1. "ai_summary": Краткое (3-4 предложения) и нейтральное резюме по кандидату. Опиши, насколько его опыт и навыки соответствуют требованиям вакансии.
+2. "meets_criteria_rating": Оценка от 1 до 100, насколько кандидат соответствует **техническим требованиям** вакансии. Оценивай строго по совпадению навыков и опыта.
+3. "motivation_rating": Оценка от 1 до 100, насколько кандидат кажется мотивированным, основываясь на его сопроводительной информации и достижениях.
+
+Пример JSON ответа:
+{{
+  "ai_summary": "Студент с опытом в Python и SQL, что частично соответствует требованиям. Проекты в портфолио релевантны, но не хватает опыта работы с FastAPI. Мотивационное письмо демонстрирует явный интерес к задачам компании.",
+  "meets_criteria_rating": 75,
+  "motivation_rating": 85
+}}
+"""
+
+
+def _rating(value) -> Optional[int]:
+    """Оценка модели в integer-колонку: первое число ("85.0", "85/100" -> 85), вне 1..100 — None."""
+    match = re.search(r"-?\d+(?:\.\d+)?", str(value)) if value is not None and not isinstance(value, bool) else None
+    if not match: return None
+    rating = int(round(float(match.group())))
+    return rating if 1 <= rating <= 100 else None
+
+
+@job_queue.handler("ai_summary")
+def _ai_summary_job(payload: dict) -> dict:
+    """Фоновая задача: AI-анализ отклика и сохранение оценок."""
+    touch_id = payload["touch_id"]
+
+    # 1. Получаем отклик и связанные с ним данные
+    touch_req = supabase.table("vacancy_touch") \
+        .select("*, vacancies(*), resumes(*)") \
+        .eq("id", touch_id) \
+        .execute()
+
+    if not touch_req.data:
+        raise PermanentJobError("Vacancy touch not found")
+
+    touch_data = touch_req.data[0]
+    vacancy_data = touch_data.get("vacancies")
+    resume_data = touch_data.get("resumes")
+
+    if not vacancy_data or not resume_data:
+        raise PermanentJobError("Missing vacancy or resume data for analysis.")
+
+    if vacancy_data.get("company_id") != payload["company_id"]:
+        raise PermanentJobError("Access denied: you do not own this vacancy")
+
+    if usage_ledger.over_quota(payload["company_id"]):
+        raise PermanentJobError("Monthly AI token quota exceeded")
+
+    # 2. Формируем промпт для AI: поля сжимаются и урезаются по приоритету до бюджета токенов
+    from prompts import PromptField, count_tokens, fit_fields
+    fields = fit_fields([
+        PromptField("title", vacancy_data.get("title") or "N/A", 100),
+        PromptField("requirements", vacancy_data.get("requirements") or "N/A", 90, min_tokens=150),
+        PromptField("description", vacancy_data.get("description") or "N/A", 60, min_tokens=80),
+        PromptField("resume_title", resume_data.get("title") or "N/A", 95),
+        PromptField("skills", ", ".join(resume_data.get("skills") or []), 85, min_tokens=60),
+        PromptField("experience", resume_data.get("experience") or "N/A", 80, min_tokens=150),
+        PromptField("additional_info", touch_data.get("additional_info") or "Кандидат не предоставил дополнительной информации.", 75, min_tokens=100),
+        PromptField("education", resume_data.get("education") or "N/A", 70, min_tokens=60),
+        PromptField("languages", ", ".join(resume_data.get("languages") or []), 65),
+        PromptField("achievements", resume_data.get("achievements") or "N/A", 50),
+    ], AI_SUMMARY_PROMPT_TOKENS)
+    prompt = AI_SUMMARY_PROMPT.format(**fields)
+    messages = [
+        {"role": "system", "content": "Ты — опытный HR-аналитик, который помогает компаниям оценивать кандидатов. Твой ответ всегда должен быть в формате JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+    # 3. Отправляем запрос в OpenAI и записываем расход токенов
+    started = time.monotonic()
+    completion = openai_client.chat.completions.create(
+        model=AI_SUMMARY_MODEL,
+        messages=messages,
+        temperature=0.5,
+        max_tokens=AI_SUMMARY_MAX_TOKENS,
+    )
+    tokens = usage_tokens(completion, prompt_estimate=sum(count_tokens(m["content"]) for m in messages))
+    usage_ledger.record(payload["company_id"], "ai_summary", AI_SUMMARY_MODEL, ref_id=touch_id,
+                        latency_ms=int((time.monotonic() - started) * 1000), **tokens)
+
+    response_content = completion.choices[0].message.content
+
+    # 4. Парсим ответ и обновляем БД (при невалидном JSON задача будет повторена)
+    try:
+        ai_data = json.loads(response_content)
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse AI response: {e}\nResponse: {response_content}")
+        raise ValueError("Failed to parse AI response.")
+
+    update_payload = {
+        "ai_summary": ai_data.get("ai_summary"),
+        "meets_criteria_rating": _rating(ai_data.get("meets_criteria_rating")),
+        "motivation_rating": _rating(ai_data.get("motivation_rating")),
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+    # Обновляем запись в vacancy_touch
+    updated_touch_req = supabase.table("vacancy_touch") \
+        .update(update_payload) \
+        .eq("id", touch_id) \
+        .execute()
+
+    if not updated_touch_req.data:
+        raise RuntimeError("Failed to save AI analysis.")
+
+    # Инкрементально обновляем рейтинг кандидатов по вакансии
+    ranking_cache.update_touch(
+        vacancy_data.get("id") or touch_data.get("vacancy_id"),
+        {**updated_touch_req.data[0], "resumes": resume_data},
+    )
+
+    return updated_touch_req.data[0]
+
 # --- Профили студентов ---
 @router.post("/students/profile")
 async def create_student_profile(profile: StudentProfile, current_user: dict = Depends(get_current_user)):
@@ -191,7 +284,10 @@ async def create_student_profile(profile: StudentProfile, current_user: dict = D
     if current_user.get("sub") != profile.user_id: raise HTTPException(status_code=403, detail="Not authorized")
     try:
         data = profile.dict(); data["created_at"] = datetime.utcnow().isoformat()
+        data["skills"] = skill_dictionary.normalize(data.get("skills"))
         result = supabase.table("student_profiles").insert(data).execute()
+        repository.refresh("student_profiles", profile.user_id)
+        job_queue.enqueue("student_feed", {"student_id": profile.user_id}, priority=PRIORITY_LOW)
         return result.data[0] if result.data else {}
     except Exception as e: logger.error(f"Create student profile error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
@@ -199,11 +295,11 @@ async def create_student_profile(profile: StudentProfile, current_user: dict = D
 @router.get("/students/profile/{user_id}")
 async def get_student_profile(user_id: str):
     # ... (код эндпоинта)
-    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if not repository: raise HTTPException(status_code=500, detail="Database not configured")
     try:
-        result = supabase.table("student_profiles").select("*, users(full_name, email)").eq("user_id", user_id).execute()
-        if not result.data: raise HTTPException(status_code=404, detail="Profile not found")
-        return result.data[0]
+        profile = repository.get_profile("student_profiles", user_id)
+        if not profile: raise HTTPException(status_code=404, detail="Profile not found")
+        return profile
     except Exception as e: logger.error(f"Get student profile error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -214,7 +310,10 @@ async def update_student_profile(user_id: str, profile: StudentProfile, current_
     if current_user.get("sub") != user_id: raise HTTPException(status_code=403, detail="Not authorized")
     try:
         data = profile.dict(); data["updated_at"] = datetime.utcnow().isoformat()
+        data["skills"] = skill_dictionary.normalize(data.get("skills"))
         result = supabase.table("student_profiles").update(data).eq("user_id", user_id).execute()
+        repository.refresh("student_profiles", user_id)
+        job_queue.enqueue("student_feed", {"student_id": user_id}, priority=PRIORITY_LOW)
         return result.data[0] if result.data else {}
     except Exception as e: logger.error(f"Update student profile error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
@@ -226,7 +325,9 @@ async def create_resume(resume: Resume, current_user: dict = Depends(get_current
     if current_user.get("sub") != resume.student_id: raise HTTPException(status_code=403, detail="Not authorized")
     try:
         data = resume.dict(); data["created_at"] = datetime.utcnow().isoformat()
+        data["skills"] = skill_dictionary.normalize(data.get("skills"))
         result = supabase.table("resumes").insert(data).execute()
+        job_queue.enqueue("student_feed", {"student_id": resume.student_id}, priority=PRIORITY_LOW)
         return result.data[0] if result.data else {}
     except Exception as e: logger.error(f"Create resume error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
@@ -259,6 +360,8 @@ async def update_resume(resume_id: str, resume_data: ResumeUpdate, current_user:
             raise HTTPException(status_code=400, detail="No fields to update provided")
 
         update_data['updated_at'] = datetime.utcnow().isoformat()
+        if update_data.get('skills') is not None:
+            update_data['skills'] = skill_dictionary.normalize(update_data['skills'])
 
         # 3. Выполняем обновление
         result = supabase.table("resumes").update(update_data).eq("id", resume_id).execute()
@@ -266,6 +369,7 @@ async def update_resume(resume_id: str, resume_data: ResumeUpdate, current_user:
         if not result.data:
             raise HTTPException(status_code=404, detail="Update failed, resume not found after update")
 
+        job_queue.enqueue("student_feed", {"student_id": current_user.get('sub')}, priority=PRIORITY_LOW)
         return result.data[0]
     except HTTPException:
         # Просто перебрасываем HTTP исключения, чтобы FastAPI их обработал
@@ -283,6 +387,46 @@ async def get_student_resumes(student_id: str):
         return supabase.table("resumes").select("*").eq("student_id", student_id).execute().data
     except Exception as e: logger.error(f"Get resumes error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
+# --- Навыки ---
+@router.get("/skills/suggest")
+async def suggest_skills(q: str = Query(..., min_length=1, max_length=50), limit: int = Query(10, ge=1, le=SUGGEST_MAX)):
+    """Автодополнение навыков по префиксу из справочника в памяти, без обращения к базе."""
+    return skill_dictionary.suggest(q, limit)
+
+
+SKILLS_PAGE_SIZE = 500
+
+
+@job_queue.handler("skills_canonicalize")
+def _canonicalize_skills(payload: dict) -> dict:
+    """Фоновая задача: приводит навыки уже сохранённых профилей и резюме к каноническим названиям."""
+    updated, students = {"student_profiles": 0, "resumes": 0}, set()
+    for table, key in (("student_profiles", "user_id"), ("resumes", "id")):
+        columns = "user_id, skills" if table == "student_profiles" else "id, student_id, skills"
+        start = 0
+        while True:
+            page = supabase.table(table).select(columns).order(key).range(start, start + SKILLS_PAGE_SIZE - 1).execute().data
+            for row in page:
+                skills = skill_dictionary.normalize(row.get("skills"))
+                if skills == (row.get("skills") or []):
+                    continue
+                supabase.table(table).update({"skills": skills}).eq(key, row[key]).execute()
+                updated[table] += 1
+                students.add(row.get("student_id") or row.get("user_id"))
+                if table == "student_profiles": repository.refresh(table, row[key])
+            if len(page) < SKILLS_PAGE_SIZE: break
+            start += SKILLS_PAGE_SIZE
+    for student_id in students:
+        job_queue.enqueue("student_feed", {"student_id": student_id}, priority=PRIORITY_LOW)
+    return updated
+
+
+@router.post("/moderator/skills/canonicalize", status_code=202)
+async def canonicalize_skills(current_user: dict = Depends(get_current_moderator)):
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    job_id = job_queue.enqueue("skills_canonicalize", {}, owner_id=current_user.get("sub"), priority=PRIORITY_LOW)
+    return {"job_id": job_id, "status": "queued"}
+
 # --- Эндпоинты для Компаний ---
 @router.post("/companies/profile")
 async def create_company_profile(profile: CompanyProfile, current_user: dict = Depends(get_current_user)):
@@ -292,6 +436,7 @@ async def create_company_profile(profile: CompanyProfile, current_user: dict = D
     try:
         data = profile.dict(); data["created_at"] = datetime.utcnow().isoformat()
         result = supabase.table("company_profiles").insert(data).execute()
+        repository.refresh("company_profiles", profile.user_id)
         return result.data[0] if result.data else {}
     except Exception as e: logger.error(f"Create company profile error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
@@ -299,11 +444,11 @@ async def create_company_profile(profile: CompanyProfile, current_user: dict = D
 @router.get("/companies/profile/{user_id}")
 async def get_company_profile(user_id: str):
     # ... (код эндпоинта)
-    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if not repository: raise HTTPException(status_code=500, detail="Database not configured")
     try:
-        result = supabase.table("company_profiles").select("*").eq("user_id", user_id).execute()
-        if not result.data: raise HTTPException(status_code=404, detail="Profile not found")
-        return result.data[0]
+        profile = repository.get_profile("company_profiles", user_id)
+        if not profile: raise HTTPException(status_code=404, detail="Profile not found")
+        return profile
     except Exception as e: logger.error(f"Get company profile error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -317,28 +462,18 @@ async def get_my_company_vacancies(current_user: dict = Depends(get_current_user
     company_user_id = current_user.get("sub")
 
     try:
-        # ИЗМЕНЕНИЕ №1:
-        # Обращаемся к правильной таблице 'vacancy_touch' для подсчета откликов
         vacancies_data = supabase.table("vacancies") \
-            .select("*, vacancy_touch(count)") \
+            .select("*") \
             .eq("company_id", company_user_id) \
             .order("created_at", desc=True) \
             .execute().data
 
-        # Обрабатываем результат для удобства фронтенда
+        # Число откликов — из готовых счётчиков воронки, без подзапроса count на каждую вакансию
+        counters = await run_in_threadpool(funnel.for_company, company_user_id)
         for vacancy in vacancies_data:
-            response_count = 0
-
-            # ИЗМЕНЕНИЕ №2:
-            # Проверяем ключ 'vacancy_touch' в ответе от Supabase
-            if 'vacancy_touch' in vacancy and vacancy['vacancy_touch']:
-                response_count = vacancy['vacancy_touch'][0]['count']
-
-            vacancy['response_count'] = response_count
-
-            # ИЗМЕНЕНИЕ №3:
-            # Удаляем старую вложенную структуру 'vacancy_touch'
-            del vacancy['vacancy_touch']
+            counts = counters.get(vacancy['id']) or empty_counts()
+            vacancy['response_count'] = counts['total']
+            vacancy['funnel'] = {status: counts[status] for status in FUNNEL_STATUSES}
 
         return vacancies_data
 
@@ -346,6 +481,29 @@ async def get_my_company_vacancies(current_user: dict = Depends(get_current_user
         logger.error(f"Get my vacancies error for user {company_user_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/companies/funnel", response_class=FastJSONResponse)
+async def get_company_funnel(days: int = Query(30, ge=1, le=365), vacancy_id: Optional[str] = None,
+                             current_user: dict = Depends(get_current_user)):
+    """Воронка откликов компании (или одной её вакансии): этапы с конверсией и переходы по дням."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if current_user.get("user_type") != 'company': raise HTTPException(status_code=403, detail="Access denied: for company accounts only")
+    company_user_id = current_user.get("sub")
+    try:
+        counters = await run_in_threadpool(funnel.for_company, company_user_id)
+        if vacancy_id:
+            counters = {vacancy_id: counters[vacancy_id]} if vacancy_id in counters else {}
+        totals = funnel.totals(counters.values())
+        daily = await run_in_threadpool(funnel.daily, company_user_id, date.today() - timedelta(days=days - 1), vacancy_id)
+        return FastJSONResponse({
+            "totals": totals,
+            "stages": conversion(totals),
+            "vacancies": {vid: {"counts": {key: row[key] for key in totals}, "stages": conversion(row)} for vid, row in counters.items()},
+            "daily": daily,
+        })
+    except Exception as e:
+        logger.error(f"Get funnel error for company {company_user_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- Вакансии ---
 @router.post("/vacancies")
 async def create_vacancy(vacancy: Vacancy, current_user: dict = Depends(get_current_user)):
@@ -359,29 +517,158 @@ async def create_vacancy(vacancy: Vacancy, current_user: dict = Depends(get_curr
         result = supabase.table("vacancies").insert(data).execute()
         if not result.data: raise HTTPException(status_code=500, detail="Failed to create vacancy")
         created_vacancy = result.data[0]
+        repository.refresh("vacancies", created_vacancy["id"])
+        # Новая вакансия на модерации в поиск не попадает; индекс обновится при одобрении
+        search_index.upsert(created_vacancy)
         feedback_message = {"type": "popup", "title": "Вакансия отправлена на модерацию!", "text": f"Спасибо! Ваша вакансия «{created_vacancy.get('title')}» успешно создана и будет опубликована после проверки модератором."}
         return {"data": created_vacancy, "feedback_message": feedback_message}
     except Exception as e: logger.error(f"Create vacancy error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/vacancies")
+@router.get("/vacancies", response_class=FastJSONResponse)
 async def get_vacancies(employment_type: Optional[str] = None, is_internship: Optional[bool] = None, limit: int = 50):
     # ... (код эндпоинта)
-    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if not repository: raise HTTPException(status_code=500, detail="Database not configured")
     try:
-        query = supabase.table("vacancies").select("*, company_profiles(company_name)").eq("status", "active")
-        if employment_type: query = query.eq("employment_type", employment_type)
-        if is_internship is not None: query = query.eq("is_internship", is_internship)
-        return query.limit(limit).execute().data
+        key = flight_key("vacancies", employment_type=employment_type, is_internship=is_internship, limit=limit)
+        return FastJSONResponse(await flights.do(key, repository.list_vacancies, employment_type, is_internship, limit))
     except Exception as e: logger.error(f"Get vacancies error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
+# --- Поиск по вакансиям ---
+SEARCH_SELECT = "*, company_profiles(company_name)"
+SEARCH_PAGE_SIZE = 1000
+
+
+def _ensure_search_index():
+    """Загружает активные вакансии в индекс при первом поиске и дочитывает изменённые другими воркерами."""
+    if not search_index.loaded:
+        vacancies, start = [], 0
+        while True:
+            page = supabase.table("vacancies").select(SEARCH_SELECT).eq("status", "active") \
+                .range(start, start + SEARCH_PAGE_SIZE - 1).execute().data
+            vacancies.extend(page)
+            if len(page) < SEARCH_PAGE_SIZE: break
+            start += SEARCH_PAGE_SIZE
+        search_index.load(vacancies)
+        logger.info(f"Vacancy search index loaded: {len(search_index)} active vacancies")
+        return
+    stale = search_index.take_stale()
+    if stale:
+        fresh = {v["id"]: v for v in supabase.table("vacancies").select(SEARCH_SELECT).in_("id", list(stale)).execute().data}
+        for vacancy_id in stale:
+            if vacancy_id in fresh: search_index.upsert(fresh[vacancy_id], broadcast=False)
+            else: search_index.remove(vacancy_id, broadcast=False)
+
+
+async def _search_index_ready():
+    """_ensure_search_index из async-обработчиков: загрузка и дочитывание идут в пуле потоков, одной на воркер."""
+    if not search_index.fresh:
+        await flights.do(flight_key("search_index"), _ensure_search_index)
+
+
+def _index_vacancy(vacancy_id: str):
+    """Перечитывает вакансию вместе с компанией и обновляет поисковый индекс."""
+    if not search_index.loaded: return
+    result = supabase.table("vacancies").select(SEARCH_SELECT).eq("id", vacancy_id).execute()
+    if result.data: search_index.upsert(result.data[0])
+    else: search_index.remove(vacancy_id)
+
+
+@router.get("/vacancies/search", response_class=FastJSONResponse)
+async def search_vacancies(
+        q: Optional[str] = Query(None, description="Текстовый запрос по названию, описанию и требованиям"),
+        location: Optional[str] = None,
+        employment_type: Optional[str] = None,
+        is_internship: Optional[bool] = None,
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0),
+):
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    try:
+        await _search_index_ready()
+        filters = {"location": location, "employment_type": employment_type, "is_internship": is_internship}
+        return FastJSONResponse(search_index.search(q, filters, limit=limit, offset=offset))
+    except Exception as e: logger.error(f"Search vacancies error: {e}"); raise HTTPException(status_code=400, detail=str(e))
+
+# --- Персональная лента вакансий ---
+def _save_feeds(feeds: list):
+    if feeds: supabase.table("student_feeds").upsert(feeds).execute()
+
+
+def _build_student_feed(student_id: str) -> dict:
+    _ensure_search_index()
+    profile = supabase.table("student_profiles").select("skills, major").eq("user_id", student_id).execute().data
+    resumes = supabase.table("resumes").select("title, skills").eq("student_id", student_id).execute().data
+    feed = feed_store.build(student_id, student_terms(profile[0] if profile else None, resumes or []))
+    _save_feeds([feed])
+    return feed
+
+
+def _load_student_feed(student_id: str) -> dict:
+    """Лента из student_feeds; если её ещё нет — ставит сборку в очередь и отдаёт пустую, её добьют свежими вакансиями."""
+    stored = supabase.table("student_feeds").select("*").eq("student_id", student_id).execute().data
+    if stored: return feed_store.put(student_id, stored[0]["terms"], stored[0]["items"], stored[0]["updated_at"], broadcast=False)
+    job_queue.enqueue("student_feed", {"student_id": student_id})
+    # Заглушка до окончания сборки, чтобы повторные запросы не ставили новые задачи
+    return feed_store.put(student_id, [], [], broadcast=False)
+
+
+@job_queue.handler("student_feed")
+def _rebuild_student_feed(payload: dict):
+    """Фоновая задача: пересчёт ленты после изменения профиля или резюме."""
+    _build_student_feed(payload["student_id"])
+
+
+@job_queue.handler("vacancy_feeds")
+def _update_feeds_for_vacancy(payload: dict) -> dict:
+    """Фоновая задача: встраивает одобренные вакансии в ленты или убирает снятые."""
+    vacancy_ids, approved = payload.get("vacancy_ids") or [payload["vacancy_id"]], payload["approved"]
+    _ensure_search_index()
+    if not feed_store.loaded:
+        rows, start = [], 0
+        while True:
+            page = supabase.table("student_feeds").select("*").range(start, start + SEARCH_PAGE_SIZE - 1).execute().data
+            rows.extend(page)
+            if len(page) < SEARCH_PAGE_SIZE: break
+            start += SEARCH_PAGE_SIZE
+        feed_store.load(rows)
+    changed = {}
+    for vacancy_id in vacancy_ids:
+        for feed in (feed_store.add_vacancy(vacancy_id) if approved else feed_store.remove_vacancy(vacancy_id)):
+            changed[feed["student_id"]] = feed
+    _save_feeds(list(changed.values()))
+    return {"updated_feeds": len(changed)}
+
+
+@router.get("/students/{student_id}/feed", response_class=FastJSONResponse)
+async def get_student_feed(student_id: str, limit: int = Query(10, ge=1, le=FEED_SIZE), current_user: dict = Depends(get_current_user)):
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if current_user.get("sub") != student_id: raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        feed = feed_store.get(student_id)
+        if feed is None: feed = await flights.do(flight_key("student_feed", student_id), _load_student_feed, student_id)
+        await _search_index_ready()
+        items = []
+        for item in feed["items"]:
+            vacancy = search_index.get(item["vacancy_id"])
+            if vacancy: items.append({**vacancy, "feed_score": item["score"]})
+            if len(items) >= limit: break
+        # Без навыков, специальности и резюме лента пуста — добираем свежими активными вакансиями
+        if len(items) < limit:
+            seen = {item["id"] for item in items}
+            recent = await run_in_threadpool(repository.list_vacancies, limit=limit + len(items))
+            items.extend({**vacancy, "feed_score": None} for vacancy in recent if vacancy["id"] not in seen)
+            items = items[:limit]
+        return FastJSONResponse({"items": items, "updated_at": feed["updated_at"]})
+    except Exception as e: logger.error(f"Get student feed error: {e}"); raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/vacancies/{vacancy_id}")
 async def get_vacancy(vacancy_id: str):
     # ... (код эндпоинта)
-    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if not repository: raise HTTPException(status_code=500, detail="Database not configured")
     try:
-        result = supabase.table("vacancies").select("*, company_profiles(company_name, description)").eq("id", vacancy_id).execute()
-        if not result.data: raise HTTPException(status_code=404, detail="Vacancy not found")
-        return result.data[0]
+        vacancy = await flights.do(flight_key("vacancy", vacancy_id), repository.get_vacancy, vacancy_id)
+        if not vacancy: raise HTTPException(status_code=404, detail="Vacancy not found")
+        return vacancy
     except Exception as e: logger.error(f"Get vacancy error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
 # --- Профили вузов ---
@@ -393,37 +680,148 @@ async def create_university_profile(profile: UniversityProfile, current_user: di
     try:
         data = profile.dict(); data["created_at"] = datetime.utcnow().isoformat()
         result = supabase.table("university_profiles").insert(data).execute()
+        repository.refresh("university_profiles", profile.user_id)
         return result.data[0] if result.data else {}
     except Exception as e: logger.error(f"Create university profile error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/universities/profile/{user_id}")
 async def get_university_profile(user_id: str):
     # ... (код эндпоинта)
-    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if not repository: raise HTTPException(status_code=500, detail="Database not configured")
     try:
-        result = supabase.table("university_profiles").select("*").eq("user_id", user_id).execute()
-        if not result.data: raise HTTPException(status_code=404, detail="Profile not found")
-        return result.data[0]
+        profile = repository.get_profile("university_profiles", user_id)
+        if not profile: raise HTTPException(status_code=404, detail="Profile not found")
+        return profile
     except Exception as e: logger.error(f"Get university profile error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
+
+async def _cohort_report(university_name: str) -> dict:
+    # numpy нужен только аналитике вузов — модуль импортируется при первом обращении
+    from cohorts import cohort_engine
+    await flights.do(flight_key("cohorts_refresh"), cohort_engine.refresh)
+    return cohort_engine.report(university_name)
+
+
+@router.get("/universities/cohorts", response_class=FastJSONResponse)
+async def get_university_cohorts(current_user: dict = Depends(get_current_user)):
+    """Показатели студентов вуза по годам выпуска: отклики, ответы работодателей, AI-оценки, навыки, стажировки."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if current_user.get("user_type") != "university": raise HTTPException(status_code=403, detail="Access denied: for university accounts only")
+    try:
+        profile = repository.get_profile("university_profiles", current_user.get("sub"))
+        if not profile: raise HTTPException(status_code=404, detail="University profile not found")
+        return FastJSONResponse(await _cohort_report(profile["university_name"]))
+    except HTTPException: raise
+    except Exception as e: logger.error(f"Get university cohorts error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/moderator/universities/cohorts", dependencies=[Depends(get_current_moderator)], response_class=FastJSONResponse)
+async def get_cohorts_for_university(university: str = Query(..., min_length=1)):
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    try: return FastJSONResponse(await _cohort_report(university))
+    except Exception as e: logger.error(f"Get university cohorts error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
 # --- Консультации и Чат ---
+APPOINTMENT_SELECT = "id, appointment_date, ends_at, duration_minutes"
+
+
+def _ensure_calendar(key: str):
+    """Календарь ресурса или студента: будущие активные встречи одним запросом."""
+    calendar = scheduler.get(key)
+    if calendar is None:
+        kind, _, value = key.partition(":")
+        column = "student_id" if kind == "student" else "resource_id"
+        rows = supabase.table("appointments").select(APPOINTMENT_SELECT) \
+            .eq(column, value if kind == "student" else key).neq("status", "cancelled") \
+            .gte("ends_at", datetime.utcnow().isoformat()).execute().data
+        calendar = scheduler.load(key, rows)
+    return calendar
+
+
 @router.post("/appointments")
 async def create_appointment(appointment: Appointment, current_user: dict = Depends(get_current_user)):
-    # ... (код эндпоинта)
     if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
     if current_user.get("sub") != appointment.student_id: raise HTTPException(status_code=403, detail="Not authorized")
+    if not 15 <= appointment.duration_minutes <= 240: raise HTTPException(status_code=422, detail="Duration must be between 15 and 240 minutes")
+    start = to_utc(appointment.appointment_date)
+    end = start + timedelta(minutes=appointment.duration_minutes)
+    if start <= to_utc(datetime.utcnow()): raise HTTPException(status_code=422, detail="Appointment must be in the future")
+    resource = resource_key(appointment.company_id, appointment.consultant_id)
+    keys = [resource, student_key(appointment.student_id)]
+    appointment_id = str(uuid.uuid4())
     try:
-        data = appointment.dict(); data["created_at"] = datetime.utcnow().isoformat(); data["status"] = "scheduled"
-        result = supabase.table("appointments").insert(data).execute()
+        for key in keys: _ensure_calendar(key)
+        conflict = scheduler.reserve(keys, start.timestamp(), end.timestamp(), appointment_id)
+        if conflict:
+            detail = "Вы уже записаны на это время" if conflict[0] == keys[1] else "Это время уже занято"
+            raise HTTPException(status_code=409, detail=detail)
+        data = appointment.dict()
+        data.update({"id": appointment_id, "appointment_date": start.isoformat(), "ends_at": end.isoformat(),
+                     "resource_id": resource, "created_at": datetime.utcnow().isoformat(), "status": "scheduled"})
+        try:
+            result = supabase.table("appointments").insert(data).execute()
+        except Exception as e:
+            scheduler.release(keys, appointment_id, broadcast=False)
+            # Ограничение EXCLUDE: слот только что занял другой воркер
+            if getattr(e, "code", None) == "23P01":
+                for key in keys: scheduler.invalidate(key)
+                raise HTTPException(status_code=409, detail="Это время уже занято")
+            raise
+        scheduler.publish(keys)
         return result.data[0] if result.data else {}
+    except HTTPException: raise
     except Exception as e: logger.error(f"Create appointment error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/appointments/availability")
+async def get_availability(
+        date_from: date,
+        date_to: date,
+        company_id: Optional[str] = None,
+        consultant_id: Optional[str] = None,
+        slot_minutes: int = Query(30, ge=15, le=240),
+):
+    """Свободные слоты компании, консультанта или карьерного центра за период."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if date_to < date_from or (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=422, detail=f"Period must be between 1 and {MAX_RANGE_DAYS} days")
+    resource = resource_key(company_id, consultant_id)
+    try:
+        slots = scheduler.free_slots(_ensure_calendar(resource), date_from, date_to, slot_minutes)
+        return {"resource_id": resource, "slot_minutes": slot_minutes,
+                "slots": [datetime.fromtimestamp(start, timezone.utc).isoformat() for start, _ in slots]}
+    except Exception as e: logger.error(f"Get availability error: {e}"); raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/appointments/{appointment_id}/cancel")
+async def cancel_appointment(appointment_id: str, current_user: dict = Depends(get_current_user)):
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    try:
+        found = supabase.table("appointments").select("id, student_id, company_id, consultant_id, resource_id").eq("id", appointment_id).execute().data
+        if not found: raise HTTPException(status_code=404, detail="Appointment not found")
+        appointment = found[0]
+        if current_user.get("sub") not in (appointment["student_id"], appointment.get("company_id"), appointment.get("consultant_id")) \
+                and current_user.get("user_type") != "moderator":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        result = supabase.table("appointments").update({"status": "cancelled"}).eq("id", appointment_id).execute()
+        scheduler.release([appointment["resource_id"], student_key(appointment["student_id"])], appointment_id)
+        return result.data[0] if result.data else {}
+    except HTTPException: raise
+    except Exception as e: logger.error(f"Cancel appointment error: {e}"); raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/appointments/student/{student_id}")
-async def get_student_appointments(student_id: str):
-    # ... (код эндпоинта)
+async def get_student_appointments(
+        student_id: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        status: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=500),
+):
     if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
     try:
-        return supabase.table("appointments").select("*").eq("student_id", student_id).execute().data
+        query = supabase.table("appointments").select("*").eq("student_id", student_id)
+        if date_from: query = query.gte("appointment_date", date_from.isoformat())
+        if date_to: query = query.lt("appointment_date", (date_to + timedelta(days=1)).isoformat())
+        if status: query = query.eq("status", status)
+        return query.order("appointment_date", desc=True).limit(limit).execute().data
     except Exception as e: logger.error(f"Get appointments error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/chat/messages")
@@ -433,8 +831,7 @@ async def send_message(message: ChatMessage, current_user: dict = Depends(get_cu
     if current_user.get("sub") != message.sender_id: raise HTTPException(status_code=403, detail="Not authorized")
     try:
         data = message.dict(); data["created_at"] = datetime.utcnow().isoformat()
-        result = supabase.table("chat_messages").insert(data).execute()
-        return result.data[0] if result.data else {}
+        return await chat_messages_writer.insert(data) or {}
     except Exception as e: logger.error(f"Send message error: {e}"); raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/chat/messages/{user_id}")
@@ -447,37 +844,63 @@ async def get_messages(user_id: str, limit: int = 100):
 
 # --- AI Чат-бот и Аналитика ---
 @router.post("/ai/chat")
-async def ai_chat(query: AIQuery):
-    # ... (код эндпоинта)
-    if not openai_client: return {"response":"AI чат временно недоступен.","action":None}
+async def ai_chat(query: AIQuery, current_user: Optional[dict] = Depends(get_optional_user)):
+    # AI-модули не нужны большинству воркеров — импортируются при первом обращении к чату
+    from assistant import assistant, AI_CHAT_MODEL, AI_CHAT_MAX_TOKENS
+    from prompts import count_tokens
     try:
-        response=openai_client.chat.completions.create(model="gpt-3.5-turbo",messages=[{"role":"system","content":"..."},{"role":"user","content":query.query}],temperature=0.7,max_tokens=200);return {"response":response.choices[0].message.content or "","action":None}
+        cached = assistant.cached_answer(query.query)
+        if cached: return {**cached, "cached": True}
+        if supabase: await _search_index_ready()
+        retrieval = assistant.retrieve(query.query)
+        # Вопрос из FAQ — ответ без обращения к модели
+        if retrieval["faq_direct"]:
+            assistant.count("faq_direct")
+            entry = retrieval["faq_direct"]
+            return {"response": entry["answer"], "action": None, "sources": [{"type": "faq", "id": entry["id"], "title": entry["question"]}], "cached": True}
+        if not openai_client: return {"response":"AI чат временно недоступен.","action":None}
+        assistant.count("llm_calls")
+        messages = assistant.build_messages(query.query, retrieval)
+        started = time.monotonic()
+        response = await run_in_threadpool(
+            openai_client.chat.completions.create, model=AI_CHAT_MODEL, messages=messages,
+            temperature=0.3, max_tokens=AI_CHAT_MAX_TOKENS)
+        tokens = usage_tokens(response, prompt_estimate=sum(count_tokens(m["content"]) for m in messages))
+        # user_id из тела не проверяется — расход пишется только на вошедшего пользователя
+        await run_in_threadpool(usage_ledger.record, (current_user or {}).get("sub"), "chat", AI_CHAT_MODEL,
+                                latency_ms=int((time.monotonic() - started) * 1000), **tokens)
+        answer = {"response": response.choices[0].message.content or "", "action": None, "sources": assistant.sources(retrieval)}
+        if answer["response"]: assistant.remember(query.query, answer)
+        return {**answer, "cached": False}
     except Exception as e: logger.error(f"AI chat error: {e}"); return {"response": "Извините, произошла ошибка.", "action": None}
 
 
+def _analytics_overview() -> dict:
+    students=supabase.table("student_profiles").select("id",count="exact").execute();companies=supabase.table("company_profiles").select("id",count="exact").execute();vacancies=supabase.table("vacancies").select("id",count="exact").eq("status","active").execute();internships=supabase.table("vacancies").select("id",count="exact").eq("is_internship",True).eq("status","active").execute()
+    return {"total_students":students.count or 0,"total_companies":companies.count or 0,"active_vacancies":vacancies.count or 0,"active_internships":internships.count or 0}
+
 @router.get("/analytics/overview")
 async def get_analytics_overview():
     # ... (код эндпоинта)
     if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
     try:
-        students=supabase.table("student_profiles").select("id",count="exact").execute();companies=supabase.table("company_profiles").select("id",count="exact").execute();vacancies=supabase.table("vacancies").select("id",count="exact").eq("status","active").execute();internships=supabase.table("vacancies").select("id",count="exact").eq("is_internship",True).eq("status","active").execute()
-        return {"total_students":students.count or 0,"total_companies":companies.count or 0,"active_vacancies":vacancies.count or 0,"active_internships":internships.count or 0}
+        return await flights.do(flight_key("analytics_overview"), _analytics_overview)
     except Exception as e: logger.error(f"Analytics error: {e}"); raise HTTPException(status_code=500, detail=str(e))
 
 # --- API для Модератора ---
-@router.get("/moderator/users", dependencies=[Depends(get_current_moderator)])
+@router.get("/moderator/users", dependencies=[Depends(get_current_moderator)], response_class=FastJSONResponse)
 async def get_all_users():
     # ... (код эндпоинта)
-    try: return supabase.table("users").select("id, full_name, email, user_type, created_at").execute().data
+    try: return FastJSONResponse(supabase.table("users").select("id, full_name, email, user_type, created_at").execute().data)
     except Exception as e: raise HTTPException(status_code=500,detail=str(e))
 
-@router.get("/moderator/vacancies", dependencies=[Depends(get_current_moderator)])
+@router.get("/moderator/vacancies", dependencies=[Depends(get_current_moderator)], response_class=FastJSONResponse)
 async def get_all_vacancies_for_moderator(status: Optional[str] = None):
     # ... (код эндпоинта)
     try:
         query = supabase.table("vacancies").select("*, company_profiles(company_name)")
         if status: query = query.eq("status", status)
-        return query.order("created_at", desc=True).execute().data
+        return FastJSONResponse(query.order("created_at", desc=True).execute().data)
     except Exception as e: raise HTTPException(status_code=500,detail=str(e))
 
 @router.post("/moderator/vacancies/{vacancy_id}/approve", dependencies=[Depends(get_current_moderator)])
@@ -485,7 +908,11 @@ async def approve_vacancy(vacancy_id: str):
     # ... (код эндпоинта)
     try:
         response=supabase.table("vacancies").update({"status":"active"}).eq("id",vacancy_id).execute()
-        if not response.data: raise HTTPException(status_code=404,detail="Vacancy not found"); return response.data[0]
+        if not response.data: raise HTTPException(status_code=404,detail="Vacancy not found")
+        repository.refresh("vacancies", vacancy_id)
+        _index_vacancy(vacancy_id)
+        job_queue.enqueue("vacancy_feeds", {"vacancy_id": vacancy_id, "approved": True}, priority=PRIORITY_LOW)
+        return response.data[0]
     except Exception as e: logger.error(f"Approve vacancy error: {e}"); raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/moderator/vacancies/{vacancy_id}/reject", dependencies=[Depends(get_current_moderator)])
@@ -494,6 +921,9 @@ async def reject_vacancy(vacancy_id: str):
     try:
         response = supabase.table("vacancies").update({"status": "rejected"}).eq("id", vacancy_id).execute()
         if not response.data: raise HTTPException(status_code=404, detail="Vacancy not found")
+        repository.refresh("vacancies", vacancy_id)
+        search_index.remove(vacancy_id)
+        job_queue.enqueue("vacancy_feeds", {"vacancy_id": vacancy_id, "approved": False}, priority=PRIORITY_LOW)
         return response.data[0]
     except Exception as e: logger.error(f"Reject vacancy error: {e}"); raise HTTPException(status_code=500, detail=str(e))
 
@@ -502,13 +932,67 @@ async def delete_vacancy(vacancy_id: str):
     # ... (код эндпоинта)
     try:
         response=supabase.table("vacancies").delete().eq("id",vacancy_id).execute()
-        if not response.data: raise HTTPException(status_code=404,detail="Vacancy not found or already deleted"); return {"message":"Vacancy deleted successfully"}
+        if not response.data: raise HTTPException(status_code=404,detail="Vacancy not found or already deleted")
+        ranking_cache.invalidate(vacancy_id)
+        repository.remove("vacancies", vacancy_id)
+        search_index.remove(vacancy_id)
+        job_queue.enqueue("vacancy_feeds", {"vacancy_id": vacancy_id, "approved": False}, priority=PRIORITY_LOW)
+        return {"message":"Vacancy deleted successfully"}
+    except HTTPException: raise
     except Exception as e: logger.error(f"Delete vacancy error: {e}"); raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/moderator/universities", dependencies=[Depends(get_current_moderator)])
+def _after_moderation(action: str, vacancy_ids: list):
+    """Реплика, поисковый индекс, рейтинги и ленты после пакетного действия модератора."""
+    if action == "delete":
+        for vacancy_id in vacancy_ids:
+            ranking_cache.invalidate(vacancy_id)
+            repository.remove("vacancies", vacancy_id)
+            search_index.remove(vacancy_id)
+    else:
+        repository.refresh_many("vacancies", vacancy_ids)
+    if action == "approve" and search_index.loaded:
+        for start in range(0, len(vacancy_ids), IN_CHUNK):
+            for vacancy in supabase.table("vacancies").select(SEARCH_SELECT).in_("id", vacancy_ids[start:start + IN_CHUNK]).execute().data:
+                search_index.upsert(vacancy)
+    elif action == "reject":
+        for vacancy_id in vacancy_ids: search_index.remove(vacancy_id)
+    if action != "prioritize":
+        job_queue.enqueue("vacancy_feeds", {"vacancy_ids": vacancy_ids, "approved": action == "approve"}, priority=PRIORITY_LOW)
+
+
+@router.get("/moderator/queue", dependencies=[Depends(get_current_moderator)], response_class=FastJSONResponse)
+async def get_moderation_queue(limit: int = Query(50, ge=1, le=MODERATION_PAGE_MAX), offset: int = Query(0, ge=0)):
+    """Вакансии на модерации: сначала с большим приоритетом, внутри — самые старые."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    try: return FastJSONResponse(await run_in_threadpool(moderation_queue.page, limit, offset))
+    except Exception as e: logger.error(f"Moderation queue error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/moderator/vacancies/bulk", dependencies=[Depends(get_current_moderator)])
+async def moderate_vacancies(batch: ModerationBatch):
+    """Одобрение, отклонение, удаление или смена приоритета пачки вакансий одним запросом."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if len(batch.vacancy_ids) > MODERATION_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {MODERATION_BATCH_MAX} vacancies per request")
+    try:
+        vacancy_ids, invalid = split_ids(batch.vacancy_ids)
+        rows = await run_in_threadpool(moderation_queue.apply, batch.action.value, vacancy_ids, batch.priority)
+        affected = [row["id"] for row in rows]
+        if affected: await run_in_threadpool(_after_moderation, batch.action.value, affected)
+        missing = sorted(set(vacancy_ids) - set(affected)) + invalid
+        return {"action": batch.action.value, "updated": affected, "not_found": missing}
+    except Exception as e: logger.error(f"Bulk moderation error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/moderator/vacancies/changes", dependencies=[Depends(get_current_moderator)], response_class=FastJSONResponse)
+async def get_vacancy_changes(since: Optional[datetime] = None):
+    """Изменённые и удалённые вакансии после курсора since; без since — начальный курсор."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    try: return FastJSONResponse(await run_in_threadpool(moderation_queue.changes, since))
+    except Exception as e: logger.error(f"Vacancy changes feed error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/moderator/universities", dependencies=[Depends(get_current_moderator)], response_class=FastJSONResponse)
 async def get_all_universities():
     # ... (код эндпоинта)
-    try: return supabase.table("university_profiles").select("*").execute().data
+    try: return FastJSONResponse(supabase.table("university_profiles").select("*").execute().data)
     except Exception as e: raise HTTPException(status_code=500,detail=str(e))
 
 @router.get("/moderator/analytics/detailed", dependencies=[Depends(get_current_moderator)])
@@ -543,18 +1027,20 @@ async def create_vacancy_touch(response: VacancyTouchCreate, current_user: dict
         data["created_at"] = datetime.utcnow().isoformat()
         data["status"] = "pending"  # Статус по умолчанию
 
-        # Вставляем данные в ПРАВИЛЬНУЮ таблицу
-        result = supabase.table("vacancy_touch").insert(data).execute()
+        # Вставляем данные в ПРАВИЛЬНУЮ таблицу (пакетом вместе с одновременными откликами)
+        created_touch = await vacancy_touch_writer.insert(data)
 
-        if not result.data:
+        if not created_touch:
             raise HTTPException(status_code=500, detail="Failed to create vacancy response")
 
+        ranking_cache.invalidate(response.vacancy_id)
+
         feedback_message = {
             "type": "popup",
             "title": "Отклик отправлен!",
             "text": "Ваш отклик на вакансию успешно отправлен. Ждите ответа от работодателя."
         }
-        return {"data": result.data[0], "feedback_message": feedback_message}
+        return {"data": created_touch, "feedback_message": feedback_message}
 
     except Exception as e:
         logger.error(f"Create vacancy response error: {e}")
@@ -562,7 +1048,29 @@ async def create_vacancy_touch(response: VacancyTouchCreate, current_user: dict
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/vacancy_responses/company")
+@router.put("/vacancy_touch/{touch_id}/status")
+async def update_vacancy_touch_status(touch_id: str, update: VacancyTouchStatusUpdate, current_user: dict = Depends(get_current_user)):
+    """Компания меняет статус отклика; счётчики воронки обновляет триггер в базе."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if current_user.get("user_type") != 'company': raise HTTPException(status_code=403, detail="Access denied: for company accounts only")
+    try:
+        touch_req = supabase.table("vacancy_touch").select("id, vacancy_id, vacancies(company_id)").eq("id", touch_id).execute()
+        if not touch_req.data: raise HTTPException(status_code=404, detail="Vacancy touch not found")
+        touch = touch_req.data[0]
+        if (touch.get("vacancies") or {}).get("company_id") != current_user.get("sub"):
+            raise HTTPException(status_code=403, detail="Access denied: you do not own this vacancy")
+        result = supabase.table("vacancy_touch") \
+            .update({"status": update.status.value, "updated_at": datetime.utcnow().isoformat()}) \
+            .eq("id", touch_id).execute()
+        ranking_cache.invalidate(touch["vacancy_id"])
+        return result.data[0] if result.data else {}
+    except HTTPException: raise
+    except Exception as e:
+        logger.error(f"Update vacancy touch status error for {touch_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/vacancy_responses/company", response_class=FastJSONResponse)
 async def get_company_responses(current_user: dict = Depends(get_current_user)):
     if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
     if current_user.get("user_type") != 'company': raise HTTPException(status_code=403, detail="Access denied: for company accounts only")
@@ -571,103 +1079,187 @@ async def get_company_responses(current_user: dict = Depends(get_current_user)):
         # Получаем вакансии компании
         vacancies_req = supabase.table("vacancies").select("id").eq("company_id", company_user_id).execute()
         vacancy_ids = [v['id'] for v in vacancies_req.data]
-        if not vacancy_ids: return []
+        if not vacancy_ids: return FastJSONResponse([])
 
         # Получаем отклики с join на студентов, резюме и вакансии
         responses = supabase.table("vacancy_responses").select(
             "*, student_profiles(*, users(full_name, email)), resumes(title, content), vacancies(title)"
         ).in_("vacancy_id", vacancy_ids).execute().data
-        return responses
+        return FastJSONResponse(responses)
     except Exception as e:
         logger.error(f"Get company responses error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 
-@router.get("/vacancies/{vacancy_id}/responses", dependencies=[Depends(get_current_user)])
-async def get_vacancy_with_responses(vacancy_id: str, current_user: dict = Depends(get_current_user)):
+class ResponseSort(str, Enum):
+    rating = "rating"
+    motivation = "motivation"
+    date = "date"
+
+
+# Сортировка откликов в формате PostgREST (без рейтинга — в конец списка)
+RESPONSE_SORT_ORDER = {
+    ResponseSort.rating: "meets_criteria_rating.desc.nullslast,created_at.desc",
+    ResponseSort.motivation: "motivation_rating.desc.nullslast,created_at.desc",
+    ResponseSort.date: "created_at.desc",
+}
+
+
+@router.get("/vacancies/{vacancy_id}/responses", dependencies=[Depends(get_current_user)], response_class=FastJSONResponse)
+async def get_vacancy_with_responses(
+        vacancy_id: str,
+        current_user: dict = Depends(get_current_user),
+        sort: ResponseSort = ResponseSort.date,
+        limit: int = Query(50, ge=1, le=200),
+        offset: int = Query(0, ge=0),
+):
     if not supabase:
         raise HTTPException(status_code=500, detail="Database not configured")
 
     company_user_id = current_user.get("sub")
 
     try:
-        # Проверка владельца вакансии
-        vacancy_check_q = supabase.table("vacancies").select("company_id").eq("id", vacancy_id).single().execute()
-        vacancy_check = vacancy_check_q.data
-        if not vacancy_check:
+        # Один запрос: вакансия + общее число откликов + одна страница откликов.
+        # Колонки vacancy_touch нормализованы миграцией migrations/001_normalize_vacancy_touch.sql
+        query = supabase.table("vacancies") \
+            .select("*, responses_total:vacancy_touch(count), "
+                    "vacancy_touch(*, users:student_id(*, student_profiles(*)), resumes:resume_id(*))") \
+            .eq("id", vacancy_id)
+        # postgrest-py не умеет offset и nullslast для вложенных таблиц — задаём параметры напрямую
+        query.params = query.params \
+            .add("vacancy_touch.order", RESPONSE_SORT_ORDER[sort]) \
+            .add("vacancy_touch.limit", limit) \
+            .add("vacancy_touch.offset", offset)
+        result = query.execute()
+
+        if not result.data:
             raise HTTPException(status_code=404, detail="Vacancy not found")
-        if vacancy_check.get("company_id") != company_user_id:
+        data = result.data[0]
+        if data.get("company_id") != company_user_id:
             raise HTTPException(status_code=403, detail="Access denied: you do not own this vacancy")
 
-        # Основной запрос — выбираем все поля вакансии + связанные отклики и вложенные объекты
-        query = supabase.table("vacancies") \
-            .select("*, vacancy_touch(*, users:student_id(*, student_profiles(*)), resumes:resume_id(*))") \
+        total = data.pop("responses_total", None)
+        data["responses_total"] = total[0]["count"] if total else 0
+        data["limit"] = limit
+        data["offset"] = offset
+        data["sort"] = sort.value
+
+        # Переносим student_profiles на верхний уровень отклика (только для текущей страницы)
+        for touch in data.get("vacancy_touch") or []:
+            final_profile_with_user = None
+            user_data = touch.pop("users", None)
+            if user_data:
+                profile_list = user_data.pop("student_profiles", [])
+                if profile_list:
+                    final_profile_with_user = profile_list[0]
+                    final_profile_with_user["users"] = user_data
+            touch["student_profiles"] = final_profile_with_user
+
+        return FastJSONResponse(data)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get vacancy with responses error for vacancy {vacancy_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/vacancies/{vacancy_id}/ranking", dependencies=[Depends(get_current_user)])
+async def get_vacancy_ranking(
+        vacancy_id: str,
+        current_user: dict = Depends(get_current_user),
+        limit: int = Query(20, ge=1, le=100),
+        w_criteria: float = Query(0.5, ge=0, description="Вес соответствия требованиям"),
+        w_motivation: float = Query(0.3, ge=0, description="Вес мотивации"),
+        w_skills: float = Query(0.2, ge=0, description="Вес пересечения навыков"),
+):
+    """
+    Возвращает N лучших откликов на вакансию по взвешенной сумме
+    AI-оценок и пересечения навыков.
+    """
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Database not configured")
+
+    company_user_id = current_user.get("sub")
+
+    try:
+        vacancy_req = supabase.table("vacancies") \
+            .select("id, company_id, description, requirements") \
             .eq("id", vacancy_id) \
-            .single() \
             .execute()
+        if not vacancy_req.data:
+            raise HTTPException(status_code=404, detail="Vacancy not found")
+        vacancy = vacancy_req.data[0]
+        if vacancy.get("company_id") != company_user_id:
+            raise HTTPException(status_code=403, detail="Access denied: you do not own this vacancy")
 
-        data = query.data if query.data else None
-
-        if data and 'vacancy_touch' in data and isinstance(data['vacancy_touch'], list):
-            for touch in data['vacancy_touch']:
-                # --- НОРМАЛИЗАЦИЯ ИМЕН ПОЛЕЙ ---
-                # ai_summary (варианты названий)
-                if 'ai_summary' not in touch and 'ai_summery' in touch:
-                    touch['ai_summary'] = touch.get('ai_summery')
-
-                # motivation_rating (возможные варианты)
-                if 'motivation_rating' not in touch:
-                    # некоторые старые имена/варианты
-                    if 'motivation_score' in touch:
-                        touch['motivation_rating'] = touch.get('motivation_score')
-                    elif 'motivation' in touch:
-                        touch['motivation_rating'] = touch.get('motivation')
-
-                # meets_criteria_rating (исправляем возможные опечатки)
-                if 'meets_criteria_rating' not in touch:
-                    if 'meets_creteria_rating' in touch:  # опечатка в названии столбца
-                        touch['meets_criteria_rating'] = touch.get('meets_creteria_rating')
-                    elif 'meets_criteria' in touch:
-                        touch['meets_criteria_rating'] = touch.get('meets_criteria')
-
-                # Приведём рейтинги к числам, если они приходят как строки
-                for fld in ('motivation_rating', 'meets_criteria_rating'):
-                    if fld in touch and touch[fld] is not None:
-                        try:
-                            # если это число в строке — привести
-                            touch[fld] = int(touch[fld])
-                        except Exception:
-                            # если не приводится — оставим как есть (без падения)
-                            pass
-
-                # --- ВСПОМОГАТЕЛЬНЫЕ ПРЕОБРАЗОВАНИЯ РЕЗЮМЕ/ПРОФИЛЯ ---
-                # Если в touch есть 'users' (из nested select), перемещаем student_profiles как в старом коде
-                final_profile_with_user = None
-                if touch.get('users'):
-                    user_data = touch.get('users')
-                    profile_list = user_data.pop('student_profiles', [])
-                    if profile_list:
-                        final_profile = profile_list[0]
-                        final_profile['users'] = user_data
-                        final_profile_with_user = final_profile
-                touch['student_profiles'] = final_profile_with_user
-                if 'users' in touch:
-                    del touch['users']
-
-                # Убедимся, что resumes лежит как объект (если nested selection вернула массив/объект)
-                # (в твоём коде ты ожидаешь r.resumes быть объектом — оставим как есть)
-                # Если возникнут другие старые названия колонок — можно дополнить нормализацию здесь.
-
-        return data
+        entries = ranking_cache.get(vacancy_id)
+        if entries is None:
+            touches = supabase.table("vacancy_touch") \
+                .select(RANKING_SELECT) \
+                .eq("vacancy_id", vacancy_id) \
+                .execute().data
+            entries = ranking_cache.load(vacancy, touches or [])
+
+        return {
+            "vacancy_id": vacancy_id,
+            "total_responses": len(entries),
+            "weights": {"criteria": w_criteria, "motivation": w_motivation, "skills": w_skills},
+            "top": top_n(entries, limit, w_criteria, w_motivation, w_skills),
+        }
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Get vacancy with responses error for vacancy {vacancy_id}: {e}")
+        logger.error(f"Get vacancy ranking error for vacancy {vacancy_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- Фоновые задачи ---
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = job_queue.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail="Job not found")
+    if job["owner_id"] != current_user.get("sub") and current_user.get("user_type") != "moderator":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {k: job[k] for k in ("id", "kind", "status", "attempts", "max_attempts", "last_error", "result", "created_at", "updated_at")}
+
+
+@router.get("/moderator/jobs", dependencies=[Depends(get_current_moderator)])
+async def get_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    return {"stats": job_queue.stats(), "jobs": job_queue.list(status=status, kind=kind, limit=limit)}
+
+
+@router.post("/moderator/funnel/reconcile", dependencies=[Depends(get_current_moderator)])
+async def reconcile_funnel():
+    """Внеочередная сверка счётчиков воронки с откликами."""
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    try: return {"fixed_vacancies": await run_in_threadpool(funnel.reconcile, 0)}
+    except Exception as e: logger.error(f"Funnel reconcile error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/moderator/jobs/{job_id}/retry", dependencies=[Depends(get_current_moderator)])
+async def retry_job(job_id: str):
+    if not job_queue.retry(job_id): raise HTTPException(status_code=404, detail="Dead job not found")
+    return {"job_id": job_id, "status": "queued"}
+
+
+# --- Расход токенов AI ---
+@router.get("/companies/ai-usage")
+async def get_company_ai_usage(current_user: dict = Depends(get_current_user)):
+    if not supabase: raise HTTPException(status_code=500, detail="Database not configured")
+    if current_user.get("user_type") != "company": raise HTTPException(status_code=403, detail="Access denied: for company accounts only")
+    try: return usage_ledger.summary(current_user.get("sub"))
+    except Exception as e: logger.error(f"Get AI usage error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/moderator/ai-usage", dependencies=[Depends(get_current_moderator)])
+async def get_ai_usage(owner_id: Optional[str] = None, since: Optional[date] = None):
+    try: return usage_ledger.summary(owner_id, datetime.combine(since, datetime.min.time()) if since else None)
+    except Exception as e: logger.error(f"Get AI usage error: {e}"); raise HTTPException(status_code=500, detail=str(e))
+
+
 # графики и аналитика
 
 class Granularity(str, Enum):
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from prompts import pack_lines, truncate_to_tokens
+from search import search_index, tokenize
+
+# --- AI-ассистент: поиск контекста по платформе (RAG) ---
+
+AI_CHAT_MODEL = os.getenv("AI_CHAT_MODEL", "gpt-3.5-turbo")
+AI_CHAT_MAX_TOKENS = int(os.getenv("AI_CHAT_MAX_TOKENS", "400"))
+# Бюджет блока контекста в промпте
+AI_CONTEXT_TOKENS = int(os.getenv("AI_CONTEXT_TOKENS", "900"))
+CONTEXT_VACANCIES = 5
+CONTEXT_FAQ = 2
+RETRIEVAL_CACHE_SIZE = 1024
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = float(os.getenv("AI_ANSWER_CACHE_TTL", "600"))
+# Порог сходства запросов (Жаккар по основам слов) для ответа из кэша
+ANSWER_SIMILARITY = 0.8
+# Вопрос, почти совпадающий с FAQ, получает ответ из FAQ без вызова модели
+FAQ_DIRECT_SIMILARITY = 0.75
+
+SYSTEM_PROMPT = (
+    "Ты — ассистент карьерного центра «Технополис Москва». Помогаешь студентам найти вакансии "
+    "и стажировки, компаниям — разобраться с платформой. Отвечай по-русски, кратко и по делу. "
+    "Опирайся только на блок «Контекст»: называй вакансии и компании оттуда, ничего не придумывай. "
+    "Если подходящих данных нет, так и скажи и предложи уточнить запрос или воспользоваться поиском вакансий."
+)
+
+FAQ = [
+    {"id": "respond", "question": "Как откликнуться на вакансию?",
+     "answer": "Откройте вакансию в разделе «Вакансии» и нажмите «Откликнуться». Перед этим заполните профиль и создайте резюме в личном кабинете — работодатель увидит их вместе с откликом."},
+    {"id": "resume", "question": "Как создать или изменить резюме?",
+     "answer": "В личном кабинете студента откройте вкладку «Резюме»: там можно создать новое резюме или отредактировать существующее. Укажите навыки — по ним подбирается персональная лента вакансий."},
+    {"id": "consultation", "question": "Как записаться на консультацию карьерного центра?",
+     "answer": "В личном кабинете откройте вкладку «Консультации» и выберите свободный слот. Пересекающиеся записи система не допустит; запись можно отменить."},
+    {"id": "moderation", "question": "Почему вакансия не опубликована? Сколько длится модерация?",
+     "answer": "Новые вакансии публикуются после проверки модератором. До одобрения вакансия видна только компании в её личном кабинете."},
+    {"id": "register_company", "question": "Как зарегистрировать компанию и разместить вакансию?",
+     "answer": "Зарегистрируйтесь с типом аккаунта «Компания», указав название и ИНН, заполните профиль компании и создайте вакансию в личном кабинете. Она появится в поиске после модерации."},
+    {"id": "internship", "question": "Как найти стажировку?",
+     "answer": "В разделе «Вакансии» включите фильтр «Стажировка». Можно также искать по навыкам, например «Python стажировка»."},
+    {"id": "ai_summary", "question": "Что такое AI-оценка отклика?",
+     "answer": "Компания может запустить AI-анализ откликов: модель оценивает соответствие требованиям и мотивацию кандидата и пишет краткое резюме. Итоговое решение всегда за работодателем."},
+]
+
+
+def _term_set(text: str) -> FrozenSet[str]:
+    return frozenset(tokenize(text))
+
+
+def _similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class Assistant:
+    """
+    Поиск контекста для AI-чата: активные вакансии берутся из локального
+    поискового индекса (он обновляется инкрементально), плюс статический FAQ.
+    Результат поиска кэшируется по набору основ слов запроса и версии индекса.
+    Готовые ответы модели хранятся в кэше ответов: похожий вопрос
+    (по сходству основ слов) получает ответ без вызова LLM.
+    """
+
+    def __init__(self, faq: List[dict] = FAQ):
+        self._lock = threading.Lock()
+        self._faq = [(entry, _term_set(entry["question"] + " " + entry["answer"]), _term_set(entry["question"]))
+                     for entry in faq]
+        self._retrievals: "OrderedDict[Tuple, dict]" = OrderedDict()
+        self._answers: "OrderedDict[FrozenSet[str], Tuple[float, dict]]" = OrderedDict()
+        self.counters: Dict[str, int] = {"queries": 0, "retrieval_hits": 0, "answer_hits": 0, "faq_direct": 0, "llm_calls": 0}
+
+    # --- Поиск ---
+
+    def retrieve(self, query: str) -> dict:
+        terms = tokenize(query)
+        key = (tuple(sorted(set(terms))), search_index.version)
+        with self._lock:
+            cached = self._retrievals.get(key)
+            if cached is not None:
+                self._retrievals.move_to_end(key)
+                self.counters["retrieval_hits"] += 1
+                return cached
+
+        query_set = frozenset(terms)
+        vacancies = [search_index.get(doc_id) for doc_id, _ in search_index.top_k(terms, CONTEXT_VACANCIES)]
+        faq_scored = sorted(((len(query_set & terms_all) / max(len(query_set), 1), _similarity(query_set, terms_q), entry)
+                             for entry, terms_all, terms_q in self._faq), key=lambda item: item[0], reverse=True)
+        result = {
+            "vacancies": [v for v in vacancies if v],
+            "faq": [entry for overlap, _, entry in faq_scored[:CONTEXT_FAQ] if overlap > 0],
+            "faq_direct": next((entry for _, similarity, entry in faq_scored if similarity >= FAQ_DIRECT_SIMILARITY), None),
+        }
+        with self._lock:
+            self._retrievals[key] = result
+            if len(self._retrievals) > RETRIEVAL_CACHE_SIZE:
+                self._retrievals.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _vacancy_line(vacancy: dict) -> str:
+        company = (vacancy.get("company_profiles") or {}).get("company_name") or "компания не указана"
+        details = ", ".join(filter(None, [
+            vacancy.get("location"), vacancy.get("employment_type"), vacancy.get("salary_range"),
+            "стажировка" if vacancy.get("is_internship") else None,
+        ]))
+        requirements = truncate_to_tokens(vacancy.get("requirements"), 60)
+        return f"- Вакансия «{vacancy.get('title')}» ({company}; {details}). Требования: {requirements}"
+
+    def context_block(self, retrieval: dict, budget: int = AI_CONTEXT_TOKENS) -> str:
+        """Компактный блок контекста: сначала FAQ, затем вакансии по убыванию релевантности, в пределах бюджета."""
+        lines = [f"- FAQ: {entry['question']} {entry['answer']}" for entry in retrieval["faq"]]
+        lines += [self._vacancy_line(vacancy) for vacancy in retrieval["vacancies"]]
+        packed = pack_lines(lines, budget)
+        return "Контекст:\n" + ("\n".join(packed) if packed else "- подходящих вакансий и справки не найдено")
+
+    def build_messages(self, query: str, retrieval: dict) -> List[dict]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT + "\n\n" + self.context_block(retrieval)},
+            {"role": "user", "content": truncate_to_tokens(query, 300)},
+        ]
+
+    @staticmethod
+    def sources(retrieval: dict) -> List[dict]:
+        return [{"type": "vacancy", "id": v["id"], "title": v.get("title")} for v in retrieval["vacancies"]] + \
+               [{"type": "faq", "id": entry["id"], "title": entry["question"]} for entry in retrieval["faq"]]
+
+    # --- Кэш ответов ---
+
+    def cached_answer(self, query: str) -> Optional[dict]:
+        query_set = _term_set(query)
+        if not query_set:
+            return None
+        now = time.time()
+        with self._lock:
+            self.counters["queries"] += 1
+            best, best_score = None, 0.0
+            for terms, (expires, answer) in list(self._answers.items()):
+                if expires < now:
+                    del self._answers[terms]
+                    continue
+                score = _similarity(query_set, terms)
+                if score > best_score:
+                    best, best_score = terms, score
+            if best is None or best_score < ANSWER_SIMILARITY:
+                return None
+            self._answers.move_to_end(best)
+            self.counters["answer_hits"] += 1
+            return self._answers[best][1]
+
+    def remember(self, query: str, answer: dict):
+        query_set = _term_set(query)
+        if not query_set:
+            return
+        with self._lock:
+            self._answers[query_set] = (time.time() + ANSWER_CACHE_TTL, answer)
+            self._answers.move_to_end(query_set)
+            if len(self._answers) > ANSWER_CACHE_SIZE:
+                self._answers.popitem(last=False)
+
+    def count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> dict:
+        return {**self.counters, "retrieval_cache": len(self._retrievals), "answer_cache": len(self._answers)}
+
+
+assistant = Assistant()
@@ -20,7 +20,7 @@ def verify_token(token: str):
         return jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
@@ -32,6 +32,17 @@ async def get_current_user(request: Request):
     return verify_token(token)
 
 
+async def get_optional_user(request: Request):
+    """Пользователь из токена, если он есть и валиден; иначе None (публичные эндпоинты)."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    try:
+        return verify_token(auth_header.split(" ")[1])
+    except HTTPException:
+        return None
+
+
 def get_current_moderator(current_user: dict = Depends(get_current_user)):
     if current_user.get("user_type") != UserType.moderator:
         raise HTTPException(status_code=403, detail="Requires moderator privileges")
@@ -66,6 +77,7 @@ async def register(user: UserCreate):
                 "company_website": user.company_website
             })
 
+        # Строка users нужна сразу: по ней работают вход и внешние ключи профилей
         supabase.table("users").insert(profile_data).execute()
 
         token_payload = {
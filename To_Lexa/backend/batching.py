@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import List, Optional, Tuple
+
+from config import supabase
+
+logger = logging.getLogger(__name__)
+
+# --- Групповая запись (group commit) частых вставок ---
+
+WRITE_BATCHING = os.getenv("WRITE_BATCHING", "true").lower() == "true"
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "5"))
+WRITE_BATCH_MAX_ROWS = int(os.getenv("WRITE_BATCH_MAX_ROWS", "100"))
+
+
+class InsertBatcher:
+    """
+    Собирает одновременные вставки в одну таблицу за короткое окно (или до
+    max_rows строк) и отправляет их одним bulk insert. Каждый вызывающий
+    получает свою вставленную строку: id назначается заранее, и строки
+    сопоставляются по нему. Если пакет отклонён целиком, строки повторяются
+    по одной, чтобы ошибку получил только автор неверной строки.
+    Запрос в Supabase выполняется в пуле потоков и не блокирует event loop.
+    """
+
+    def __init__(self, table: str, window_ms: float = WRITE_BATCH_WINDOW_MS,
+                 max_rows: int = WRITE_BATCH_MAX_ROWS, enabled: bool = WRITE_BATCHING):
+        self.table = table
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self.enabled = enabled
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.rows = 0
+
+    def _insert_many(self, rows: List[dict]) -> List[dict]:
+        return supabase.table(self.table).insert(rows).execute().data
+
+    async def insert(self, row: dict) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        if not self.enabled:
+            inserted = await loop.run_in_executor(None, self._insert_many, [row])
+            return inserted[0] if inserted else None
+        row.setdefault("id", str(uuid.uuid4()))
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._commit(batch))
+
+    async def _commit(self, batch: List[Tuple[dict, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            inserted = await loop.run_in_executor(None, self._insert_many, [row for row, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done(): batch[0][1].set_exception(e)
+                return
+            logger.warning(f"Batch insert into {self.table} ({len(batch)} rows) failed, retrying one by one: {e}")
+            await asyncio.gather(*(self._commit([item]) for item in batch))
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        by_id = {row["id"]: row for row in inserted or []}
+        for row, future in batch:
+            if not future.done(): future.set_result(by_id.get(row["id"]))
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "batches": self.batches, "rows": self.rows, "pending": len(self._pending)}
+
+
+chat_messages_writer = InsertBatcher("chat_messages")
+vacancy_touch_writer = InsertBatcher("vacancy_touch")
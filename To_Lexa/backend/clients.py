@@ -0,0 +1,209 @@
+import importlib.util
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+# httpx, openai и supabase импортируются при создании клиентов, а не при импорте модуля:
+# вместе они занимают ~0.4 с холодного старта каждого воркера
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI
+    from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 доступен только при установленном пакете h2 (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class PoolSettings:
+    """Параметры пула соединений к внешним сервисам."""
+
+    def __init__(self, max_connections: int, max_keepalive: int, keepalive_expiry: float,
+                 timeout: float, connect_timeout: float, http2: bool):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+
+    @property
+    def limits(self) -> "httpx.Limits":
+        import httpx
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeouts(self) -> "httpx.Timeout":
+        import httpx
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+class ClientManager:
+    """
+    Управляет жизненным циклом клиентов Supabase и OpenAI: создаёт их
+    с настроенными пулами соединений, отдаёт статистику пулов и закрывает
+    соединения при остановке приложения.
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str, openai_api_key: str, settings: PoolSettings):
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.openai_api_key = openai_api_key
+        self.settings = settings
+        self._lock = threading.RLock()
+        self._supabase: Optional["Client"] = None
+        self._openai: Optional["OpenAI"] = None
+        # Один пул соединений на сервис. PostgREST пересоздаёт свою сессию при каждом входе
+        # и обновлении токена, не закрывая старую: сессии — лишь обёртки над общим транспортом,
+        # поэтому число сокетов не растёт. Здесь хранится последняя сессия каждого сервиса.
+        self._transports: Dict[str, "httpx.HTTPTransport"] = {}
+        self._sessions: Dict[str, Optional["httpx.Client"]] = {"postgrest": None, "openai": None}
+        self._requests: Dict[str, int] = {"postgrest": 0, "openai": 0}
+
+    @property
+    def supabase_configured(self) -> bool:
+        return bool(self.supabase_url and self.supabase_key)
+
+    @property
+    def openai_configured(self) -> bool:
+        return bool(self.openai_api_key)
+
+    def _http_client(self, name: str, base_url: str = "", headers: Optional[Dict[str, str]] = None,
+                     timeout: Any = None, client_class=None) -> "httpx.Client":
+        import httpx
+        client_class = client_class or httpx.Client
+
+        def count_request(request: httpx.Request):
+            with self._lock:
+                self._requests[name] += 1
+
+        with self._lock:
+            transport = self._transports.get(name)
+            if transport is None:
+                transport = self._transports[name] = httpx.HTTPTransport(
+                    limits=self.settings.limits, http2=self.settings.http2)
+            client = client_class(
+                base_url=base_url,
+                headers=headers,
+                timeout=timeout if timeout is not None else self.settings.timeouts,
+                transport=transport,
+                event_hooks={"request": [count_request]},
+            )
+            self._sessions[name] = client
+        return client
+
+    def _build_supabase(self) -> "Client":
+        from postgrest import SyncPostgrestClient
+        from postgrest.utils import SyncClient
+        from supabase import Client
+        from supabase.lib.client_options import ClientOptions
+
+        manager = self
+
+        class PooledPostgrestClient(SyncPostgrestClient):
+            def create_session(self, base_url, headers, timeout) -> SyncClient:
+                return manager._http_client("postgrest", base_url, headers, manager.settings.timeouts,
+                                            client_class=SyncClient)
+
+        class PooledSupabaseClient(Client):
+            @staticmethod
+            def _init_postgrest_client(rest_url, headers, schema, timeout=None) -> SyncPostgrestClient:
+                return PooledPostgrestClient(rest_url, headers=headers, schema=schema)
+
+        options = ClientOptions(postgrest_client_timeout=self.settings.timeouts)
+        return PooledSupabaseClient(self.supabase_url, self.supabase_key, options=options)
+
+    def _build_openai(self) -> "OpenAI":
+        from openai import OpenAI
+
+        return OpenAI(
+            api_key=self.openai_api_key,
+            timeout=self.settings.timeouts,
+            http_client=self._http_client("openai"),
+        )
+
+    def get_supabase(self) -> Optional["Client"]:
+        if self._supabase is None and self.supabase_configured:
+            with self._lock:
+                if self._supabase is None:
+                    self._supabase = self._build_supabase()
+        return self._supabase
+
+    def get_openai(self) -> Optional["OpenAI"]:
+        if self._openai is None and self.openai_configured:
+            with self._lock:
+                if self._openai is None:
+                    self._openai = self._build_openai()
+        return self._openai
+
+    def startup(self, background: bool = False):
+        """
+        Создаёт клиентов заранее, чтобы первый запрос не платил за инициализацию.
+        В фоне — не задерживая старт воркера; запрос, пришедший раньше, дождётся клиента под блокировкой.
+        """
+        if background:
+            threading.Thread(target=self.startup, name="clients-warmup", daemon=True).start()
+            return
+        supabase = self.get_supabase()
+        if supabase is not None:
+            supabase.postgrest  # сессия PostgREST создаётся лениво — прогреваем её
+        self.get_openai()
+        logger.info(
+            f"Clients started: supabase={self._supabase is not None}, openai={self._openai is not None}, "
+            f"http2={self.settings.http2}, max_connections={self.settings.max_connections}"
+        )
+
+    def shutdown(self):
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+            self._sessions = {name: None for name in self._sessions}
+            self._supabase = None
+            self._openai = None
+        for transport in transports:
+            try:
+                transport.close()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP connection pool: {e}")
+        logger.info(f"Clients shut down, closed {len(transports)} connection pools")
+
+    def pool_stats(self) -> Dict[str, dict]:
+        stats = {}
+        for name, session in self._sessions.items():
+            pool = getattr(self._transports.get(name), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            stats[name] = {
+                "sessions": int(session is not None),
+                "connections": len(connections),
+                "idle_connections": sum(1 for c in connections if c.is_idle()),
+                "requests": self._requests[name],
+                "max_connections": self.settings.max_connections,
+                "max_keepalive": self.settings.max_keepalive,
+                "http2": self.settings.http2,
+            }
+        return stats
+
+
+class ClientProxy:
+    """
+    Ссылка на клиента, созданного менеджером. Позволяет модулям импортировать
+    `supabase`/`openai_client` из config как раньше, а сам клиент создаётся в lifespan.
+    """
+
+    def __init__(self, getter: Callable[[], Any], configured: Callable[[], bool]):
+        self._getter = getter
+        self._configured = configured
+
+    def __bool__(self) -> bool:
+        return self._configured()
+
+    def __getattr__(self, name: str):
+        client = self._getter()
+        if client is None:
+            raise RuntimeError("Client is not configured")
+        return getattr(client, name)
@@ -0,0 +1,272 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import supabase
+from skills import skill_key
+
+logger = logging.getLogger(__name__)
+
+# --- Аналитика по когортам студентов вуза (университет × год выпуска) ---
+
+# Как часто подтягивать изменения (по updated_at) и как часто перечитывать всё целиком
+COHORT_REFRESH_INTERVAL = float(os.getenv("COHORT_REFRESH_INTERVAL", "60"))
+COHORT_FULL_RELOAD_INTERVAL = float(os.getenv("COHORT_FULL_RELOAD_INTERVAL", "86400"))
+COHORT_PAGE_SIZE = 1000
+TOP_SKILLS = 10
+
+STUDENT_SELECT = "user_id, university, graduation_year, skills, updated_at"
+TOUCH_SELECT = "id, student_id, status, meets_criteria_rating, motivation_rating, updated_at, vacancies(is_internship)"
+
+# Коды статусов откликов; всё, чего нет в списке, — "other"
+STATUSES = ("pending", "viewed", "accepted", "rejected", "other")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+ACCEPTED = _STATUS_CODES["accepted"]
+PENDING = _STATUS_CODES["pending"]
+
+
+def university_key(name: Optional[str]) -> str:
+    """Название вуза вводится свободным текстом: сравниваем без регистра, кавычек и лишних пробелов."""
+    return " ".join((name or "").lower().replace("ё", "е").replace('"', " ").replace("«", " ").replace("»", " ").split())
+
+
+class ColumnTable:
+    """
+    Таблица в колоночном виде: по numpy-массиву на колонку и словарь ключ -> номер строки.
+    Массивы растут с запасом (удвоением), поэтому добавление и обновление строки — O(1).
+    """
+
+    def __init__(self, columns: Dict[str, tuple]):
+        # Колонка -> (dtype, значение по умолчанию)
+        self.columns = columns
+        self.index: Dict[str, int] = {}
+        self.size = 0
+        self.data = {name: np.full(16, default, dtype=dtype) for name, (dtype, default) in columns.items()}
+
+    def row(self, key: str) -> int:
+        row = self.index.get(key)
+        if row is None:
+            row = self.index[key] = self.size
+            self.size += 1
+            if self.size > len(next(iter(self.data.values()))):
+                for name, (dtype, default) in self.columns.items():
+                    grown = np.full(self.size * 2, default, dtype=dtype)
+                    grown[:row] = self.data[name][:row]
+                    self.data[name] = grown
+        return row
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.data[name][:self.size]
+
+
+class CohortEngine:
+    """
+    Снимок студентов и откликов в памяти процесса, из которого считаются
+    показатели когорт векторно (bincount по номеру когорты) без запросов к базе.
+    Снимок загружается постранично один раз, затем дополняется изменениями
+    с updated_at не раньше последнего увиденного; раз в сутки перечитывается
+    целиком, чтобы учесть удалённые строки. Готовые отчёты кэшируются до
+    следующего изменения снимка.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self.refreshed_at = 0.0
+        self.loaded_at = 0.0
+
+    def _reset(self):
+        self.students = ColumnTable({"university": (np.int32, -1), "year": (np.int32, 0)})
+        self.touches = ColumnTable({"student": (np.int32, -1), "status": (np.int8, PENDING),
+                                    "criteria": (np.float32, np.nan), "motivation": (np.float32, np.nan),
+                                    "internship": (np.bool_, False)})
+        self._universities: Dict[str, int] = {}
+        self._skill_codes: Dict[str, int] = {}
+        self._skill_names: List[str] = []
+        self._student_skills: Dict[int, np.ndarray] = {}
+        self._skills_flat = None
+        self._reports: Dict[int, dict] = {}
+        self._watermark: Optional[str] = None
+
+    # --- Загрузка снимка ---
+
+    @staticmethod
+    def _fetch(table: str, select: str, key: str, since: Optional[str]) -> List[dict]:
+        rows, start = [], 0
+        while True:
+            query = supabase.table(table).select(select)
+            if since: query = query.gte("updated_at", since)
+            page = query.order(key).range(start, start + COHORT_PAGE_SIZE - 1).execute().data
+            rows.extend(page)
+            if len(page) < COHORT_PAGE_SIZE: break
+            start += COHORT_PAGE_SIZE
+        return rows
+
+    def refresh(self, force_full: bool = False) -> bool:
+        """Подтягивает изменения, если снимок устарел; True — снимок обновлялся."""
+        now = time.time()
+        if not force_full and now - self.refreshed_at < COHORT_REFRESH_INTERVAL:
+            return False
+        full = force_full or now - self.loaded_at > COHORT_FULL_RELOAD_INTERVAL
+        since = None if full else self._watermark
+        started = time.perf_counter()
+        students = self._fetch("student_profiles", STUDENT_SELECT, "user_id", since)
+        touches = self._fetch("vacancy_touch", TOUCH_SELECT, "id", since)
+        with self._lock:
+            if full:
+                self._reset()
+                self.loaded_at = now
+            self.apply(students, touches)
+            self.refreshed_at = now
+        logger.info(f"Cohort snapshot {'loaded' if full else 'refreshed'}: {len(students)} students, "
+                    f"{len(touches)} touches in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return True
+
+    def apply(self, students: List[dict], touches: List[dict]):
+        """Вносит строки в снимок (вызывается под блокировкой или до начала работы)."""
+        for student in students:
+            row = self.students.row(student["user_id"])
+            key = university_key(student.get("university"))
+            self.students.data["university"][row] = self._universities.setdefault(key, len(self._universities)) if key else -1
+            self.students.data["year"][row] = student.get("graduation_year") or 0
+            codes = []
+            for skill in student.get("skills") or []:
+                if not isinstance(skill, str) or not skill.strip():
+                    continue
+                code = self._skill_codes.get(skill_key(skill))
+                if code is None:
+                    code = self._skill_codes[skill_key(skill)] = len(self._skill_names)
+                    self._skill_names.append(skill.strip())
+                codes.append(code)
+            self._student_skills[row] = np.unique(np.array(codes, dtype=np.int32))
+        for touch in touches:
+            row = self.touches.row(touch["id"])
+            columns = self.touches.data
+            columns["student"][row] = self.students.row(touch["student_id"]) if touch.get("student_id") else -1
+            columns["status"][row] = _STATUS_CODES.get(touch.get("status") or "pending", _STATUS_CODES["other"])
+            columns["criteria"][row] = touch.get("meets_criteria_rating") if touch.get("meets_criteria_rating") is not None else np.nan
+            columns["motivation"][row] = touch.get("motivation_rating") if touch.get("motivation_rating") is not None else np.nan
+            columns["internship"][row] = bool((touch.get("vacancies") or {}).get("is_internship"))
+        watermark = max((row["updated_at"] for row in students + touches if row.get("updated_at")), default=None)
+        if watermark and (self._watermark is None or watermark > self._watermark):
+            self._watermark = watermark
+        if students:
+            self._skills_flat = None
+        if students or touches:
+            self._reports.clear()
+
+    # --- Расчёт показателей ---
+
+    def _skills(self):
+        """Навыки всех студентов одной парой массивов (владелец, код навыка); пересобирается после изменений."""
+        if self._skills_flat is None:
+            rows = [np.full(len(codes), row, dtype=np.int32) for row, codes in self._student_skills.items()]
+            codes = list(self._student_skills.values())
+            self._skills_flat = (np.concatenate(rows) if rows else np.zeros(0, np.int32),
+                                 np.concatenate(codes) if codes else np.zeros(0, np.int32))
+        return self._skills_flat
+
+    @staticmethod
+    def _rate(part: np.ndarray, whole: np.ndarray) -> List[Optional[float]]:
+        return [round(float(p) / float(w), 4) if w else None for p, w in zip(part, whole)]
+
+    @staticmethod
+    def _mean(sums: np.ndarray, counts: np.ndarray) -> List[Optional[float]]:
+        return [round(float(s) / float(c), 1) if c else None for s, c in zip(sums, counts)]
+
+    def _compute(self, university: int) -> dict:
+        students, touches = self.students, self.touches
+        in_university = students["university"] == university
+        years = np.unique(students["year"][in_university])
+        k = len(years) + 1  # последняя строка — итог по вузу
+        # Номер когорты для каждого студента; -1 — студент другого вуза
+        cohort = np.full(students.size, -1, dtype=np.int64)
+        cohort[in_university] = np.searchsorted(years, students["year"][in_university])
+
+        touch_student = touches["student"]
+        touch_cohort = np.where(touch_student >= 0, cohort[touch_student], -1) if touches.size else np.zeros(0, np.int64)
+        mask = touch_cohort >= 0
+        tc, status, student = touch_cohort[mask], touches["status"][mask], touch_student[mask]
+        criteria, motivation, internship = touches["criteria"][mask], touches["motivation"][mask], touches["internship"][mask]
+
+        def per_cohort(index: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+            counts = np.bincount(index, weights=weights, minlength=k - 1)
+            return np.append(counts, counts.sum())
+
+        def unique_students(selector: np.ndarray) -> np.ndarray:
+            return per_cohort(cohort[np.unique(student[selector])])
+
+        student_counts = per_cohort(cohort[in_university])
+        applications = per_cohort(tc)
+        statuses = np.bincount(tc * len(STATUSES) + status, minlength=(k - 1) * len(STATUSES)).reshape(k - 1, len(STATUSES))
+        statuses = np.vstack([statuses, statuses.sum(axis=0)])
+        responded = applications - statuses[:, PENDING]
+        applicants = unique_students(np.ones(len(tc), dtype=bool))
+        rated_criteria, rated_motivation = ~np.isnan(criteria), ~np.isnan(motivation)
+        criteria_sum = per_cohort(tc[rated_criteria], criteria[rated_criteria].astype(np.float64))
+        criteria_count = per_cohort(tc[rated_criteria])
+        motivation_sum = per_cohort(tc[rated_motivation], motivation[rated_motivation].astype(np.float64))
+        motivation_count = per_cohort(tc[rated_motivation])
+        internship_applications = per_cohort(tc[internship])
+        placed = unique_students(internship & (status == ACCEPTED))
+
+        # Распределение навыков: счётчики (когорта × навык) одним bincount
+        owners, codes = self._skills()
+        skill_cohort = cohort[owners] if len(owners) else np.zeros(0, np.int64)
+        skill_mask = skill_cohort >= 0
+        vocabulary = max(len(self._skill_names), 1)
+        skill_counts = np.bincount(skill_cohort[skill_mask] * vocabulary + codes[skill_mask],
+                                   minlength=(k - 1) * vocabulary).reshape(k - 1, vocabulary)
+        skill_counts = np.vstack([skill_counts, skill_counts.sum(axis=0)])
+        top = np.argsort(-skill_counts, axis=1, kind="stable")[:, :TOP_SKILLS]
+
+        application_rate = self._rate(applicants, student_counts)
+        response_rate = self._rate(responded, applications)
+        placement_rate = self._rate(placed, student_counts)
+        avg_criteria = self._mean(criteria_sum, criteria_count)
+        avg_motivation = self._mean(motivation_sum, motivation_count)
+        rows = []
+        for i in range(k):
+            rows.append({
+                "graduation_year": (int(years[i]) or None) if i < k - 1 else None,
+                "students": int(student_counts[i]),
+                "applicants": int(applicants[i]),
+                "applications": int(applications[i]),
+                "application_rate": application_rate[i],
+                "response_rate": response_rate[i],
+                "statuses": {name: int(statuses[i, code]) for code, name in enumerate(STATUSES)},
+                "avg_criteria_rating": avg_criteria[i],
+                "avg_motivation_rating": avg_motivation[i],
+                "rated": int(criteria_count[i]),
+                "internship_applications": int(internship_applications[i]),
+                "internship_placed": int(placed[i]),
+                "placement_rate": placement_rate[i],
+                "top_skills": [{"skill": self._skill_names[code], "students": int(skill_counts[i, code])}
+                               for code in top[i] if skill_counts[i, code]],
+            })
+        return {"cohorts": rows[:-1], "total": rows[-1]}
+
+    def report(self, university_name: str) -> dict:
+        with self._lock:
+            code = self._universities.get(university_key(university_name))
+            if code is None:
+                result = {"cohorts": [], "total": None}
+            else:
+                result = self._reports.get(code)
+                if result is None:
+                    result = self._reports[code] = self._compute(code)
+            refreshed_at = datetime.fromtimestamp(self.refreshed_at, timezone.utc).isoformat() if self.refreshed_at else None
+        return {"university": university_name, "refreshed_at": refreshed_at, **result}
+
+    def stats(self) -> dict:
+        return {"students": self.students.size, "touches": self.touches.size, "universities": len(self._universities),
+                "skills": len(self._skill_names), "cached_reports": len(self._reports),
+                "refreshed_at": self.refreshed_at, "loaded_at": self.loaded_at}
+
+
+cohort_engine = CohortEngine()
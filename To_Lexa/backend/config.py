@@ -1,10 +1,9 @@
 import os
 import logging
-from supabase import create_client, Client
-from openai import OpenAI
-from typing import Optional
 from dotenv import load_dotenv
 
+from clients import ClientManager, ClientProxy, PoolSettings
+
 # --- Конфигурация логирования ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,13 +15,19 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY", "").strip()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
 SECRET_KEY = os.getenv("SECRET_KEY", "")
 
+# --- Пулы соединений к Supabase и OpenAI ---
+HTTP_POOL_SETTINGS = PoolSettings(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "50")),
+    max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30")),
+    timeout=float(os.getenv("HTTP_TIMEOUT", "30")),
+    connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    http2=os.getenv("HTTP2_ENABLED", "true").lower() == "true",
+)
 
-# --- Инициализация клиентов ---
-supabase: Optional[Client] = None
-openai_client: Optional[OpenAI] = None
-
-if SUPABASE_URL and SUPABASE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
\ No newline at end of file
+# --- Инициализация клиентов ---
+# Клиенты создаются в lifespan приложения (main.py), при первом обращении — лениво
+clients = ClientManager(SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY, HTTP_POOL_SETTINGS)
+supabase = ClientProxy(clients.get_supabase, lambda: clients.supabase_configured)
+openai_client = ClientProxy(clients.get_openai, lambda: clients.openai_configured)
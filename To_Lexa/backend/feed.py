@@ -0,0 +1,101 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from invalidation import bus
+from search import search_index, tokenize
+
+# --- Персональная лента вакансий для студентов ---
+
+FEED_SIZE = 30
+
+
+def student_terms(profile: Optional[dict], resumes: List[dict]) -> List[str]:
+    """Термины интересов студента: навыки и специальность из профиля, заголовки и навыки резюме."""
+    profile = profile or {}
+    parts = list(profile.get("skills") or []) + [profile.get("major") or ""]
+    for resume in resumes:
+        parts.append(resume.get("title") or "")
+        parts.extend(resume.get("skills") or [])
+    return sorted(set(tokenize(" ".join(parts))))
+
+
+class FeedStore:
+    """
+    Готовые top-K ленты по студентам. Лента считается в фоне при изменении
+    профиля или резюме, а при одобрении вакансии она лишь сравнивается
+    с худшим элементом каждой ленты — полный пересчёт не нужен.
+    Чтение ленты — поиск в словаре.
+    """
+
+    def __init__(self, size: int = FEED_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._feeds: Dict[str, dict] = {}
+        # Загружены ли в память ленты всех студентов (нужно для пакетного обновления)
+        self.loaded = False
+
+    def load(self, rows: List[dict]):
+        with self._lock:
+            self._feeds = {row["student_id"]: row for row in rows}
+            self.loaded = True
+
+    def get(self, student_id: str) -> Optional[dict]:
+        return self._feeds.get(student_id)
+
+    def put(self, student_id: str, terms: List[str], items: List[dict],
+            updated_at: Optional[str] = None, broadcast: bool = True) -> dict:
+        feed = {
+            "student_id": student_id,
+            "terms": terms,
+            "items": items,
+            "updated_at": updated_at or datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            self._feeds[student_id] = feed
+        if broadcast:
+            bus.publish("feed", student_id)
+        return feed
+
+    def build(self, student_id: str, terms: List[str], broadcast: bool = True) -> dict:
+        items = [{"vacancy_id": vacancy_id, "score": score}
+                 for vacancy_id, score in search_index.top_k(terms, self.size)]
+        return self.put(student_id, terms, items, broadcast=broadcast)
+
+    def add_vacancy(self, vacancy_id: str) -> List[dict]:
+        """Встраивает одобренную вакансию в ленты, где она лучше последнего элемента."""
+        changed = []
+        with self._lock:
+            feeds = list(self._feeds.values())
+        for feed in feeds:
+            score = search_index.score_document(feed["terms"], vacancy_id)
+            items = [i for i in feed["items"] if i["vacancy_id"] != vacancy_id]
+            if score <= 0 or (len(items) >= self.size and score <= items[-1]["score"]):
+                continue
+            items.append({"vacancy_id": vacancy_id, "score": score})
+            items.sort(key=lambda i: i["score"], reverse=True)
+            changed.append(self.put(feed["student_id"], feed["terms"], items[:self.size], broadcast=False))
+        if changed:
+            bus.publish("feed", "*")
+        return changed
+
+    def remove_vacancy(self, vacancy_id: str) -> List[dict]:
+        """Убирает вакансию из лент и добирает их до полного размера."""
+        with self._lock:
+            affected = [f for f in self._feeds.values() if any(i["vacancy_id"] == vacancy_id for i in f["items"])]
+        changed = [self.build(feed["student_id"], feed["terms"], broadcast=False) for feed in affected]
+        if changed:
+            bus.publish("feed", "*")
+        return changed
+
+    def invalidate(self, student_id: str):
+        with self._lock:
+            if student_id == "*":
+                self._feeds.clear()
+                self.loaded = False
+            else:
+                self._feeds.pop(student_id, None)
+
+
+feed_store = FeedStore()
+bus.subscribe("feed", feed_store.invalidate)
@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+
+from config import supabase
+
+logger = logging.getLogger(__name__)
+
+# --- Воронка откликов: счётчики по вакансиям и компаниям ---
+
+FUNNEL_STATUSES = ("pending", "viewed", "accepted", "rejected")
+# Как часто воркеры предлагают сверку счётчиков; база выполняет её не чаще этого интервала
+FUNNEL_RECONCILE_INTERVAL = int(os.getenv("FUNNEL_RECONCILE_INTERVAL", "900"))
+FUNNEL_SELECT = "vacancy_id, pending, viewed, accepted, rejected, total, updated_at"
+
+# Этапы воронки: отклик -> рассмотрен работодателем -> принят
+FUNNEL_STAGES = (
+    ("responses", ("pending", "viewed", "accepted", "rejected")),
+    ("reviewed", ("viewed", "accepted", "rejected")),
+    ("accepted", ("accepted",)),
+)
+
+
+def empty_counts() -> Dict[str, int]:
+    return {status: 0 for status in (*FUNNEL_STATUSES, "total")}
+
+
+def conversion(counts: Dict[str, int]) -> List[dict]:
+    """Этапы воронки с конверсией от предыдущего этапа и от числа откликов."""
+    stages, previous = [], None
+    responses = counts.get("total", 0)
+    for name, statuses in FUNNEL_STAGES:
+        value = responses if name == "responses" else sum(counts.get(status, 0) for status in statuses)
+        stages.append({
+            "stage": name,
+            "count": value,
+            "from_previous": round(value / previous, 4) if previous else None,
+            "from_responses": round(value / responses, 4) if responses else None,
+        })
+        previous = value
+    return stages
+
+
+class FunnelCounters:
+    """
+    Чтение счётчиков воронки, которые ведёт триггер в базе (migrations/006_vacancy_funnel.sql):
+    строка на вакансию с числом откликов в каждом статусе и дневные переходы
+    между статусами. Фоновый поток периодически вызывает сверку счётчиков
+    с vacancy_touch; при нескольких воркерах база выполняет её один раз за интервал.
+    """
+
+    def __init__(self, reconcile_interval: int = FUNNEL_RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def for_company(self, company_id: str) -> Dict[str, dict]:
+        rows = supabase.table("vacancy_funnel").select(FUNNEL_SELECT).eq("company_id", company_id).execute().data
+        return {row["vacancy_id"]: row for row in rows}
+
+    def daily(self, company_id: str, since: date, vacancy_id: Optional[str] = None) -> List[dict]:
+        """Переходы в статусы по дням (с since включительно), суммарно по компании или по одной вакансии."""
+        query = supabase.table("vacancy_funnel_daily").select("day, status, entered") \
+            .eq("company_id", company_id).gte("day", since.isoformat())
+        if vacancy_id: query = query.eq("vacancy_id", vacancy_id)
+        days: Dict[str, Dict[str, int]] = {}
+        for row in query.order("day").execute().data:
+            counts = days.setdefault(row["day"], {status: 0 for status in FUNNEL_STATUSES})
+            if row["status"] in counts:
+                counts[row["status"]] += row["entered"]
+        return [{"day": day, **counts} for day, counts in days.items()]
+
+    @staticmethod
+    def totals(rows) -> Dict[str, int]:
+        counts = empty_counts()
+        for row in rows:
+            for key in counts:
+                counts[key] += row.get(key) or 0
+        return counts
+
+    def reconcile(self, min_interval: int = 0) -> int:
+        """Сверка счётчиков с vacancy_touch; число исправленных вакансий, -1 — сверку недавно выполнил другой воркер."""
+        fixed = supabase.rpc("vacancy_funnel_reconcile", {"min_interval_seconds": min_interval}).execute().data
+        if fixed and fixed > 0:
+            logger.warning(f"Funnel reconcile fixed drifted counters for {fixed} vacancies")
+        return fixed
+
+    def _loop(self):
+        while not self._stop.wait(self.reconcile_interval):
+            try:
+                self.reconcile(self.reconcile_interval)
+            except Exception as e:
+                logger.warning(f"Funnel reconcile failed: {e}")
+
+    def start(self):
+        if self._thread or not supabase or self.reconcile_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="funnel-reconcile", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+funnel = FunnelCounters()
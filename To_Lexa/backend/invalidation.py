@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Каталог с Unix-сокетами воркеров; общий для всех процессов одного сервера
+BUS_DIR = os.getenv("INVALIDATION_BUS_DIR", os.path.join(tempfile.gettempdir(), "career-center-bus"))
+
+
+class InvalidationBus:
+    """
+    Канал инвалидации кэшей между воркерами. Каждый процесс слушает свой
+    датаграммный Unix-сокет в общем каталоге; publish рассылает сообщение
+    всем остальным процессам, и те вызывают подписанные обработчики.
+    Пока канал не запущен (один процесс, dev-режим), publish ничего не делает.
+    """
+
+    def __init__(self, directory: str = BUS_DIR):
+        self.directory = directory
+        self._handlers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self._sock = None
+        self._path = None
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._sock is not None
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        self._handlers[channel].append(handler)
+
+    def start(self):
+        if self.running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._path = os.path.join(self.directory, f"{os.getpid()}.sock")
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self._path)
+        self._thread = threading.Thread(target=self._listen, name="invalidation-bus", daemon=True)
+        self._thread.start()
+        logger.info(f"Invalidation bus listening on {self._path}")
+
+    def stop(self):
+        sock, self._sock = self._sock, None
+        if sock is None:
+            return
+        sock.close()
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+
+    def publish(self, channel: str, key: str):
+        """Отправляет инвалидацию остальным воркерам (в текущем процессе кэш чистит вызывающий код)."""
+        if not self.running:
+            return
+        payload = json.dumps({"channel": channel, "key": key}).encode()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == self._path or not name.endswith(".sock"):
+                continue
+            try:
+                self._sock.sendto(payload, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Воркер завершился, не убрав сокет
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as e:
+                logger.warning(f"Invalidation bus send to {path} failed: {e}")
+
+    def _listen(self):
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                break
+            try:
+                message = json.loads(data)
+                for handler in self._handlers.get(message["channel"], []):
+                    handler(message["key"])
+            except Exception as e:
+                logger.warning(f"Invalidation bus message error: {e}")
+
+
+bus = InvalidationBus()
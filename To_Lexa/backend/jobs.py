@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Локальная очередь фоновых задач (SQLite) ---
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    owner_id TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    locked_at REAL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (status, priority DESC, run_at);
+CREATE INDEX IF NOT EXISTS jobs_owner_idx ON jobs (owner_id, created_at DESC);
+"""
+
+
+class PermanentJobError(Exception):
+    """Ошибка, которую бесполезно повторять: задача сразу уходит в dead-letter."""
+
+
+class JobQueue:
+    """
+    Очередь задач в локальном SQLite-файле: приоритеты, повторы с экспоненциальной
+    задержкой, dead-letter и восстановление зависших задач после перезапуска.
+    Файл общий для всех воркеров сервера, задача захватывается атомарно.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS,
+                 poll_interval: float = 0.5, backoff_base: float = 2.0, backoff_max: float = 300.0,
+                 visibility_timeout: float = 600.0):
+        self.path = path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.visibility_timeout = visibility_timeout
+        self._handlers: Dict[str, Callable[[dict], Optional[dict]]] = {}
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            conn.executescript(_SCHEMA)
+            self._initialized = True
+        return conn
+
+    def handler(self, kind: str):
+        """Декоратор: регистрирует обработчик задач данного типа."""
+        def decorator(func: Callable[[dict], Optional[dict]]):
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind: str, payload: dict, owner_id: Optional[str] = None,
+                priority: int = PRIORITY_NORMAL, max_attempts: int = 5, delay: float = 0.0) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, payload, owner_id, priority, status, max_attempts, run_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), owner_id, priority, max_attempts, now + delay, now, now),
+        )
+        self._wakeup.set()
+        return job_id
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND run_at <= ? ORDER BY priority DESC, run_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_at = ?, updated_at = ? WHERE id = ?",
+                    (now, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _finish(self, job_id: str, status: str, error: Optional[str] = None,
+                result: Optional[dict] = None, run_at: Optional[float] = None):
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, last_error = ?, result = ?, locked_at = NULL, "
+            "run_at = COALESCE(?, run_at), updated_at = ? WHERE id = ?",
+            (status, error, json.dumps(result) if result is not None else None, run_at, now, job_id),
+        )
+
+    def _run(self, row: sqlite3.Row):
+        attempts = row["attempts"] + 1
+        handler = self._handlers.get(row["kind"])
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler for job kind '{row['kind']}'")
+            result = handler(json.loads(row["payload"]))
+            self._finish(row["id"], "done", result=result)
+        except PermanentJobError as e:
+            logger.error(f"Job {row['id']} ({row['kind']}) failed permanently: {e}")
+            self._finish(row["id"], "dead", error=str(e))
+        except Exception as e:
+            if attempts >= row["max_attempts"]:
+                logger.error(f"Job {row['id']} ({row['kind']}) moved to dead-letter after {attempts} attempts: {e}")
+                self._finish(row["id"], "dead", error=str(e))
+            else:
+                delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max) * random.uniform(0.8, 1.2)
+                logger.warning(f"Job {row['id']} ({row['kind']}) attempt {attempts} failed, retry in {delay:.1f}s: {e}")
+                self._finish(row["id"], "queued", error=str(e), run_at=time.time() + delay)
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                logger.warning(f"Job queue claim error: {e}")
+                row = None
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(row)
+
+    def recover(self) -> int:
+        """Возвращает в очередь задачи, которые остались 'running' после падения воркера."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', locked_at = NULL, updated_at = ? "
+            "WHERE status = 'running' AND locked_at < ?",
+            (time.time(), time.time() - self.visibility_timeout),
+        )
+        return cursor.rowcount
+
+    def start(self):
+        if self._threads:
+            return
+        recovered = self.recover()
+        if recovered:
+            logger.info(f"Job queue recovered {recovered} stalled jobs")
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job queue started: {self.workers} workers, db={self.path}")
+
+    def stop(self, timeout: float = 10.0):
+        """Останавливает воркеров; незавершённые задачи будут подобраны после перезапуска."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[dict]:
+        query, params = "SELECT * FROM jobs WHERE 1 = 1", []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [self._to_dict(row) for row in self._conn().execute(query, params).fetchall()]
+
+    def stats(self) -> dict:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "done": 0, "dead": 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def retry(self, job_id: str) -> bool:
+        """Возвращает задачу из dead-letter в очередь."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, run_at = ?, updated_at = ? WHERE id = ? AND status = 'dead'",
+            (time.time(), time.time(), job_id),
+        )
+        self._wakeup.set()
+        return cursor.rowcount > 0
+
+
+job_queue = JobQueue()
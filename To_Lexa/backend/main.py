@@ -1,19 +1,45 @@
-import uvicorn
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 # Импорт конфигурации и роутеров
-from config import supabase, openai_client
+from config import supabase, openai_client, clients
 from auth import router as auth_router
 from api import router as api_router
 from spa import router as spa_router
+from invalidation import bus
+from jobs import job_queue
+from repository import repository
+from funnel import funnel
+from admission import AdmissionMiddleware
+
+CLIENTS_WARMUP_BACKGROUND = os.getenv("CLIENTS_WARMUP_BACKGROUND", "true").lower() == "true"
+
+# --- Жизненный цикл клиентов ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Клиенты прогреваются в фоне: воркер начинает принимать запросы сразу
+    clients.startup(background=CLIENTS_WARMUP_BACKGROUND)
+    bus.start()
+    job_queue.start()
+    repository.start()
+    funnel.start()
+    yield
+    funnel.stop()
+    repository.stop()
+    job_queue.stop()
+    bus.stop()
+    clients.shutdown()
+
 
 # --- Инициализация приложения FastAPI ---
-app = FastAPI(title="Карьерный центр Технополис Москва")
+app = FastAPI(title="Карьерный центр Технополис Москва", lifespan=lifespan)
 
 # --- Middleware ---
+# Контроль допуска добавляется первым, чтобы CORS оборачивал и ответы 429/503
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -34,7 +60,14 @@ app.include_router(spa_router) # SPA роутер должен быть посл
 # --- Запуск ---
 if __name__ == "__main__":
     print("🚀 Запуск Карьерного центра Технополис Москва")
-    print(f"📊 Supabase подключен: {supabase is not None}")
-    print(f"🤖 OpenAI настроен: {openai_client is not None}")
+    print(f"📊 Supabase подключен: {bool(supabase)}")
+    print(f"🤖 OpenAI настроен: {bool(openai_client)}")
     print("🌐 Сервер доступен на http://localhost:8000")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    if os.getenv("APP_ENV") == "production":
+        # Несколько воркеров по числу ядер, см. server.py
+        from server import run, default_workers
+        print(f"🏭 Production-режим: {default_workers()} воркеров")
+        run(host="0.0.0.0", port=8000)
+    else:
+        import uvicorn
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
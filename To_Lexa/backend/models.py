@@ -109,7 +109,9 @@ class UniversityProfile(BaseModel):
 class Appointment(BaseModel):
     student_id: str
     company_id: Optional[str] = None
+    consultant_id: Optional[str] = None  # Консультант карьерного центра (если встреча не с компанией)
     appointment_date: datetime
+    duration_minutes: int = 30
     appointment_type: str
     notes: Optional[str] = None
 
@@ -134,6 +136,17 @@ class VacancyTouch(BaseModel):
     additional_info: Optional[str] = None  # Дополнительный текст для этой вакансии
     status: str = "pending"  # Статус: pending, viewed, accepted, rejected
 
+class TouchStatus(str, Enum):
+    pending = "pending"
+    viewed = "viewed"
+    accepted = "accepted"
+    rejected = "rejected"
+
+
+class VacancyTouchStatusUpdate(BaseModel):
+    status: TouchStatus
+
+
 class VacancyTouchCreate(BaseModel):
     vacancy_id: str
     student_id: str
@@ -141,3 +154,26 @@ class VacancyTouchCreate(BaseModel):
     additional_info: Optional[str] = None
 
 
+
+
+class ModerationAction(str, Enum):
+    approve = "approve"
+    reject = "reject"
+    delete = "delete"
+    prioritize = "prioritize"
+
+
+class ModerationBatch(BaseModel):
+    action: ModerationAction
+    vacancy_ids: List[str]
+    priority: Optional[int] = None
+
+    @model_validator(mode='after')
+    def check_batch(self):
+        """Пакет не пустой, без повторов; для prioritize нужен приоритет."""
+        self.vacancy_ids = list(dict.fromkeys(self.vacancy_ids))
+        if not self.vacancy_ids:
+            raise ValueError("vacancy_ids must not be empty")
+        if self.action == ModerationAction.prioritize and self.priority is None:
+            raise ValueError("priority is required for the prioritize action")
+        return self
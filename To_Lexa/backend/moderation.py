@@ -0,0 +1,105 @@
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from config import supabase
+
+logger = logging.getLogger(__name__)
+
+# --- Очередь модерации вакансий: страницы ожидающих, пакетные действия, лента изменений ---
+
+# Сколько вакансий можно обработать одним запросом модератора
+MODERATION_BATCH_MAX = int(os.getenv("MODERATION_BATCH_MAX", "500"))
+MODERATION_PAGE_MAX = 200
+# Длина списка id в одном in_(): фильтр уходит в URL запроса, а прокси перед PostgREST режут длинные строки
+IN_CHUNK = 200
+# Больше изменений с прошлого опроса лента не отдаёт — клиент перечитывает список целиком
+CHANGES_MAX = int(os.getenv("MODERATION_CHANGES_MAX", "1000"))
+CHANGES_OVERLAP = 5
+QUEUE_SELECT = "*, company_profiles(company_name)"
+# Статус, который получает вакансия при каждом действии (delete удаляет строку)
+ACTION_STATUS = {"approve": "active", "reject": "rejected"}
+
+
+def _chunks(ids: List[str]):
+    for start in range(0, len(ids), IN_CHUNK):
+        yield ids[start:start + IN_CHUNK]
+
+
+def split_ids(vacancy_ids: List[str]) -> Tuple[List[str], List[str]]:
+    """Корректные id в каноническом виде и некорректные: один битый uuid в in_() валит весь запрос (22P02)."""
+    valid, invalid = [], []
+    for vacancy_id in vacancy_ids:
+        try:
+            valid.append(str(uuid.UUID(vacancy_id)))
+        except ValueError:
+            invalid.append(vacancy_id)
+    return list(dict.fromkeys(valid)), invalid
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ModerationQueue:
+    """
+    Очередь вакансий на модерацию поверх таблицы vacancies (migrations/007_moderation_queue.sql).
+    Ожидающие отдаются страницами по приоритету и возрасту; действия применяются
+    к пачке id одним обновлением (in_ по IN_CHUNK id); лента изменений по updated_at и журналу удалений
+    позволяет панели модератора дочитывать только то, что поменялось.
+    """
+
+    def page(self, limit: int = 50, offset: int = 0) -> Dict:
+        """Страница ожидающих: сначала с большим приоритетом, внутри — самые старые."""
+        result = supabase.table("vacancies").select(QUEUE_SELECT, count="exact").eq("status", "pending") \
+            .order("moderation_priority", desc=True).order("created_at").order("id") \
+            .range(offset, offset + limit - 1).execute()
+        return {"items": result.data, "total": result.count or 0, "limit": limit, "offset": offset}
+
+    def apply(self, action: str, vacancy_ids: List[str], priority: Optional[int] = None) -> List[dict]:
+        """Применяет действие к пачке вакансий; возвращает затронутые строки (для delete — удалённые)."""
+        rows = []
+        for chunk in _chunks(vacancy_ids):
+            table = supabase.table("vacancies")
+            if action == "delete":
+                query = table.delete()
+            elif action == "prioritize":
+                query = table.update({"moderation_priority": priority})
+            else:
+                query = table.update({"status": ACTION_STATUS[action]})
+            rows.extend(query.in_("id", chunk).execute().data)
+        logger.info(f"Moderation {action}: {len(rows)} of {len(vacancy_ids)} vacancies")
+        return rows
+
+    def changes(self, since: Optional[datetime] = None) -> Dict:
+        """
+        Вакансии, изменённые после since, и id удалённых. Без since — только курсор
+        для следующего запроса. reset — изменений слишком много, проще перечитать список.
+        """
+        now = datetime.now(timezone.utc)
+        # Строка может закоммититься позже своего updated_at: курсор отстаёт от текущего
+        # времени на CHANGES_OVERLAP секунд, повторно присланные строки клиент просто перезапишет
+        settled = now - timedelta(seconds=CHANGES_OVERLAP)
+        if since is None:
+            return {"changed": [], "deleted": [], "cursor": settled.isoformat(), "reset": False}
+        since_iso = _utc(since).isoformat()
+        changed = supabase.table("vacancies").select(QUEUE_SELECT).gt("updated_at", since_iso) \
+            .order("updated_at").limit(CHANGES_MAX + 1).execute().data
+        deleted = supabase.table("vacancy_deletions").select("vacancy_id, deleted_at").gt("deleted_at", since_iso) \
+            .order("deleted_at").limit(CHANGES_MAX + 1).execute().data
+        if len(changed) > CHANGES_MAX or len(deleted) > CHANGES_MAX:
+            return {"changed": [], "deleted": [], "cursor": settled.isoformat(), "reset": True}
+        marks = [datetime.fromisoformat(row["updated_at"]) for row in changed[-1:]] + \
+                [datetime.fromisoformat(row["deleted_at"]) for row in deleted[-1:]]
+        cursor = min(max(marks, default=_utc(since)), settled)
+        return {
+            "changed": changed,
+            "deleted": [row["vacancy_id"] for row in deleted],
+            "cursor": cursor.isoformat(),
+            "reset": False,
+        }
+
+
+moderation_queue = ModerationQueue()
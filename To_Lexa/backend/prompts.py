@@ -0,0 +1,109 @@
+import logging
+import math
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Подсчёт токенов и сборка промптов под бюджет ---
+
+# tiktoken необязателен: без него (или без скачанного словаря) токены оцениваются по байтам.
+# Импортируется при первом подсчёте токенов, а не при старте приложения
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(f"tiktoken encoding unavailable, using byte estimate: {type(e).__name__}")
+    return _encoding
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Число токенов; без tiktoken — оценка сверху (4 байта UTF-8 на токен)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+def truncate_to_tokens(text: Optional[str], budget: int) -> str:
+    """Обрезает текст до бюджета токенов по границе слова, с многоточием."""
+    text = (text or "").strip()
+    if budget <= 0:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text)[:max(budget - 1, 0)])
+    else:
+        cut = text.encode("utf-8")[:max(budget - 1, 0) * 4].decode("utf-8", errors="ignore")
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+def pack_lines(lines: List[str], budget: int) -> List[str]:
+    """Берёт строки по порядку, пока они помещаются в бюджет."""
+    packed, used = [], 0
+    for line in lines:
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        packed.append(line)
+        used += cost
+    return packed
+
+
+_SPACES_RE = re.compile(r"[ \t]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def compress(text: Optional[str]) -> str:
+    """Сжимает текст без потери смысла: лишние пробелы и пустые строки, повторяющиеся предложения."""
+    seen, sentences = set(), []
+    for line in (text or "").splitlines():
+        for sentence in _SENTENCE_RE.split(_SPACES_RE.sub(" ", line).strip()):
+            key = sentence.lower()
+            if sentence and key not in seen:
+                seen.add(key)
+                sentences.append(sentence)
+    return " ".join(sentences)
+
+
+class PromptField:
+    """Поле промпта: чем меньше priority, тем раньше поле урезается при нехватке бюджета."""
+
+    def __init__(self, name: str, text: Optional[str], priority: int, min_tokens: int = 0):
+        self.name = name
+        self.text = compress(text)
+        self.priority = priority
+        self.min_tokens = min_tokens
+        self.tokens = count_tokens(self.text)
+
+
+def fit_fields(fields: List[PromptField], budget: int) -> Dict[str, str]:
+    """
+    Укладывает поля в бюджет токенов: сначала всё сжимается, затем поля
+    с наименьшим приоритетом обрезаются до min_tokens, пока сумма не влезет.
+    Поля с min_tokens=0 при нехватке бюджета могут выпасть целиком.
+    """
+    total = sum(field.tokens for field in fields)
+    limits = {field.name: field.tokens for field in fields}
+    for field in sorted(fields, key=lambda f: f.priority):
+        if total <= budget:
+            break
+        allowed = max(field.min_tokens, field.tokens - (total - budget))
+        if allowed < field.tokens:
+            total -= field.tokens - allowed
+            limits[field.name] = allowed
+    return {field.name: truncate_to_tokens(field.text, limits[field.name]) for field in fields}
@@ -0,0 +1,137 @@
+import heapq
+import re
+import threading
+from typing import Dict, List, Optional
+
+from config import logger
+from invalidation import bus
+
+# --- Ранжирование откликов по AI-оценкам ---
+
+# Минимальный набор полей для таблицы лидеров: полные резюме в браузер не уходят
+RANKING_SELECT = (
+    "id, student_id, status, created_at, meets_criteria_rating, motivation_rating, "
+    "users:student_id(full_name, email), resumes:resume_id(title, skills)"
+)
+
+_WORD_RE = re.compile(r"[\w+#.]+", re.UNICODE)
+
+
+def _tokens(text: Optional[str]) -> set:
+    return {t.strip(".").lower() for t in _WORD_RE.findall(text or "") if t.strip(".")}
+
+
+def skill_overlap(vacancy: dict, skills: Optional[List[str]]) -> float:
+    """Доля навыков из резюме, упомянутых в описании или требованиях вакансии (0..100)."""
+    if not skills:
+        return 0.0
+    vacancy_tokens = _tokens(vacancy.get("requirements")) | _tokens(vacancy.get("description"))
+    if not vacancy_tokens:
+        return 0.0
+    matched = sum(1 for skill in skills if _tokens(skill) and _tokens(skill) <= vacancy_tokens)
+    return round(100.0 * matched / len(skills), 1)
+
+
+def _rating(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def build_entry(touch: dict, vacancy: dict) -> dict:
+    """Компактная запись отклика с компонентами оценки."""
+    resume = touch.get("resumes") or {}
+    user = touch.get("users") or {}
+    return {
+        "touch_id": touch.get("id"),
+        "student_id": touch.get("student_id"),
+        "full_name": user.get("full_name"),
+        "email": user.get("email"),
+        "resume_title": resume.get("title"),
+        "status": touch.get("status"),
+        "created_at": touch.get("created_at"),
+        "meets_criteria_rating": _rating(touch.get("meets_criteria_rating")),
+        "motivation_rating": _rating(touch.get("motivation_rating")),
+        "skill_overlap": skill_overlap(vacancy, resume.get("skills")),
+    }
+
+
+def composite_score(entry: dict, w_criteria: float, w_motivation: float, w_skills: float) -> float:
+    total_weight = w_criteria + w_motivation + w_skills
+    if total_weight <= 0:
+        return 0.0
+    score = (w_criteria * (entry["meets_criteria_rating"] or 0)
+             + w_motivation * (entry["motivation_rating"] or 0)
+             + w_skills * entry["skill_overlap"])
+    return round(score / total_weight, 2)
+
+
+def top_n(entries: List[dict], n: int, w_criteria: float, w_motivation: float, w_skills: float) -> List[dict]:
+    """Возвращает N лучших откликов: heapq.nlargest держит кучу размера N, а не сортирует всё."""
+    scored = (
+        (composite_score(e, w_criteria, w_motivation, w_skills), e.get("created_at") or "", e)
+        for e in entries
+    )
+    best = heapq.nlargest(n, scored, key=lambda item: (item[0], item[1]))
+    return [{**entry, "score": score} for score, _, entry in best]
+
+
+class RankingCache:
+    """
+    Кэш компонентов оценки по вакансиям. Отклики загружаются один раз,
+    далее запись обновляется инкрементально при сохранении новой AI-оценки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vacancies: Dict[str, dict] = {}
+        self._entries: Dict[str, Dict[str, dict]] = {}
+
+    def get(self, vacancy_id: str) -> Optional[List[dict]]:
+        with self._lock:
+            entries = self._entries.get(vacancy_id)
+            return list(entries.values()) if entries is not None else None
+
+    def load(self, vacancy: dict, touches: List[dict]) -> List[dict]:
+        entries = {t["id"]: build_entry(t, vacancy) for t in touches}
+        with self._lock:
+            self._vacancies[vacancy["id"]] = vacancy
+            self._entries[vacancy["id"]] = entries
+        return list(entries.values())
+
+    def update_touch(self, vacancy_id: str, touch: dict):
+        """Обновляет одну запись; если вакансия ещё не загружена — только оповещает другие воркеры."""
+        # Другие воркеры перечитают вакансию при следующем запросе
+        bus.publish("ranking", vacancy_id)
+        with self._lock:
+            entries = self._entries.get(vacancy_id)
+            if entries is None:
+                return
+            current = entries.get(touch.get("id"), {})
+            merged = {
+                "id": touch.get("id"),
+                "student_id": touch.get("student_id", current.get("student_id")),
+                "status": touch.get("status", current.get("status")),
+                "created_at": touch.get("created_at", current.get("created_at")),
+                "meets_criteria_rating": touch.get("meets_criteria_rating"),
+                "motivation_rating": touch.get("motivation_rating"),
+                "users": touch.get("users") or {"full_name": current.get("full_name"), "email": current.get("email")},
+                "resumes": touch.get("resumes") or {"title": current.get("resume_title")},
+            }
+            entry = build_entry(merged, self._vacancies[vacancy_id])
+            if not touch.get("resumes") and current:
+                entry["skill_overlap"] = current["skill_overlap"]
+            entries[entry["touch_id"]] = entry
+        logger.debug(f"Ranking cache updated for vacancy {vacancy_id}, touch {touch.get('id')}")
+
+    def invalidate(self, vacancy_id: str, broadcast: bool = True):
+        with self._lock:
+            self._vacancies.pop(vacancy_id, None)
+            self._entries.pop(vacancy_id, None)
+        if broadcast:
+            bus.publish("ranking", vacancy_id)
+
+
+ranking_cache = RankingCache()
+bus.subscribe("ranking", lambda vacancy_id: ranking_cache.invalidate(vacancy_id, broadcast=False))
@@ -0,0 +1,395 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from config import supabase
+
+logger = logging.getLogger(__name__)
+
+# --- Слой доступа к данным и локальная реплика для горячего чтения ---
+
+READ_MODEL = os.getenv("READ_MODEL", "replica")
+REPLICA_DB_PATH = os.getenv("REPLICA_DB_PATH", "replica.db")
+REPLICA_SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL", "300"))
+# Реплика старше этого срока не используется для чтения, запросы идут в Supabase
+REPLICA_MAX_STALENESS = float(os.getenv("REPLICA_MAX_STALENESS", "900"))
+SYNC_PAGE_SIZE = 1000
+
+# Таблица -> (ключ, select при чтении из Supabase)
+MIRRORED_TABLES = {
+    "vacancies": ("id", "*"),
+    "company_profiles": ("user_id", "*"),
+    "university_profiles": ("user_id", "*"),
+    "student_profiles": ("user_id", "*, users(full_name, email)"),
+}
+
+# written_at — когда строку записал какой-либо воркер (time.time()): сверка не затирает
+# снимком строки, записанные после её начала
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vacancies (
+    id TEXT PRIMARY KEY,
+    company_id TEXT,
+    status TEXT,
+    employment_type TEXT,
+    is_internship INTEGER,
+    created_at TEXT,
+    doc TEXT NOT NULL,
+    written_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS vacancies_status_idx ON vacancies (status, created_at DESC);
+CREATE TABLE IF NOT EXISTS company_profiles (user_id TEXT PRIMARY KEY, doc TEXT NOT NULL, written_at REAL NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS university_profiles (user_id TEXT PRIMARY KEY, doc TEXT NOT NULL, written_at REAL NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS student_profiles (user_id TEXT PRIMARY KEY, doc TEXT NOT NULL, written_at REAL NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS replica_deletions (tbl TEXT NOT NULL, key TEXT NOT NULL, deleted_at REAL NOT NULL, PRIMARY KEY (tbl, key));
+CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, synced_at REAL NOT NULL);
+"""
+
+# Колонки таблиц реплики (без written_at)
+_COLUMNS = {
+    "vacancies": ("id", "company_id", "status", "employment_type", "is_internship", "created_at", "doc"),
+    "company_profiles": ("user_id", "doc"),
+    "university_profiles": ("user_id", "doc"),
+    "student_profiles": ("user_id", "doc"),
+}
+
+
+def _company_embed(company: Optional[dict], fields: tuple) -> Optional[dict]:
+    return {field: company.get(field) for field in fields} if company else None
+
+
+class Repository(ABC):
+    """Чтение вакансий и профилей; роутеры не знают, откуда приходят данные."""
+
+    @abstractmethod
+    def get_vacancy(self, vacancy_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def list_vacancies(self, employment_type: Optional[str] = None, is_internship: Optional[bool] = None,
+                       limit: int = 50) -> List[dict]:
+        """Активные вакансии, сначала новые."""
+
+    @abstractmethod
+    def get_profile(self, table: str, user_id: str) -> Optional[dict]:
+        ...
+
+    # Хуки путей записи и жизненного цикла; без реплики ничего не делают
+    def refresh(self, table: str, key: str):
+        pass
+
+    def refresh_many(self, table: str, keys: List[str]):
+        for key in keys: self.refresh(table, key)
+
+    def remove(self, table: str, key: str):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class SupabaseRepository(Repository):
+    """Чтение напрямую из Supabase (сетевой запрос на каждое обращение)."""
+
+    def __bool__(self) -> bool:
+        return bool(supabase)
+
+    def get_vacancy(self, vacancy_id: str) -> Optional[dict]:
+        result = supabase.table("vacancies").select("*, company_profiles(company_name, description)").eq("id", vacancy_id).execute()
+        return result.data[0] if result.data else None
+
+    def list_vacancies(self, employment_type=None, is_internship=None, limit=50) -> List[dict]:
+        query = supabase.table("vacancies").select("*, company_profiles(company_name)").eq("status", "active")
+        if employment_type: query = query.eq("employment_type", employment_type)
+        if is_internship is not None: query = query.eq("is_internship", is_internship)
+        return query.order("created_at", desc=True).order("id").limit(limit).execute().data
+
+    def get_profile(self, table: str, user_id: str) -> Optional[dict]:
+        result = supabase.table(table).select(MIRRORED_TABLES[table][1]).eq("user_id", user_id).execute()
+        return result.data[0] if result.data else None
+
+    def fetch(self, table: str, key: str) -> Optional[dict]:
+        key_column, select = MIRRORED_TABLES[table]
+        result = supabase.table(table).select(select).eq(key_column, key).execute()
+        return result.data[0] if result.data else None
+
+    def fetch_many(self, table: str, keys: List[str]) -> List[dict]:
+        key_column, select = MIRRORED_TABLES[table]
+        return supabase.table(table).select(select).in_(key_column, keys).execute().data
+
+    def fetch_all(self, table: str) -> List[dict]:
+        key_column, select = MIRRORED_TABLES[table]
+        rows, start = [], 0
+        while True:
+            page = supabase.table(table).select(select).order(key_column) \
+                .range(start, start + SYNC_PAGE_SIZE - 1).execute().data
+            rows.extend(page)
+            if len(page) < SYNC_PAGE_SIZE: break
+            start += SYNC_PAGE_SIZE
+        return rows
+
+
+class LocalRepository(Repository):
+    """
+    Read-модель в локальном SQLite-файле: вакансии, профили компаний, вузов
+    и студентов. Файл общий для всех воркеров сервера (WAL), поэтому запись
+    одного воркера сразу видна остальным. Подходит и для запуска API
+    целиком на локальных данных в тестах.
+    """
+
+    def __init__(self, path: str = REPLICA_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._initialized = False
+
+    def __bool__(self) -> bool:
+        return True
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            conn.executescript(_SCHEMA)
+            for table in MIRRORED_TABLES:
+                # Файл реплики от прошлой версии: добавляем колонку, строки будут считаться старыми
+                if "written_at" not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN written_at REAL NOT NULL DEFAULT 0")
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def _row(table: str, doc: dict, written_at: float) -> tuple:
+        data = json.dumps(doc, ensure_ascii=False, default=str)
+        if table == "vacancies":
+            return (doc["id"], doc.get("company_id"), doc.get("status"), doc.get("employment_type"),
+                    int(bool(doc.get("is_internship"))), doc.get("created_at"), data, written_at)
+        return doc["user_id"], data, written_at
+
+    @staticmethod
+    def _insert_sql(table: str, only_older: bool = False) -> str:
+        """INSERT с заменой; only_older — заменять только строки, записанные раньше отметки (последний параметр)."""
+        columns = _COLUMNS[table] + ("written_at",)
+        key_column = MIRRORED_TABLES[table][0]
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+               f"ON CONFLICT ({key_column}) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns[1:])}")
+        return sql + f" WHERE {table}.written_at < ?" if only_older else sql
+
+    # --- Чтение ---
+
+    def get_vacancy(self, vacancy_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT v.doc, c.doc FROM vacancies v LEFT JOIN company_profiles c ON c.user_id = v.company_id WHERE v.id = ?",
+            (vacancy_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        vacancy = json.loads(row[0])
+        vacancy["company_profiles"] = _company_embed(json.loads(row[1]) if row[1] else None, ("company_name", "description"))
+        return vacancy
+
+    def list_vacancies(self, employment_type=None, is_internship=None, limit=50) -> List[dict]:
+        query = ("SELECT v.doc, json_extract(c.doc, '$.company_name') FROM vacancies v "
+                 "LEFT JOIN company_profiles c ON c.user_id = v.company_id WHERE v.status = 'active'")
+        params: list = []
+        if employment_type:
+            query += " AND v.employment_type = ?"
+            params.append(employment_type)
+        if is_internship is not None:
+            query += " AND v.is_internship = ?"
+            params.append(int(is_internship))
+        query += " ORDER BY v.created_at DESC, v.id LIMIT ?"
+        params.append(limit)
+        vacancies = []
+        for doc, company_name in self._conn().execute(query, params):
+            vacancy = json.loads(doc)
+            vacancy["company_profiles"] = {"company_name": company_name} if company_name is not None else None
+            vacancies.append(vacancy)
+        return vacancies
+
+    def get_profile(self, table: str, user_id: str) -> Optional[dict]:
+        row = self._conn().execute(f"SELECT doc FROM {table} WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # --- Запись ---
+
+    def upsert(self, table: str, doc: dict):
+        self._conn().execute(self._insert_sql(table), self._row(table, doc, time.time()))
+
+    def delete(self, table: str, key: str):
+        key_column = MIRRORED_TABLES[table][0]
+        conn = self._conn()
+        conn.execute(f"DELETE FROM {table} WHERE {key_column} = ?", (key,))
+        # Отметка удаления: сверка со снимком, снятым раньше, не вернёт строку
+        conn.execute("INSERT OR REPLACE INTO replica_deletions (tbl, key, deleted_at) VALUES (?, ?, ?)",
+                     (table, key, time.time()))
+
+    def merge(self, table: str, docs: List[dict], started: float):
+        """
+        Сверка таблицы со снимком Supabase, снятым после started. Строки, которые
+        любой воркер записал или удалил после started, снимок не трогает: они новее него.
+        """
+        key_column = MIRRORED_TABLES[table][0]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = {key for (key,) in conn.execute(
+                "SELECT key FROM replica_deletions WHERE tbl = ? AND deleted_at >= ?", (table, started))}
+            snapshot = {doc[key_column]: doc for doc in docs if doc[key_column] not in deleted}
+            conn.executemany(self._insert_sql(table, only_older=True),
+                             [self._row(table, doc, started) + (started,) for doc in snapshot.values()])
+            gone = [(key,) for (key,) in conn.execute(f"SELECT {key_column} FROM {table} WHERE written_at < ?", (started,))
+                    if key not in snapshot]
+            conn.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", gone)
+            conn.execute("DELETE FROM replica_deletions WHERE tbl = ? AND deleted_at < ?", (table, started))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- Состояние синхронизации ---
+
+    def synced_at(self) -> float:
+        row = self._conn().execute("SELECT synced_at FROM sync_state WHERE name = 'all'").fetchone()
+        return row[0] if row else 0.0
+
+    def mark_synced(self, at: float):
+        self._conn().execute("INSERT OR REPLACE INTO sync_state (name, synced_at) VALUES ('all', ?)", (at,))
+
+    def acquire_sync(self, interval: float) -> bool:
+        """Атомарно резервирует сверку за одним воркером, если с прошлой прошло не меньше interval."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT synced_at FROM sync_state WHERE name = 'lease'").fetchone()
+            acquired = row is None or row[0] <= now - interval
+            if acquired:
+                conn.execute("INSERT OR REPLACE INTO sync_state (name, synced_at) VALUES ('lease', ?)", (now,))
+            conn.execute("COMMIT")
+            return acquired
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class ReplicatedRepository(Repository):
+    """
+    Чтение из локальной реплики, запись остаётся в Supabase. Реплика
+    обновляется точечно из путей записи (refresh/remove) и периодической
+    полной сверкой в фоновом потоке. Пока реплика не синхронизирована
+    или устарела, чтение идёт в Supabase.
+    """
+
+    def __init__(self, remote: SupabaseRepository, local: LocalRepository,
+                 sync_interval: float = REPLICA_SYNC_INTERVAL, max_staleness: float = REPLICA_MAX_STALENESS):
+        self.remote = remote
+        self.local = local
+        self.sync_interval = sync_interval
+        self.max_staleness = max_staleness
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.remote) or self.ready
+
+    @property
+    def ready(self) -> bool:
+        try:
+            return self.local.synced_at() >= time.time() - self.max_staleness
+        except sqlite3.Error:
+            return False
+
+    def _source(self) -> Repository:
+        return self.local if self.ready else self.remote
+
+    def get_vacancy(self, vacancy_id: str) -> Optional[dict]:
+        return self._source().get_vacancy(vacancy_id)
+
+    def list_vacancies(self, employment_type=None, is_internship=None, limit=50) -> List[dict]:
+        return self._source().list_vacancies(employment_type, is_internship, limit)
+
+    def get_profile(self, table: str, user_id: str) -> Optional[dict]:
+        return self._source().get_profile(table, user_id)
+
+    # --- Синхронизация ---
+
+    def refresh(self, table: str, key: str):
+        """Перечитывает строку из Supabase после записи; ошибка не ломает запрос, её исправит сверка."""
+        try:
+            doc = self.remote.fetch(table, key)
+            if doc: self.local.upsert(table, doc)
+            else: self.local.delete(table, key)
+        except Exception as e:
+            logger.warning(f"Replica refresh {table}/{key} failed: {e}")
+
+    def refresh_many(self, table: str, keys: List[str]):
+        """Перечитывает пачку строк одним запросом (массовые действия модератора)."""
+        if not keys: return
+        try:
+            key_column = MIRRORED_TABLES[table][0]
+            docs = {doc[key_column]: doc for doc in self.remote.fetch_many(table, keys)}
+            for key in keys:
+                if key in docs: self.local.upsert(table, docs[key])
+                else: self.local.delete(table, key)
+        except Exception as e:
+            logger.warning(f"Replica refresh of {len(keys)} {table} rows failed: {e}")
+
+    def remove(self, table: str, key: str):
+        try:
+            self.local.delete(table, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Replica delete {table}/{key} failed: {e}")
+
+    def sync(self) -> Dict[str, int]:
+        """Полная сверка реплики с Supabase."""
+        started = time.time()
+        counts = {}
+        for table in MIRRORED_TABLES:
+            # Отметка берётся до чтения таблицы: всё, что записано позже, новее снимка
+            table_started = time.time()
+            docs = self.remote.fetch_all(table)
+            self.local.merge(table, docs, table_started)
+            counts[table] = len(docs)
+        # Отметка — момент начала: записи, сделанные во время сверки, учтёт следующая
+        self.local.mark_synced(started)
+        logger.info(f"Replica synced in {time.time() - started:.1f}s: {counts}")
+        return counts
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.local.acquire_sync(self.sync_interval):
+                    self.sync()
+            except Exception as e:
+                logger.warning(f"Replica sync failed: {e}")
+            self._stop.wait(self.sync_interval / 2)
+
+    def start(self):
+        if self._thread or not self.remote:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="replica-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if READ_MODEL == "replica":
+    repository = ReplicatedRepository(SupabaseRepository(), LocalRepository())
+else:
+    repository = SupabaseRepository()
@@ -0,0 +1,23 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+# orjson необязателен: без него используется стандартный json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Быстрая сериализация больших списков. Данные из Supabase уже состоят
+    из JSON-совместимых типов, поэтому эндпоинты возвращают этот ответ
+    напрямую — FastAPI не прогоняет их через jsonable_encoder повторно.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS, default=str)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
@@ -0,0 +1,181 @@
+import bisect
+import os
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from invalidation import bus
+
+# --- Расписание консультаций и собеседований ---
+
+# Рабочие часы указаны по местному времени (Москва, UTC+3, без перехода на летнее время)
+SCHEDULE_TZ = timezone(timedelta(hours=int(os.getenv("SCHEDULE_TZ_OFFSET", "3"))))
+WORK_DAY_START = int(os.getenv("WORK_DAY_START", "10"))
+WORK_DAY_END = int(os.getenv("WORK_DAY_END", "18"))
+WORK_DAYS = {0, 1, 2, 3, 4}
+MAX_RANGE_DAYS = 31
+
+CAREER_CENTER = "career_center"
+
+
+def resource_key(company_id: Optional[str] = None, consultant_id: Optional[str] = None) -> str:
+    """Кто проводит встречу: компания, конкретный консультант или карьерный центр."""
+    if company_id: return f"company:{company_id}"
+    if consultant_id: return f"consultant:{consultant_id}"
+    return CAREER_CENTER
+
+
+def student_key(student_id: str) -> str:
+    return f"student:{student_id}"
+
+
+def to_utc(value) -> datetime:
+    """ISO-строка или datetime -> aware datetime в UTC; время без зоны считается UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class Calendar:
+    """
+    Занятые интервалы одного ресурса в массиве, отсортированном по началу.
+    Интервалы не пересекаются, поэтому для проверки конфликта достаточно
+    бинарного поиска и двух соседей — O(log n).
+    """
+
+    def __init__(self):
+        self._starts: List[float] = []
+        self._items: List[Tuple[float, float, str]] = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def conflict(self, start: float, end: float) -> Optional[Tuple[float, float, str]]:
+        i = bisect.bisect_left(self._starts, start)
+        if i > 0 and self._items[i - 1][1] > start:
+            return self._items[i - 1]
+        if i < len(self._items) and self._items[i][0] < end:
+            return self._items[i]
+        return None
+
+    def add(self, start: float, end: float, appointment_id: str):
+        i = bisect.bisect_left(self._starts, start)
+        self._starts.insert(i, start)
+        self._items.insert(i, (start, end, appointment_id))
+
+    def remove(self, appointment_id: str) -> bool:
+        for i, item in enumerate(self._items):
+            if item[2] == appointment_id:
+                del self._starts[i], self._items[i]
+                return True
+        return False
+
+    def busy(self, start: float, end: float) -> List[Tuple[float, float, str]]:
+        """Интервалы, пересекающие [start, end)."""
+        i = bisect.bisect_left(self._starts, start)
+        if i > 0 and self._items[i - 1][1] > start:
+            i -= 1
+        result = []
+        while i < len(self._items) and self._items[i][0] < end:
+            result.append(self._items[i])
+            i += 1
+        return result
+
+
+def working_slots(date_from: date, date_to: date, slot_minutes: int) -> Iterable[Tuple[float, float]]:
+    """Слоты рабочего времени за период (включительно), по возрастанию."""
+    step = timedelta(minutes=slot_minutes)
+    day = date_from
+    while day <= date_to:
+        if day.weekday() in WORK_DAYS:
+            slot = datetime.combine(day, time(WORK_DAY_START), SCHEDULE_TZ)
+            day_end = datetime.combine(day, time(WORK_DAY_END), SCHEDULE_TZ)
+            while slot + step <= day_end:
+                yield slot.timestamp(), (slot + step).timestamp()
+                slot += step
+        day += timedelta(days=1)
+
+
+class Scheduler:
+    """
+    Календари ресурсов (компаний, консультантов, студентов) в памяти процесса.
+    Календарь загружается из Supabase одним запросом при первом обращении,
+    дальше бронирования и отмены обновляют его на месте. Другие воркеры
+    получают инвалидацию через bus и перечитывают календарь.
+    Окончательная защита от двойного бронирования между воркерами —
+    ограничение EXCLUDE в базе (migrations/003_appointment_slots.sql).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calendars: Dict[str, Calendar] = {}
+
+    def get(self, key: str) -> Optional[Calendar]:
+        return self._calendars.get(key)
+
+    def load(self, key: str, appointments: List[dict]) -> Calendar:
+        calendar = Calendar()
+        for appointment in appointments:
+            start = to_utc(appointment["appointment_date"])
+            end = to_utc(appointment["ends_at"]) if appointment.get("ends_at") else \
+                start + timedelta(minutes=appointment.get("duration_minutes") or 30)
+            calendar.add(start.timestamp(), end.timestamp(), appointment["id"])
+        with self._lock:
+            self._calendars[key] = calendar
+        return calendar
+
+    def reserve(self, keys: List[str], start: float, end: float, appointment_id: str) -> Optional[Tuple[str, tuple]]:
+        """
+        Атомарно проверяет все календари и занимает интервал во всех сразу.
+        Возвращает (ключ, занятый интервал) при конфликте, иначе None.
+        """
+        with self._lock:
+            # Календарь, сброшенный инвалидацией, пропускаем: дубль отсечёт ограничение в базе
+            calendars = [(key, self._calendars[key]) for key in keys if key in self._calendars]
+            for key, calendar in calendars:
+                conflict = calendar.conflict(start, end)
+                if conflict:
+                    return key, conflict
+            for _, calendar in calendars:
+                calendar.add(start, end, appointment_id)
+        return None
+
+    def release(self, keys: List[str], appointment_id: str, broadcast: bool = True):
+        with self._lock:
+            for key in keys:
+                calendar = self._calendars.get(key)
+                if calendar: calendar.remove(appointment_id)
+        if broadcast:
+            for key in keys: bus.publish("appointments", key)
+
+    def publish(self, keys: List[str]):
+        for key in keys: bus.publish("appointments", key)
+
+    @staticmethod
+    def free_slots(calendar: Calendar, date_from: date, date_to: date, slot_minutes: int,
+                   now: Optional[float] = None) -> List[Tuple[float, float]]:
+        """Свободные слоты ресурса: слияние рабочих слотов с занятыми интервалами за один проход."""
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        period_start = datetime.combine(date_from, time.min, SCHEDULE_TZ).timestamp()
+        period_end = datetime.combine(date_to + timedelta(days=1), time.min, SCHEDULE_TZ).timestamp()
+        busy = calendar.busy(period_start, period_end)
+        free, j = [], 0
+        for start, end in working_slots(date_from, date_to, slot_minutes):
+            while j < len(busy) and busy[j][1] <= start:
+                j += 1
+            if start < now:
+                continue
+            if j < len(busy) and busy[j][0] < end:
+                continue
+            free.append((start, end))
+        return free
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._calendars.pop(key, None)
+
+
+scheduler = Scheduler()
+bus.subscribe("appointments", scheduler.invalidate)
@@ -0,0 +1,308 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from invalidation import bus
+
+# --- Полнотекстовый поиск по активным вакансиям ---
+
+# Вес полей при подсчёте частоты термина (упрощённый BM25F)
+FIELD_WEIGHTS = {"title": 3.0, "requirements": 1.5, "description": 1.0}
+FACET_FIELDS = ("location", "employment_type", "is_internship")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-zа-яё0-9+#]+")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+STOP_WORDS = {
+    "и", "в", "во", "не", "на", "с", "со", "по", "к", "ко", "о", "об", "от", "для", "за", "из", "у",
+    "а", "но", "или", "как", "что", "это", "мы", "вы", "он", "она", "они", "то", "же", "бы", "до",
+    "при", "так", "the", "and", "of", "in", "to", "for", "a", "an", "with", "on",
+}
+
+# Стеммер Портера для русского языка
+_PERFECTIVE_GERUND = re.compile(r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$")
+_REFLEXIVE = re.compile(r"(с[яь])$")
+_ADJECTIVE = re.compile(r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$")
+_PARTICIPLE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+_VERB = re.compile(r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)"
+                   r"|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$")
+_NOUN = re.compile(r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$")
+_RV = re.compile(r"^(.*?[аеиоуыэюя])(.*)$")
+_DERIVATIONAL = re.compile(r".*[^аеиоуыэюя]+[аеиоуыэюя]+[^аеиоуыэюя]+[аеиоуыэюя].*ость?$")
+
+
+def stem_ru(word: str) -> str:
+    match = _RV.match(word)
+    if not match:
+        return word
+    prefix, rv = match.group(1), match.group(2)
+    temp = _PERFECTIVE_GERUND.sub("", rv, 1)
+    if temp == rv:
+        rv = _REFLEXIVE.sub("", rv, 1)
+        temp = _ADJECTIVE.sub("", rv, 1)
+        if temp != rv:
+            rv = _PARTICIPLE.sub("", temp, 1)
+        else:
+            temp = _VERB.sub("", rv, 1)
+            rv = _NOUN.sub("", rv, 1) if temp == rv else temp
+    else:
+        rv = temp
+    rv = re.sub(r"и$", "", rv, 1)
+    if _DERIVATIONAL.match(rv):
+        rv = re.sub(r"ость?$", "", rv, 1)
+    temp = re.sub(r"ь$", "", rv, 1)
+    if temp == rv:
+        rv = re.sub(r"(ейше|ейш)$", "", rv, 1)
+        rv = re.sub(r"нн$", "н", rv, 1)
+    else:
+        rv = temp
+    return prefix + rv
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Токены в нижнем регистре без стоп-слов; русские слова приводятся к основе."""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower().replace("ё", "е")):
+        if token in STOP_WORDS:
+            continue
+        tokens.append(stem_ru(token) if _CYRILLIC_RE.search(token) else token)
+    return tokens
+
+
+def _facet_value(doc: dict, field: str) -> str:
+    value = doc.get(field)
+    if field == "is_internship":
+        return "true" if value else "false"
+    return value or ""
+
+
+class VacancySearchIndex:
+    """
+    Инвертированный индекс активных вакансий в памяти процесса: BM25-ранжирование
+    по названию, описанию и требованиям и подсчёт фасетов. Обновляется
+    инкрементально при создании, одобрении, отклонении и удалении вакансий.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        # Растёт при каждом изменении индекса; по нему сбрасываются кэши поверх индекса
+        self.version = 0
+        self._reset()
+
+    def _reset(self):
+        self._docs: Dict[str, dict] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._total_len = 0.0
+        # Знаменатель BM25 для каждого документа; пересчитывается, когда средняя длина заметно меняется
+        self._norm: Dict[str, float] = {}
+        self._norm_avg_len = 0.0
+        # Фасеты: значение -> множество id вакансий
+        self._facets: Dict[str, Dict[str, Set[str]]] = {field: defaultdict(set) for field in FACET_FIELDS}
+        # Вакансии по дате создания для выдачи без текстового запроса
+        self._by_date: List[Tuple[str, str]] = []
+        # Вакансии, изменённые другими воркерами: перечитываются перед следующим поиском
+        self._stale: Set[str] = set()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def load(self, vacancies: Iterable[dict]):
+        with self._lock:
+            self._reset()
+            for vacancy in vacancies:
+                self._add(vacancy)
+            self._refresh_norms(force=True)
+            self.loaded = True
+
+    def _doc_norm(self, doc_id: str) -> float:
+        if not self._norm_avg_len:
+            return BM25_K1
+        return BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[doc_id] / self._norm_avg_len)
+
+    def _refresh_norms(self, force: bool = False):
+        avg_len = self._total_len / len(self._docs) if self._docs else 0.0
+        if force or abs(avg_len - self._norm_avg_len) > 0.1 * max(self._norm_avg_len, 1.0):
+            self._norm_avg_len = avg_len
+            self._norm = {doc_id: self._doc_norm(doc_id) for doc_id in self._docs}
+
+    def _add(self, vacancy: dict):
+        self.version += 1
+        doc_id = vacancy["id"]
+        terms: Dict[str, float] = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(vacancy.get(field)):
+                terms[token] += weight
+        self._docs[doc_id] = vacancy
+        self._doc_terms[doc_id] = dict(terms)
+        self._doc_len[doc_id] = sum(terms.values())
+        self._total_len += self._doc_len[doc_id]
+        self._norm[doc_id] = self._doc_norm(doc_id)
+        for term, tf in terms.items():
+            self._postings[term][doc_id] = tf
+        for field in FACET_FIELDS:
+            self._facets[field][_facet_value(vacancy, field)].add(doc_id)
+        bisect.insort(self._by_date, (vacancy.get("created_at") or "", doc_id))
+
+    def _remove(self, doc_id: str):
+        vacancy = self._docs.pop(doc_id, None)
+        if vacancy is None:
+            return
+        self.version += 1
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id)
+        self._norm.pop(doc_id, None)
+        for field in FACET_FIELDS:
+            values = self._facets[field]
+            value = _facet_value(vacancy, field)
+            values[value].discard(doc_id)
+            if not values[value]:
+                del values[value]
+        key = (vacancy.get("created_at") or "", doc_id)
+        pos = bisect.bisect_left(self._by_date, key)
+        if pos < len(self._by_date) and self._by_date[pos] == key:
+            del self._by_date[pos]
+
+    def upsert(self, vacancy: dict, broadcast: bool = True):
+        """Добавляет активную вакансию или убирает неактивную из индекса."""
+        with self._lock:
+            if self.loaded:
+                self._remove(vacancy["id"])
+                if vacancy.get("status") == "active":
+                    self._add(vacancy)
+                self._refresh_norms()
+        if broadcast:
+            bus.publish("search", vacancy["id"])
+
+    def remove(self, vacancy_id: str, broadcast: bool = True):
+        with self._lock:
+            self._remove(vacancy_id)
+            self._refresh_norms()
+        if broadcast:
+            bus.publish("search", vacancy_id)
+
+    @property
+    def fresh(self) -> bool:
+        """Индекс загружен и нет изменений от других воркеров, которые надо дочитать."""
+        return self.loaded and not self._stale
+
+    def mark_stale(self, vacancy_id: str):
+        with self._lock:
+            self._stale.add(vacancy_id)
+
+    def take_stale(self) -> Set[str]:
+        with self._lock:
+            stale, self._stale = self._stale, set()
+            return stale
+
+    def _scores(self, query_terms: List[str]) -> Dict[str, float]:
+        n_docs = len(self._docs)
+        norm = self._norm
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(query_terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            k = idf * (BM25_K1 + 1)
+            for doc_id, tf in postings.items():
+                scores[doc_id] += k * tf / (tf + norm[doc_id])
+        return scores
+
+    def get(self, vacancy_id: str) -> Optional[dict]:
+        return self._docs.get(vacancy_id)
+
+    def top_k(self, query_terms: List[str], k: int) -> List[Tuple[str, float]]:
+        """K лучших вакансий по уже токенизированному запросу: [(id, score)]."""
+        with self._lock:
+            scores = self._scores(query_terms)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(doc_id, round(score, 4)) for doc_id, score in best]
+
+    def score_document(self, query_terms: List[str], vacancy_id: str) -> float:
+        """BM25-оценка одной вакансии, без прохода по всему индексу."""
+        with self._lock:
+            if vacancy_id not in self._docs:
+                return 0.0
+            n_docs = len(self._docs)
+            score = 0.0
+            for term in set(query_terms):
+                postings = self._postings.get(term)
+                tf = postings.get(vacancy_id) if postings else None
+                if tf:
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    score += idf * tf * (BM25_K1 + 1) / (tf + self._norm[vacancy_id])
+            return round(score, 4)
+
+    def _filtered(self, candidates: Optional[Set[str]], filters: Dict[str, str],
+                  skip_field: Optional[str] = None) -> Optional[Set[str]]:
+        """Пересечение кандидатов с фильтрами; None означает «все вакансии индекса»."""
+        result = candidates
+        for field, value in filters.items():
+            if field == skip_field:
+                continue
+            ids = self._facets[field].get(value, set())
+            result = set(ids) if result is None else result & ids
+        return result
+
+    def search(self, query: Optional[str] = None, filters: Optional[Dict[str, str]] = None,
+               limit: int = 20, offset: int = 0) -> dict:
+        filters = {
+            field: _facet_value({field: value}, field)
+            for field, value in (filters or {}).items() if value is not None and value != ""
+        }
+        with self._lock:
+            query_terms = tokenize(query)
+            scores = self._scores(query_terms) if query_terms else {}
+            candidates = set(scores) if query_terms else None
+
+            # Фасеты считаются без собственного фильтра, чтобы были видны альтернативы
+            facets = {}
+            for field in FACET_FIELDS:
+                base = self._filtered(candidates, filters, skip_field=field)
+                counts = [(value, len(ids) if base is None else len(base & ids))
+                          for value, ids in self._facets[field].items() if value != ""]
+                facets[field] = [{"value": v, "count": c}
+                                 for v, c in sorted(counts, key=lambda vc: vc[1], reverse=True) if c]
+
+            hits = self._filtered(candidates, filters)
+            total = len(self._docs) if hits is None else len(hits)
+            if scores:
+                page_ids = heapq.nlargest(offset + limit, hits, key=scores.__getitem__)[offset:]
+            else:
+                page_ids = []
+                skipped = 0
+                for _, doc_id in reversed(self._by_date):
+                    if hits is not None and doc_id not in hits:
+                        continue
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    page_ids.append(doc_id)
+                    if len(page_ids) >= limit:
+                        break
+
+            items = []
+            for doc_id in page_ids:
+                item = dict(self._docs[doc_id])
+                if scores:
+                    item["search_score"] = round(scores[doc_id], 4)
+                items.append(item)
+            return {"total": total, "items": items, "facets": facets}
+
+
+search_index = VacancySearchIndex()
+bus.subscribe("search", search_index.mark_stale)
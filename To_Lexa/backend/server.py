@@ -0,0 +1,63 @@
+import os
+import shutil
+
+from gunicorn.app.base import BaseApplication
+
+from invalidation import BUS_DIR
+
+
+def default_workers() -> int:
+    """Число воркеров: WEB_CONCURRENCY или количество доступных процессу ядер."""
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _on_starting(server):
+    # Сокеты воркеров от предыдущего запуска больше не нужны
+    shutil.rmtree(BUS_DIR, ignore_errors=True)
+
+
+def _on_exit(server):
+    shutil.rmtree(BUS_DIR, ignore_errors=True)
+
+
+class ProductionServer(BaseApplication):
+    """
+    Production-запуск: gunicorn с uvicorn-воркерами. Приложение импортируется
+    один раз в мастере (preload_app) и копируется в воркеры при fork; клиенты
+    и канал инвалидации создаются уже в каждом воркере через lifespan.
+    По SIGTERM воркеры перестают принимать соединения и дорабатывают текущие
+    запросы в течение graceful_timeout.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8000, workers: int = None):
+        self.options = {
+            "bind": f"{host}:{port}",
+            "workers": workers or default_workers(),
+            "worker_class": "uvicorn.workers.UvicornWorker",
+            "preload_app": True,
+            "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+            "timeout": int(os.getenv("WORKER_TIMEOUT", "60")),
+            "keepalive": int(os.getenv("KEEPALIVE", "5")),
+            "max_requests": int(os.getenv("MAX_REQUESTS", "0")),
+            "max_requests_jitter": int(os.getenv("MAX_REQUESTS_JITTER", "0")),
+            "on_starting": _on_starting,
+            "on_exit": _on_exit,
+        }
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+        return app
+
+
+def run(host: str = "0.0.0.0", port: int = 8000, workers: int = None):
+    ProductionServer(host, port, workers).run()
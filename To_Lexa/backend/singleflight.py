@@ -0,0 +1,75 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+# --- Объединение одинаковых одновременных запросов (single-flight) ---
+
+# Сколько ключей хранить в метриках; самые старые вытесняются
+METRICS_MAX_KEYS = 1024
+
+
+def flight_key(namespace: str, *args, **params) -> str:
+    """Нормализованный ключ запроса: пространство имён, позиционные аргументы и отсортированные параметры."""
+    parts = [namespace, *map(str, args)]
+    parts.extend(f"{name}={params[name]}" for name in sorted(params) if params[name] is not None)
+    return "|".join(parts)
+
+
+class SingleFlight:
+    """
+    Пока запрос с данным ключом выполняется, остальные такие же запросы
+    ждут его и получают тот же результат (или ту же ошибку). Это не кэш:
+    после завершения следующий запрос снова идёт в Supabase.
+    Синхронная функция выполняется в пуле потоков, чтобы не блокировать
+    event loop. Общий результат нельзя изменять на месте.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._metrics: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    def _metric(self, key: str) -> Dict[str, float]:
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self._metrics[key] = {"calls": 0, "upstream": 0, "shared": 0, "errors": 0, "upstream_ms": 0.0}
+            if len(self._metrics) > METRICS_MAX_KEYS:
+                self._metrics.popitem(last=False)
+        else:
+            self._metrics.move_to_end(key)
+        return metric
+
+    async def do(self, key: str, func: Callable[..., Any], *args) -> Any:
+        metric = self._metric(key)
+        metric["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            metric["upstream"] += 1
+            task = self._inflight[key] = asyncio.get_running_loop().create_task(self._call(key, metric, func, args))
+        else:
+            metric["shared"] += 1
+        # shield: отмена одного из ожидающих не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    async def _call(self, key: str, metric: Dict[str, float], func: Callable[..., Any], args: tuple) -> Any:
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        except Exception:
+            metric["errors"] += 1
+            raise
+        finally:
+            metric["upstream_ms"] += (time.perf_counter() - started) * 1000
+            del self._inflight[key]
+
+    def stats(self, top: int = 20) -> dict:
+        keys = sorted(self._metrics.items(), key=lambda item: item[1]["shared"], reverse=True)[:top]
+        return {
+            "inflight": len(self._inflight),
+            "calls": sum(m["calls"] for m in self._metrics.values()),
+            "upstream": sum(m["upstream"] for m in self._metrics.values()),
+            "top_keys": [{"key": key, **metric} for key, metric in keys],
+        }
+
+
+flights = SingleFlight()
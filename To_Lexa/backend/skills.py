@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Справочник навыков: канонические названия, синонимы и автодополнение ---
+
+# Дополнительный справочник {"Каноническое название": ["синоним", ...]} поверх встроенного
+SKILLS_DICTIONARY_PATH = os.getenv("SKILLS_DICTIONARY_PATH", "")
+SUGGEST_LIMIT = 10
+# Сколько лучших подсказок хранится в каждом узле префиксного дерева
+SUGGEST_MAX = 20
+
+# Порядок задаёт приоритет в подсказках: популярные навыки выше
+SKILLS: Dict[str, List[str]] = {
+    "Python": ["python3", "питон", "пайтон"],
+    "SQL": ["sql-запросы"],
+    "JavaScript": ["js", "javascript es6", "ecmascript", "джаваскрипт"],
+    "Java": ["джава", "ява"],
+    "Excel": ["ms excel", "microsoft excel", "эксель"],
+    "Git": ["гит"],
+    "C++": ["cpp", "c plus plus", "си++", "с++"],
+    "C#": ["csharp", "c sharp", "си шарп", "с#"],
+    "TypeScript": ["ts"],
+    "React": ["react.js", "reactjs", "реакт"],
+    "HTML": ["html5"],
+    "CSS": ["css3"],
+    "Linux": ["линукс"],
+    "Docker": ["докер"],
+    "PostgreSQL": ["postgres", "psql", "постгрес"],
+    "MySQL": [],
+    "Django": ["джанго"],
+    "FastAPI": ["fast api"],
+    "Flask": [],
+    "Node.js": ["node", "nodejs", "node js", "нода"],
+    "Vue.js": ["vue", "vuejs"],
+    "Angular": ["angularjs"],
+    "Go": ["golang"],
+    "PHP": [],
+    "Kotlin": ["котлин"],
+    "Swift": [],
+    "1С": ["1c", "1с:предприятие", "1c:enterprise"],
+    "Figma": ["фигма"],
+    "Photoshop": ["adobe photoshop", "фотошоп"],
+    "Машинное обучение": ["machine learning", "ml"],
+    "Анализ данных": ["data analysis", "аналитика данных"],
+    "Data Science": [],
+    "Pandas": [],
+    "NumPy": [],
+    "PyTorch": [],
+    "TensorFlow": [],
+    "Power BI": ["powerbi"],
+    "Tableau": [],
+    "Kubernetes": ["k8s", "кубернетес"],
+    "MongoDB": ["mongo"],
+    "Redis": [],
+    "REST API": ["rest", "restful api"],
+    "Jira": ["джира"],
+    "Bash": [],
+    "Spring": ["spring boot", "spring framework"],
+    "Unity": [],
+    "AutoCAD": ["автокад"],
+    "MS Office": ["microsoft office", "офис"],
+    "Английский язык": ["английский", "english", "английский b2", "english b2"],
+    "Управление проектами": ["project management", "проектный менеджмент"],
+    "Agile": [],
+    "Scrum": ["скрам"],
+    "Работа в команде": ["teamwork", "командная работа"],
+    "Коммуникабельность": ["коммуникация", "коммуникативные навыки", "communication"],
+    "Маркетинг": ["marketing"],
+    "SMM": [],
+}
+
+
+def skill_key(text: str) -> str:
+    """Ключ сравнения: нижний регистр, ё -> е, одиночные пробелы, без завершающей пунктуации."""
+    return " ".join(text.lower().replace("ё", "е").split()).strip(".,;")
+
+
+def clean_skill(text: str) -> str:
+    """Навык вне справочника сохраняется как ввёл пользователь, без лишних пробелов."""
+    return " ".join(text.split()).strip(".,;")
+
+
+class _Node:
+    __slots__ = ("edges", "canonical", "top")
+
+    def __init__(self):
+        # Первый символ метки -> (метка ребра, дочерний узел)
+        self.edges: Dict[str, Tuple[str, "_Node"]] = {}
+        self.canonical: Optional[str] = None
+        self.top: List[str] = []
+
+
+class SkillTrie:
+    """
+    Сжатое префиксное дерево (radix tree) по ключам синонимов: цепочки узлов
+    с одним потомком схлопнуты в одно ребро с многосимвольной меткой.
+    В каждом узле заранее посчитаны лучшие подсказки поддерева, поэтому
+    автодополнение — это спуск по префиксу, O(длина запроса).
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.size = 0
+
+    def insert(self, key: str, canonical: str):
+        node = self.root
+        while key:
+            edge = node.edges.get(key[0])
+            if edge is None:
+                child = _Node()
+                node.edges[key[0]] = (key, child)
+                node, key = child, ""
+                break
+            label, child = edge
+            common = 0
+            while common < min(len(label), len(key)) and label[common] == key[common]:
+                common += 1
+            if common < len(label):
+                # Разрезаем ребро: общая часть -> промежуточный узел -> остаток старой метки
+                middle = _Node()
+                middle.edges[label[common]] = (label[common:], child)
+                node.edges[key[0]] = (label[:common], middle)
+                child = middle
+            node, key = child, key[common:]
+        if node.canonical is None:
+            self.size += 1
+        node.canonical = canonical
+
+    def _find(self, prefix: str, exact: bool) -> Optional[_Node]:
+        node = self.root
+        while prefix:
+            edge = node.edges.get(prefix[0])
+            if edge is None:
+                return None
+            label, child = edge
+            if prefix.startswith(label):
+                node, prefix = child, prefix[len(label):]
+            elif not exact and label.startswith(prefix):
+                return child
+            else:
+                return None
+        return node
+
+    def get(self, key: str) -> Optional[str]:
+        node = self._find(key, exact=True)
+        return node.canonical if node else None
+
+    def rank(self, order: Dict[str, int]):
+        """Заполняет подсказки узлов: канонические названия поддерева в порядке order, без повторов."""
+        def visit(node: _Node) -> List[str]:
+            candidates = [node.canonical] if node.canonical else []
+            for _, child in node.edges.values():
+                candidates.extend(visit(child))
+            node.top = sorted(set(candidates), key=lambda name: order[name])[:SUGGEST_MAX]
+            return node.top
+        visit(self.root)
+
+    def complete(self, prefix: str) -> List[str]:
+        node = self._find(prefix, exact=False)
+        return node.top if node else []
+
+
+class SkillDictionary:
+    """
+    Справочник навыков: приводит синонимы и варианты написания к каноническому
+    названию ("python", "Питон" -> "Python") и подсказывает навыки по префиксу.
+    Навыки нормализуются при записи профиля и резюме, поэтому фильтр
+    кандидатов по навыкам и облако слов работают с единым написанием.
+    """
+
+    def __init__(self, entries: Dict[str, List[str]]):
+        self.trie = SkillTrie()
+        order = {}
+        for canonical, aliases in entries.items():
+            order[canonical] = len(order)
+            for alias in [canonical, *aliases]:
+                self.trie.insert(skill_key(alias), canonical)
+        self.trie.rank(order)
+        self.canonical_count = len(order)
+
+    def canonical(self, skill: str) -> Optional[str]:
+        return self.trie.get(skill_key(skill))
+
+    def normalize(self, skills: Optional[Iterable[str]]) -> List[str]:
+        """Канонические названия без повторов (без учёта регистра), порядок сохраняется."""
+        result, seen = [], set()
+        for skill in skills or []:
+            if not isinstance(skill, str) or not skill.strip():
+                continue
+            name = self.canonical(skill) or clean_skill(skill)
+            if skill_key(name) not in seen:
+                seen.add(skill_key(name))
+                result.append(name)
+        return result
+
+    def suggest(self, query: str, limit: int = SUGGEST_LIMIT) -> List[str]:
+        key = skill_key(query)
+        return self.trie.complete(key)[:limit] if key else []
+
+
+def _load_entries() -> Dict[str, List[str]]:
+    entries = {name: list(aliases) for name, aliases in SKILLS.items()}
+    if SKILLS_DICTIONARY_PATH:
+        try:
+            with open(SKILLS_DICTIONARY_PATH, encoding="utf-8") as f:
+                for name, aliases in json.load(f).items():
+                    entries.setdefault(name, []).extend(aliases)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load skills dictionary {SKILLS_DICTIONARY_PATH}: {e}")
+    return entries
+
+
+skill_dictionary = SkillDictionary(_load_entries())
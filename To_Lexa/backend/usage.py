@@ -0,0 +1,86 @@
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import supabase
+
+logger = logging.getLogger(__name__)
+
+# --- Учёт токенов LLM (usage ledger) ---
+
+# Месячная квота токенов на компанию; 0 — без ограничения
+AI_MONTHLY_TOKEN_QUOTA = int(os.getenv("AI_MONTHLY_TOKEN_QUOTA", "0"))
+SUMMARY_PAGE_SIZE = 1000
+
+
+def month_start(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.utcnow()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def usage_tokens(completion, prompt_estimate: int = 0) -> Dict[str, int]:
+    """Токены из ответа OpenAI; если usage не пришёл — локальная оценка промпта."""
+    usage = getattr(completion, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or prompt_estimate
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+
+class UsageLedger:
+    """Журнал вызовов LLM в таблице ai_usage: кто, какая функция, сколько токенов."""
+
+    def record(self, owner_id: Optional[str], feature: str, model: str, prompt_tokens: int,
+               completion_tokens: int, ref_id: Optional[str] = None, latency_ms: Optional[int] = None):
+        try:
+            supabase.table("ai_usage").insert({
+                "owner_id": owner_id, "feature": feature, "model": model,
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "ref_id": ref_id, "latency_ms": latency_ms, "created_at": datetime.utcnow().isoformat(),
+            }).execute()
+        except Exception as e:
+            # Потеря строки учёта не должна ломать AI-функцию
+            logger.warning(f"AI usage record failed for {owner_id}/{feature}: {e}")
+
+    def _groups(self, owner_id: Optional[str], since: datetime) -> List[dict]:
+        """Суммы по (owner_id, feature), посчитанные в базе (migrations/008_ai_usage_summary.sql)."""
+        rows, offset = [], 0
+        while True:
+            page = supabase.rpc("ai_usage_summary", {
+                "since": since.isoformat(), "p_owner_id": owner_id,
+                "p_limit": SUMMARY_PAGE_SIZE, "p_offset": offset,
+            }).execute().data or []
+            rows.extend(page)
+            if len(page) < SUMMARY_PAGE_SIZE: return rows
+            offset += SUMMARY_PAGE_SIZE
+
+    def summary(self, owner_id: Optional[str] = None, since: Optional[datetime] = None) -> dict:
+        since = since or month_start()
+        totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        by_feature: Dict[str, dict] = {}
+        by_owner: Dict[str, int] = {}
+        for row in self._groups(owner_id, since):
+            prompt, completion = row.get("prompt_tokens") or 0, row.get("completion_tokens") or 0
+            for bucket in (totals, by_feature.setdefault(row["feature"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})):
+                bucket["calls"] += row.get("calls") or 0
+                bucket["prompt_tokens"] += prompt
+                bucket["completion_tokens"] += completion
+                bucket["total_tokens"] += prompt + completion
+            owner = row.get("owner_id") or "anonymous"
+            by_owner[owner] = by_owner.get(owner, 0) + prompt + completion
+        result = {"since": since.isoformat(), **totals, "by_feature": by_feature}
+        if owner_id:
+            result["quota"] = AI_MONTHLY_TOKEN_QUOTA or None
+            result["remaining"] = max(AI_MONTHLY_TOKEN_QUOTA - totals["total_tokens"], 0) if AI_MONTHLY_TOKEN_QUOTA else None
+        else:
+            result["by_owner"] = dict(sorted(by_owner.items(), key=lambda item: item[1], reverse=True))
+        return result
+
+    def over_quota(self, owner_id: str) -> bool:
+        if not AI_MONTHLY_TOKEN_QUOTA:
+            return False
+        used = supabase.rpc("ai_usage_total", {"p_owner_id": owner_id, "since": month_start().isoformat()}).execute().data
+        return (used or 0) >= AI_MONTHLY_TOKEN_QUOTA
+
+
+usage_ledger = UsageLedger()
@@ -0,0 +1,53 @@
+"""
+Групповая запись: число запросов к Supabase и время при всплеске
+одновременных вставок (например, откликов перед дедлайном).
+Задержка Supabase имитируется, сеть не нужна.
+
+Запуск из корня проекта:
+    python benchmarks/bench_batching.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from batching import InsertBatcher
+
+UPSTREAM_LATENCY = 0.02
+CONCURRENCY = 500
+
+
+class FakeBatcher(InsertBatcher):
+    """Вместо Supabase — задержка на запрос и эхо вставленных строк."""
+
+    def __init__(self, enabled: bool):
+        super().__init__("vacancy_touch", enabled=enabled)
+        self.requests = 0
+
+    def _insert_many(self, rows):
+        self.requests += 1
+        time.sleep(UPSTREAM_LATENCY)
+        return [dict(row, id=row.get("id", f"generated-{self.requests}")) for row in rows]
+
+
+async def burst(batcher: FakeBatcher) -> float:
+    started = time.perf_counter()
+    rows = await asyncio.gather(*(batcher.insert({"vacancy_id": "v1", "student_id": f"s{i}"}) for i in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+    assert all(row["student_id"] == f"s{i}" for i, row in enumerate(rows)), "каждый получил свою строку"
+    return elapsed
+
+
+def main():
+    print(f"{CONCURRENCY} одновременных вставок, задержка Supabase {UPSTREAM_LATENCY * 1000:.0f} мс")
+    print(f"{'mode':<12}{'requests':>10}{'time, ms':>12}")
+    for name, enabled in (("single-row", False), ("batched", True)):
+        batcher = FakeBatcher(enabled)
+        elapsed = asyncio.run(burst(batcher))
+        print(f"{name:<12}{batcher.requests:>10}{elapsed * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
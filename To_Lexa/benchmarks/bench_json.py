@@ -0,0 +1,91 @@
+"""
+Сравнение сериализации больших списков: стандартный путь FastAPI
+(jsonable_encoder + JSONResponse) против FastJSONResponse.
+
+Запуск из корня проекта:
+    python benchmarks/bench_json.py
+"""
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from responses import FastJSONResponse, orjson
+
+
+def make_vacancy(i: int) -> dict:
+    created = (datetime(2025, 1, 1) + timedelta(hours=i)).isoformat()
+    return {
+        "id": str(uuid.uuid4()),
+        "company_id": str(uuid.uuid4()),
+        "title": f"Python-разработчик (стажёр) #{i}",
+        "description": "Разработка backend-сервисов на FastAPI, работа с PostgreSQL и очередями. " * 4,
+        "requirements": "Python, SQL, Git, английский B1, понимание HTTP и REST",
+        "salary_range": "80 000 – 120 000 ₽",
+        "location": "Москва, Технополис",
+        "employment_type": "full_time",
+        "is_internship": i % 3 == 0,
+        "status": "active",
+        "created_at": created,
+        "company_profiles": {"company_name": f"Компания {i % 50}", "description": "Резидент Технополиса"},
+    }
+
+
+def make_touch(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "vacancy_id": str(uuid.uuid4()),
+        "status": "pending",
+        "created_at": datetime(2025, 2, 1).isoformat(),
+        "additional_info": "Хочу развиваться в backend-разработке. " * 5,
+        "ai_summary": "Кандидат с опытом Python и SQL, частично соответствует требованиям. " * 2,
+        "meets_criteria_rating": i % 100,
+        "motivation_rating": (i * 7) % 100,
+        "student_profiles": {
+            "university": "МГТУ им. Баумана", "major": "Программная инженерия", "graduation_year": 2026,
+            "skills": ["Python", "SQL", "FastAPI", "Docker", "Git"],
+            "users": {"full_name": f"Студент {i}", "email": f"student{i}@example.com"},
+        },
+        "resumes": {
+            "title": "Junior Python Developer", "education": "Бакалавриат, 4 курс",
+            "experience": "Стажировка 6 месяцев. " * 3, "skills": ["Python", "SQL", "Linux"],
+            "languages": ["Русский", "Английский"], "achievements": "Победитель хакатона",
+        },
+    }
+
+
+PAYLOADS = {
+    "vacancies x100": [make_vacancy(i) for i in range(100)],
+    "vacancies x1000": [make_vacancy(i) for i in range(1000)],
+    "responses x200": {**make_vacancy(0), "vacancy_touch": [make_touch(i) for i in range(200)]},
+    "responses x1000": {**make_vacancy(0), "vacancy_touch": [make_touch(i) for i in range(1000)]},
+}
+
+
+def default_path(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def fast_path(payload):
+    return FastJSONResponse(payload).body
+
+
+def main():
+    print(f"orjson: {'установлен' if orjson is not None else 'не установлен (используется json)'}")
+    print(f"{'payload':<18}{'size, KB':>10}{'default, ms':>14}{'fast, ms':>12}{'speedup':>10}")
+    for name, payload in PAYLOADS.items():
+        number = 20
+        default_ms = min(timeit.repeat(lambda: default_path(payload), number=number, repeat=3)) / number * 1000
+        fast_ms = min(timeit.repeat(lambda: fast_path(payload), number=number, repeat=3)) / number * 1000
+        size_kb = len(fast_path(payload)) / 1024
+        print(f"{name:<18}{size_kb:>10.0f}{default_ms:>14.2f}{fast_ms:>12.2f}{default_ms / fast_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
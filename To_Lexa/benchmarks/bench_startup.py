@@ -0,0 +1,116 @@
+"""
+Холодный старт воркера: время импорта по модулям (python -X importtime)
+и время до первого ответа /api/health от uvicorn, запущенного с нуля.
+Завершается с кодом 1, если старт не укладывается в бюджет, поэтому
+подходит для проверки в CI. Сеть не нужна: клиенты Supabase и OpenAI
+создаются лениво, без запросов.
+
+Запуск из корня проекта:
+    python benchmarks/bench_startup.py
+    STARTUP_BUDGET_MS=800 python benchmarks/bench_startup.py
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+# Бюджеты: импорт приложения и время до первого ответа, мс
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "800"))
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+RUNS = 3
+TOP_MODULES = 12
+
+
+def app_env(workdir: str) -> dict:
+    """Окружение воркера: фиктивные ключи и все локальные файлы во временном каталоге."""
+    return dict(
+        os.environ,
+        SUPABASE_URL=os.getenv("SUPABASE_URL", "http://127.0.0.1:9"),
+        SUPABASE_KEY=os.getenv("SUPABASE_KEY", "bench.bench.bench"),
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "sk-bench"),
+        JOBS_DB_PATH=os.path.join(workdir, "jobs.db"),
+        REPLICA_DB_PATH=os.path.join(workdir, "replica.db"),
+        INVALIDATION_BUS_DIR=os.path.join(workdir, "bus"),
+        READ_MODEL="supabase",
+    )
+
+
+def import_times(env: dict) -> dict:
+    """Модуль -> (собственное, суммарное время импорта, мс) для `import main`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return times
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(env: dict) -> float:
+    """Запуск uvicorn и опрос /api/health до первого ответа 200, мс."""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn завершился до первого ответа")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    project_modules = {name[:-3] for name in os.listdir(BACKEND_DIR) if name.endswith(".py")}
+    with tempfile.TemporaryDirectory() as workdir:
+        env = app_env(workdir)
+        import_times(env)  # прогрев байткода
+        runs = [import_times(env) for _ in range(RUNS)]
+        times = {name: min((run[name] for run in runs if name in run), key=lambda t: t[1]) for name in runs[0]}
+        first_request = min(time_to_first_request(env) for _ in range(RUNS))
+
+    total = times["main"][1]
+    print(f"Импорт main: {total:.0f} мс (лучший из {RUNS})")
+    print(f"{'module':<28}{'self, ms':>10}{'cumulative, ms':>16}")
+    for name, (self_ms, cumulative_ms) in sorted(((n, t) for n, t in times.items() if n in project_modules),
+                                                     key=lambda item: item[1][1], reverse=True):
+        print(f"{name:<28}{self_ms:>10.1f}{cumulative_ms:>16.1f}")
+
+    print("\nСамые тяжёлые сторонние пакеты:")
+    third_party = [(n, t) for n, t in times.items()
+                   if "." not in n and n not in project_modules and n not in sys.stdlib_module_names]
+    for name, (_, cumulative_ms) in sorted(third_party, key=lambda item: item[1][1], reverse=True)[:TOP_MODULES]:
+        print(f"  {name:<26}{cumulative_ms:>16.1f}")
+
+    print(f"\nВремя до первого ответа /api/health: {first_request:.0f} мс (лучший из {RUNS})")
+    failed = [f"импорт {total:.0f} > {IMPORT_BUDGET_MS:.0f} мс"] if total > IMPORT_BUDGET_MS else []
+    if first_request > STARTUP_BUDGET_MS:
+        failed.append(f"первый ответ {first_request:.0f} > {STARTUP_BUDGET_MS:.0f} мс")
+    if failed:
+        print("Бюджет старта превышен: " + "; ".join(failed))
+        sys.exit(1)
+    print(f"Бюджет старта соблюдён (импорт ≤ {IMPORT_BUDGET_MS:.0f} мс, первый ответ ≤ {STARTUP_BUDGET_MS:.0f} мс)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import {
     Briefcase, User, Search as SearchIcon, Plus, Building,
     GraduationCap, ArrowLeft, Star, Target, BrainCircuit, Loader2
 } from 'lucide-react';
-import { candidatesAPI, vacanciesAPI } from '../services/api';
+import { candidatesAPI, vacanciesAPI, jobsAPI } from '../services/api';
 import axios from 'axios';
 
 const companyAPI = {
@@ -132,6 +132,19 @@ function CompanyDashboard({ user }) {
         }
     };
 
+    const handleResponseStatus = async (touchId, status) => {
+        try {
+            await vacanciesAPI.updateResponseStatus(touchId, status);
+            setSelectedVacancyData(prev => prev && {
+                ...prev,
+                vacancy_touch: prev.vacancy_touch.map(t => t.id === touchId ? { ...t, status } : t),
+            });
+        } catch (error) {
+            console.error(`Error updating response ${touchId} status:`, error);
+            alert('Не удалось изменить статус отклика');
+        }
+    };
+
     const handleBackToVacancies = () => {
         setSelectedVacancyId(null);
         setSelectedVacancyData(null);
@@ -190,10 +203,23 @@ function CompanyDashboard({ user }) {
 
         setIsGeneratingAll(true);
         try {
-            for (const touch of selectedVacancyData.vacancy_touch) {
-                await vacanciesAPI.generateAISummary(touch.id);
+            // Анализ выполняется в фоновой очереди: ставим задачи и ждём их завершения
+            const jobs = await Promise.all(
+                selectedVacancyData.vacancy_touch.map(touch => vacanciesAPI.generateAISummary(touch.id))
+            );
+            let pending = jobs.map(res => res.data.job_id);
+            let failed = 0;
+            for (let i = 0; i < 120 && pending.length > 0; i++) {
+                await new Promise(resolve => setTimeout(resolve, 2000));
+                const statuses = await Promise.all(pending.map(id => jobsAPI.get(id)));
+                failed += statuses.filter(res => res.data.status === 'dead').length;
+                pending = statuses
+                    .filter(res => res.data.status === 'queued' || res.data.status === 'running')
+                    .map(res => res.data.id);
             }
-            alert('Анализ успешно сгенерирован для всех откликов!');
+            alert(failed > 0
+                ? `Анализ сгенерирован, но для ${failed} откликов произошла ошибка.`
+                : 'Анализ успешно сгенерирован для всех откликов!');
             await handleViewResponses(selectedVacancyId); // перезагрузим данные
         } catch (err) {
             console.error(err);
@@ -316,6 +342,17 @@ function CompanyDashboard({ user }) {
                                         </p>
                                         <p><strong>Дополнительная информация:</strong> {r.additional_info ?? '—'}</p>
                                         <p><strong>Статус:</strong> <span className={`badge ${r.status === 'pending' ? 'badge-warning' : r.status === 'accepted' ? 'badge-success' : 'badge-error'}`}>{r.status}</span></p>
+                                        <div className="flex gap-2 mt-2">
+                                            {r.status === 'pending' && (
+                                                <button className="btn btn-ghost btn-sm" onClick={() => handleResponseStatus(r.id, 'viewed')}>Просмотрен</button>
+                                            )}
+                                            {r.status !== 'accepted' && (
+                                                <button className="btn btn-outline btn-sm" onClick={() => handleResponseStatus(r.id, 'accepted')}>Принять</button>
+                                            )}
+                                            {r.status !== 'rejected' && (
+                                                <button className="btn btn-ghost btn-sm" onClick={() => handleResponseStatus(r.id, 'rejected')}>Отклонить</button>
+                                            )}
+                                        </div>
 
                                         <div className="mt-3 pt-3 border-t">
                                             <div className="flex items-center gap-2 mb-2">
@@ -467,6 +504,14 @@ function CompanyDashboard({ user }) {
                                                                 <strong>Требования:</strong> {v.requirements}
                                                             </div>
                                                         )}
+                                                        {v.funnel && v.response_count > 0 && (
+                                                            <div className="flex gap-2 mt-2" style={{ fontSize: '0.875rem' }}>
+                                                                <span className="badge badge-warning">Новые: {v.funnel.pending}</span>
+                                                                <span className="badge">Просмотрены: {v.funnel.viewed}</span>
+                                                                <span className="badge badge-success">Приняты: {v.funnel.accepted}</span>
+                                                                <span className="badge badge-error">Отклонены: {v.funnel.rejected}</span>
+                                                            </div>
+                                                        )}
                                                     </div>
                                                     <div className="flex flex-col md:flex-row gap-2 items-stretch">
                                                         <button className="btn btn-outline btn-sm">Редактировать</button>
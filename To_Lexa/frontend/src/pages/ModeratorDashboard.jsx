@@ -1,4 +1,4 @@
-﻿import React, { useState, useEffect } from 'react';
+﻿import React, { useState, useEffect, useRef } from 'react';
 import { TrendingUp, Users, Briefcase, Download, CheckCircle, XCircle, Search, Building } from 'lucide-react';
 import { moderatorAPI } from '../services/api';
 
@@ -19,11 +19,25 @@ function ModeratorDashboard({ user }) {
     const [userTypeFilter, setUserTypeFilter] = useState('all');
     const [vacancyStatusFilter, setVacancyStatusFilter] = useState('all');
 
+    // Выбранные вакансии для пакетных действий и курсор ленты изменений
+    const [selectedIds, setSelectedIds] = useState([]);
+    const changesCursor = useRef(null);
+
     useEffect(() => { loadData(); }, []);
 
+    // Пока открыта вкладка вакансий, дочитываем только изменения
+    useEffect(() => {
+        if (activeTab !== 'vacancies') return;
+        const timer = setInterval(refreshVacancies, 30000);
+        return () => clearInterval(timer);
+    }, [activeTab]);
+
     const loadData = async () => {
         setLoading(true);
         try {
+            // Курсор берётся до загрузки списка, чтобы не пропустить изменения между запросами
+            const cursorRes = await moderatorAPI.getVacancyChanges();
+            changesCursor.current = cursorRes.data.cursor;
             const [analyticsRes, usersRes, vacanciesRes, universitiesRes] = await Promise.all([
                 moderatorAPI.getDetailedAnalytics(), // НОВОЕ: Запрашиваем расширенную аналитику
                 moderatorAPI.getAllUsers(),
@@ -38,18 +52,66 @@ function ModeratorDashboard({ user }) {
         finally { setLoading(false); }
     };
 
+    const refreshVacancies = async () => {
+        if (!changesCursor.current) return;
+        try {
+            const { data } = await moderatorAPI.getVacancyChanges(changesCursor.current);
+            if (data.reset) { loadData(); return; }
+            changesCursor.current = data.cursor;
+            if (data.changed.length === 0 && data.deleted.length === 0) return;
+            const changed = new Map(data.changed.map(v => [v.id, v]));
+            const deleted = new Set(data.deleted);
+            setVacancies(prev => {
+                const kept = prev.filter(v => !deleted.has(v.id) && !changed.has(v.id));
+                return [...changed.values()].filter(v => !deleted.has(v.id)).concat(kept)
+                    .sort((a, b) => (b.created_at || '').localeCompare(a.created_at || ''));
+            });
+            setSelectedIds(prev => prev.filter(id => !deleted.has(id)));
+        } catch (error) { console.error('Ошибка обновления вакансий:', error); }
+    };
+
+    const moderate = async (action, vacancyIds) => {
+        const { data } = await moderatorAPI.bulkModerate(action, vacancyIds);
+        setSelectedIds(prev => prev.filter(id => !vacancyIds.includes(id)));
+        await refreshVacancies();
+        return data;
+    };
+
     const handleApproveVacancy = async (vacancyId) => {
         if (!window.confirm('Подтвердить вакансию?')) return;
-        try { await moderatorAPI.approveVacancy(vacancyId); loadData(); }
+        try { await moderate('approve', [vacancyId]); }
         catch (error) { alert('Ошибка подтверждения вакансии'); }
     };
 
     const handleDeleteVacancy = async (vacancyId) => {
         if (!window.confirm('УДАЛИТЬ вакансию? Действие необратимо.')) return;
-        try { await moderatorAPI.deleteVacancy(vacancyId); loadData(); }
+        try { await moderate('delete', [vacancyId]); }
         catch (error) { alert('Ошибка удаления вакансии'); }
     };
 
+    const handleBulkAction = async (action, label) => {
+        if (selectedIds.length === 0) return;
+        if (!window.confirm(`${label}: ${selectedIds.length} вакансий?`)) return;
+        try {
+            const result = await moderate(action, selectedIds);
+            if (result.not_found.length > 0) alert(`Не найдено вакансий: ${result.not_found.length}`);
+        }
+        catch (error) { alert('Ошибка пакетной модерации'); }
+    };
+
+    // Следующая страница очереди: самые приоритетные и старые вакансии на модерации
+    const handleSelectQueue = async () => {
+        try {
+            const { data } = await moderatorAPI.getQueue({ limit: 200 });
+            setSelectedIds(data.items.map(v => v.id));
+            setVacancyStatusFilter('pending');
+        } catch (error) { alert('Ошибка загрузки очереди модерации'); }
+    };
+
+    const toggleSelected = (vacancyId) => {
+        setSelectedIds(prev => prev.includes(vacancyId) ? prev.filter(id => id !== vacancyId) : [...prev, vacancyId]);
+    };
+
     // ИСПРАВЛЕНО: Функция выгрузки CSV с поддержкой кириллицы (BOM)
     const downloadCSV = (data, filename) => {
         if (!data || data.length === 0) { alert("Нет данных для скачивания."); return; }
@@ -133,10 +195,16 @@ function ModeratorDashboard({ user }) {
                         <div className="grid grid-cols-2 gap-4 mb-4">
                             <input type="text" className="form-input" placeholder="Поиск по названию или компании..." value={searchQuery} onChange={(e) => setSearchQuery(e.target.value)} />
                             <select className="form-select" value={vacancyStatusFilter} onChange={(e) => setVacancyStatusFilter(e.target.value)}>
-                                <option value="all">Все статусы</option><option value="active">Активные</option><option value="pending">На модерации</option><option value="archived">В архиве</option>
+                                <option value="all">Все статусы</option><option value="active">Активные</option><option value="pending">На модерации</option><option value="rejected">Отклонённые</option><option value="archived">В архиве</option>
                             </select>
                         </div>
-                        <div className="table-container"><table className="moderator-table"><thead><tr><th>Название</th><th>Компания</th><th>Статус</th><th>Действия</th></tr></thead><tbody>{filteredVacancies.map(v => (<tr key={v.id}><td>{v.title}</td><td>{v.company_profiles?.company_name || 'Не указана'}</td><td><span className={`badge ${v.status === 'active' ? 'badge-success' : v.status === 'pending' ? 'badge-warning' : 'badge-secondary'}`}>{v.status || 'pending'}</span></td><td className="flex gap-2">{v.status !== 'active' && <button title="Подтвердить" className="btn btn-success btn-sm" onClick={() => handleApproveVacancy(v.id)}><CheckCircle size={16} /></button>}<button title="Удалить" className="btn btn-error btn-sm" onClick={() => handleDeleteVacancy(v.id)}><XCircle size={16} /></button></td></tr>))}</tbody></table></div>
+                        <div className="flex gap-2 mb-4">
+                            <button className="btn btn-outline btn-sm" onClick={handleSelectQueue}>Выбрать из очереди</button>
+                            <button className="btn btn-success btn-sm" disabled={selectedIds.length === 0} onClick={() => handleBulkAction('approve', 'Подтвердить')}><CheckCircle size={16} /> Подтвердить ({selectedIds.length})</button>
+                            <button className="btn btn-outline btn-sm" disabled={selectedIds.length === 0} onClick={() => handleBulkAction('reject', 'Отклонить')}>Отклонить ({selectedIds.length})</button>
+                            <button className="btn btn-error btn-sm" disabled={selectedIds.length === 0} onClick={() => handleBulkAction('delete', 'УДАЛИТЬ')}><XCircle size={16} /> Удалить ({selectedIds.length})</button>
+                        </div>
+                        <div className="table-container"><table className="moderator-table"><thead><tr><th><input type="checkbox" checked={filteredVacancies.length > 0 && filteredVacancies.every(v => selectedIds.includes(v.id))} onChange={(e) => setSelectedIds(e.target.checked ? filteredVacancies.map(v => v.id) : [])} /></th><th>Название</th><th>Компания</th><th>Статус</th><th>Действия</th></tr></thead><tbody>{filteredVacancies.map(v => (<tr key={v.id}><td><input type="checkbox" checked={selectedIds.includes(v.id)} onChange={() => toggleSelected(v.id)} /></td><td>{v.title}</td><td>{v.company_profiles?.company_name || 'Не указана'}</td><td><span className={`badge ${v.status === 'active' ? 'badge-success' : v.status === 'pending' ? 'badge-warning' : 'badge-secondary'}`}>{v.status || 'pending'}</span></td><td className="flex gap-2">{v.status !== 'active' && <button title="Подтвердить" className="btn btn-success btn-sm" onClick={() => handleApproveVacancy(v.id)}><CheckCircle size={16} /></button>}<button title="Удалить" className="btn btn-error btn-sm" onClick={() => handleDeleteVacancy(v.id)}><XCircle size={16} /></button></td></tr>))}</tbody></table></div>
                     </div>
                 )}
             </div>
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { User, FileText, Calendar, Briefcase, Plus, Edit, Save } from 'lucide-react';
-import { studentsAPI, resumesAPI, appointmentsAPI, vacanciesAPI } from '../services/api';
+import { studentsAPI, resumesAPI, appointmentsAPI, skillsAPI } from '../services/api';
 
 function StudentDashboard({ user }) {
   const [activeTab, setActiveTab] = useState('profile');
@@ -13,6 +13,7 @@ function StudentDashboard({ user }) {
   const [showResumeForm, setShowResumeForm] = useState(false);
   const [showEditResumeForm, setShowEditResumeForm] = useState(false);
   const [editingResumeId, setEditingResumeId] = useState(null);
+  const [skillSuggestions, setSkillSuggestions] = useState([]);
 
   const [profileForm, setProfileForm] = useState({
     university: '',
@@ -70,10 +71,10 @@ function StudentDashboard({ user }) {
         setAppointments([]);
       }
 
-      // Загружаем вакансии
+      // Загружаем персональную ленту вакансий
       try {
-        const vacanciesRes = await vacanciesAPI.getAll({ limit: 10 });
-        setVacancies(vacanciesRes.data);
+        const vacanciesRes = await studentsAPI.getFeed(user.id, { limit: 10 });
+        setVacancies(vacanciesRes.data.items || []);
       } catch (err) {
         setVacancies([]);
       }
@@ -158,9 +159,23 @@ function StudentDashboard({ user }) {
     );
   }
 
+  // Подсказки для последнего навыка в строке: варианты из справочника подставляются вместе с уже введёнными
+  const suggestSkills = (value) => {
+    const parts = value.split(',');
+    const last = parts.pop().trim();
+    if (!last) { setSkillSuggestions([]); return; }
+    const head = parts.map(s => s.trim()).filter(Boolean);
+    skillsAPI.suggest(last)
+      .then(res => setSkillSuggestions(res.data.map(skill => [...head, skill].join(', '))))
+      .catch(() => setSkillSuggestions([]));
+  };
+
   return (
     <div className="py-6" style={{ backgroundColor: 'var(--bg-secondary)', minHeight: 'calc(100vh - 80px)' }}>
       <div className="container">
+        <datalist id="skill-suggestions">
+          {skillSuggestions.map(option => <option key={option} value={option} />)}
+        </datalist>
         <div style={{ marginBottom: '2rem' }}>
           <h1 style={{ marginBottom: '0.5rem' }}>Личный кабинет студента</h1>
           <p style={{ color: 'var(--text-secondary)' }}>
@@ -264,7 +279,8 @@ function StudentDashboard({ user }) {
                     type="text"
                     className="form-input"
                     value={Array.isArray(profileForm.skills) ? profileForm.skills.join(', ') : ''}
-                    onChange={(e) => setProfileForm({ ...profileForm, skills: e.target.value.split(',').map(s => s.trim()) })}
+                    list="skill-suggestions"
+                    onChange={(e) => { setProfileForm({ ...profileForm, skills: e.target.value.split(',').map(s => s.trim()) }); suggestSkills(e.target.value); }}
                     disabled={!editMode}
                     placeholder="Python, JavaScript, React"
                   />
@@ -380,7 +396,8 @@ function StudentDashboard({ user }) {
                           type="text"
                           className="form-input"
                           value={Array.isArray(resumeForm.skills) ? resumeForm.skills.join(', ') : ''}
-                          onChange={(e) => setResumeForm({ ...resumeForm, skills: e.target.value.split(',').map(s => s.trim()) })}
+                          list="skill-suggestions"
+                          onChange={(e) => { setResumeForm({ ...resumeForm, skills: e.target.value.split(',').map(s => s.trim()) }); suggestSkills(e.target.value); }}
                           placeholder="Python, JavaScript, React"
                         />
                       </div>
@@ -469,7 +486,8 @@ function StudentDashboard({ user }) {
                           type="text"
                           className="form-input"
                           value={Array.isArray(resumeForm.skills) ? resumeForm.skills.join(', ') : ''}
-                          onChange={(e) => setResumeForm({ ...resumeForm, skills: e.target.value.split(',').map(s => s.trim()) })}
+                          list="skill-suggestions"
+                          onChange={(e) => { setResumeForm({ ...resumeForm, skills: e.target.value.split(',').map(s => s.trim()) }); suggestSkills(e.target.value); }}
                           placeholder="Python, JavaScript, React"
                         />
                       </div>
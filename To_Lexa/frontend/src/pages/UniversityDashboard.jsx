@@ -6,6 +6,7 @@ function UniversityDashboard({ user }) {
   const [activeTab, setActiveTab] = useState('profile');
   const [profile, setProfile] = useState(null);
   const [internships, setInternships] = useState([]);
+  const [cohorts, setCohorts] = useState(null);
   const [loading, setLoading] = useState(true);
   const [editMode, setEditMode] = useState(false);
 
@@ -43,6 +44,14 @@ function UniversityDashboard({ user }) {
       } catch (err) {
         setInternships([]);
       }
+
+      // Показатели студентов вуза по годам выпуска
+      try {
+        const cohortsRes = await universitiesAPI.getCohorts();
+        setCohorts(cohortsRes.data);
+      } catch (err) {
+        setCohorts(null);
+      }
     } catch (error) {
       console.error('Error loading data:', error);
     } finally {
@@ -64,6 +73,8 @@ function UniversityDashboard({ user }) {
     }
   };
 
+  const formatRate = (rate) => (rate === null || rate === undefined ? '—' : `${Math.round(rate * 100)}%`);
+
   if (loading) {
     return (
       <div className="loading-overlay">
@@ -257,7 +268,7 @@ function UniversityDashboard({ user }) {
                   color: 'var(--primary-color)',
                   marginBottom: '0.5rem'
                 }}>
-                  0
+                  {cohorts?.total?.students ?? 0}
                 </div>
                 <div style={{ color: 'var(--text-secondary)' }}>Студентов на платформе</div>
               </div>
@@ -281,7 +292,7 @@ function UniversityDashboard({ user }) {
                   color: 'var(--accent-color)',
                   marginBottom: '0.5rem'
                 }}>
-                  0
+                  {cohorts?.total?.internship_placed ?? 0}
                 </div>
                 <div style={{ color: 'var(--text-secondary)' }}>Трудоустроено</div>
               </div>
@@ -289,9 +300,42 @@ function UniversityDashboard({ user }) {
 
             <div className="card">
               <h4 className="card-title">Аналитика по трудоустройству</h4>
-              <p style={{ color: 'var(--text-secondary)' }}>
-                Детальная статистика появится после регистрации студентов и их трудоустройства
-              </p>
+              {!cohorts?.cohorts?.length ? (
+                <p style={{ color: 'var(--text-secondary)' }}>
+                  Детальная статистика появится после регистрации студентов и их трудоустройства
+                </p>
+              ) : (
+                <div style={{ overflowX: 'auto' }}>
+                  <table style={{ width: '100%', borderCollapse: 'collapse', fontSize: '0.875rem' }}>
+                    <thead>
+                      <tr style={{ textAlign: 'left', color: 'var(--text-secondary)' }}>
+                        <th>Год выпуска</th>
+                        <th>Студентов</th>
+                        <th>Откликались</th>
+                        <th>Откликов</th>
+                        <th>Ответили работодатели</th>
+                        <th>AI-оценка</th>
+                        <th>Стажировки</th>
+                        <th>Популярные навыки</th>
+                      </tr>
+                    </thead>
+                    <tbody>
+                      {[...cohorts.cohorts, { ...cohorts.total, graduation_year: 'Итого' }].map((cohort, index) => (
+                        <tr key={index} style={{ borderTop: '1px solid var(--border-color)' }}>
+                          <td>{cohort.graduation_year ?? 'не указан'}</td>
+                          <td>{cohort.students}</td>
+                          <td>{cohort.applicants} ({formatRate(cohort.application_rate)})</td>
+                          <td>{cohort.applications}</td>
+                          <td>{formatRate(cohort.response_rate)}</td>
+                          <td>{cohort.avg_criteria_rating ?? '—'}</td>
+                          <td>{cohort.internship_placed} ({formatRate(cohort.placement_rate)})</td>
+                          <td>{cohort.top_skills.slice(0, 5).map(s => s.skill).join(', ') || '—'}</td>
+                        </tr>
+                      ))}
+                    </tbody>
+                  </table>
+                </div>
+              )}
             </div>
           </div>
         )}
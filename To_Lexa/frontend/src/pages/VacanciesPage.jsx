@@ -6,6 +6,7 @@ function VacanciesPage({ user }) {
   const [vacancies, setVacancies] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState('');
+  const [totalFound, setTotalFound] = useState(0);
   const [filters, setFilters] = useState({
     employment_type: '',
     is_internship: null
@@ -18,9 +19,11 @@ function VacanciesPage({ user }) {
   const [studentResumes, setStudentResumes] = useState([]);
   const [isSubmitting, setIsSubmitting] = useState(false); // Для состояния загрузки при отправке
 
+  // Поиск выполняется на сервере; небольшая задержка, чтобы не слать запрос на каждый символ
   useEffect(() => {
-    loadVacancies();
-  }, [filters]);
+    const timer = setTimeout(loadVacancies, 250);
+    return () => clearTimeout(timer);
+  }, [filters, searchQuery]);
 
   // Загрузка резюме студента при монтировании
   useEffect(() => {
@@ -47,25 +50,25 @@ function VacanciesPage({ user }) {
   const loadVacancies = async () => {
     setLoading(true);
     try {
-      const params = {};
+      const params = { limit: 100 };
+      if (searchQuery.trim()) params.q = searchQuery.trim();
       if (filters.employment_type) params.employment_type = filters.employment_type;
       if (filters.is_internship !== null) params.is_internship = filters.is_internship;
 
-      const response = await vacanciesAPI.getAll(params);
-      setVacancies(response.data);
+      const response = await vacanciesAPI.search(params);
+      setVacancies(response.data.items || []);
+      setTotalFound(response.data.total || 0);
     } catch (error) {
       console.error('Error loading vacancies:', error);
       setVacancies([]);
+      setTotalFound(0);
     } finally {
       setLoading(false);
     }
   };
 
-  // Фильтрация вакансий на стороне клиента
-  const filteredVacancies = vacancies.filter(vacancy =>
-    vacancy.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    vacancy.description.toLowerCase().includes(searchQuery.toLowerCase())
-  );
+  // Вакансии уже отфильтрованы и отсортированы по релевантности на сервере
+  const filteredVacancies = vacancies;
 
   // Обработчик открытия модального окна
   const handleOpenResponseModal = (vacancyId) => {
@@ -154,7 +157,7 @@ function VacanciesPage({ user }) {
           </div>
         ) : (
           <>
-            <div style={{ marginBottom: '1rem', color: 'var(--text-secondary)' }}>Найдено вакансий: <strong>{filteredVacancies.length}</strong></div>
+            <div style={{ marginBottom: '1rem', color: 'var(--text-secondary)' }}>Найдено вакансий: <strong>{totalFound}</strong></div>
             <div className="grid grid-cols-1 gap-4">
               {filteredVacancies.map((vacancy) => (
                 <div key={vacancy.id} className="card">
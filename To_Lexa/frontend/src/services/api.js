@@ -12,11 +12,23 @@ api.interceptors.request.use(config => {
   return config;
 });
 
+// Сервер перегружен (429/503): GET-запрос повторяем один раз после Retry-After, если ждать недолго
+api.interceptors.response.use(null, async error => {
+  const { config, response } = error;
+  const retryAfter = Number(response?.headers?.['retry-after']);
+  if (config && !config._retried && config.method === 'get' && [429, 503].includes(response?.status) && retryAfter <= 5) {
+    config._retried = true;
+    await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    return api(config);
+  }
+  return Promise.reject(error);
+});
+
 // --- API АВТОРИЗАЦИИ ---
 export const authAPI = { register: (data) => api.post('/api/auth/register', data), login: (data) => api.post('/api/auth/login', data) };
 
 // --- API СТУДЕНТОВ ---
-export const studentsAPI = { createProfile: (data) => api.post('/api/students/profile', data), getProfile: (userId) => api.get(`/api/students/profile/${userId}`), updateProfile: (userId, data) => api.put(`/api/students/profile/${userId}`, data) };
+export const studentsAPI = { createProfile: (data) => api.post('/api/students/profile', data), getProfile: (userId) => api.get(`/api/students/profile/${userId}`), updateProfile: (userId, data) => api.put(`/api/students/profile/${userId}`, data), getFeed: (userId, params) => api.get(`/api/students/${userId}/feed`, { params }) };
 
 // --- API РЕЗЮМЕ ---
 export const resumesAPI = {
@@ -28,25 +40,32 @@ export const resumesAPI = {
 // --- API КОМПАНИЙ ---
 export const companiesAPI = {
     createProfile: (data) => api.post('/api/companies/profile', data),
-    getProfile: (userId) => api.get(`/api/companies/profile/${userId}`)
+    getProfile: (userId) => api.get(`/api/companies/profile/${userId}`),
+    getAIUsage: () => api.get('/api/companies/ai-usage'),
+    getFunnel: (params) => api.get('/api/companies/funnel', { params }),
     };
 
 // --- API ВАКАНСИЙ (ИСПРАВЛЕННЫЙ БЛОК) ---
 export const vacanciesAPI = {
   create: (data) => api.post('/api/vacancies', data),
   getAll: (params) => api.get('/api/vacancies', { params }),
+  search: (params) => api.get('/api/vacancies/search', { params }),
   getById: (id) => api.get(`/api/vacancies/${id}`),
   getMyCompanyVacancies: () => api.get('/api/companies/my-vacancies'),
   createVacancyResponse: (data) => api.post('/api/vacancy_touches', data),
-  getVacancyWithResponses: (id) => api.get(`/api/vacancies/${id}/responses`),
+  getVacancyWithResponses: (id, params) => api.get(`/api/vacancies/${id}/responses`, { params }),
   generateAISummary: (touchId) => api.post(`/api/vacancy_touch/${touchId}/generate_summary`),
+  getRanking: (id, params) => api.get(`/api/vacancies/${id}/ranking`, { params }),
+  updateResponseStatus: (touchId, status) => api.put(`/api/vacancy_touch/${touchId}/status`, { status }),
 };
 
 // --- ОСТАЛЬНЫЕ API ---
-export const universitiesAPI = { createProfile: (data) => api.post('/api/universities/profile', data), getProfile: (userId) => api.get(`/api/universities/profile/${userId}`) };
-export const appointmentsAPI = { create: (data) => api.post('/api/appointments', data), getByStudent: (studentId) => api.get(`/api/appointments/student/${studentId}`) };
+export const universitiesAPI = { createProfile: (data) => api.post('/api/universities/profile', data), getProfile: (userId) => api.get(`/api/universities/profile/${userId}`), getCohorts: () => api.get('/api/universities/cohorts') };
+export const appointmentsAPI = { create: (data) => api.post('/api/appointments', data), getByStudent: (studentId, params) => api.get(`/api/appointments/student/${studentId}`, { params }), getAvailability: (params) => api.get('/api/appointments/availability', { params }), cancel: (id) => api.post(`/api/appointments/${id}/cancel`) };
 export const chatAPI = { sendMessage: (data) => api.post('/api/chat/messages', data), getMessages: (userId, limit=100) => api.get(`/api/chat/messages/${userId}`, { params: { limit } }) };
 export const aiChatAPI = { sendQuery: (data) => api.post('/api/ai/chat', data) };
+export const jobsAPI = { get: (jobId) => api.get(`/api/jobs/${jobId}`) };
+export const skillsAPI = { suggest: (q, limit = 10) => api.get('/api/skills/suggest', { params: { q, limit } }) };
 
 export const analyticsAPI = {
   getOverview: () => {
@@ -85,6 +104,10 @@ export const moderatorAPI = {
   getDetailedAnalytics: () => api.get('/api/moderator/analytics/detailed'),
   approveVacancy: (vacancyId) => api.post(`/api/moderator/vacancies/${vacancyId}/approve`),
   deleteVacancy: (vacancyId) => api.delete(`/api/moderator/vacancies/${vacancyId}`),
+  canonicalizeSkills: () => api.post('/api/moderator/skills/canonicalize'),
+  getQueue: (params) => api.get('/api/moderator/queue', { params }),
+  bulkModerate: (action, vacancyIds, priority) => api.post('/api/moderator/vacancies/bulk', { action, vacancy_ids: vacancyIds, priority }),
+  getVacancyChanges: (since) => api.get('/api/moderator/vacancies/changes', { params: since ? { since } : {} }),
 };
 
 export default api;
\ No newline at end of file
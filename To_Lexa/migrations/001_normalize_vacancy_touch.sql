@@ -0,0 +1,67 @@
+-- Одноразовая миграция: нормализуем колонки vacancy_touch на стороне БД,
+-- чтобы API не переименовывал и не приводил поля в Python на каждый запрос.
+
+-- Рейтинг из старого значения: первое число строки ("85.0" -> 85, "8/10" -> 8),
+-- округлённое; всё вне шкалы 1..100 — NULL, а не правдоподобная, но неверная оценка
+CREATE OR REPLACE FUNCTION vacancy_touch_rating(value text) RETURNS integer AS $$
+    SELECT CASE WHEN r BETWEEN 1 AND 100 THEN r::integer END
+    FROM (SELECT round(substring(value FROM '-?\d+(?:\.\d+)?')::numeric) AS r) AS parsed;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 1. Переносим значения из устаревших колонок (опечатки и старые имена)
+DO $$
+DECLARE
+    legacy text;
+    target text;
+    target_type text;
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'vacancy_touch' AND column_name = 'ai_summery') THEN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'vacancy_touch' AND column_name = 'ai_summary') THEN
+            ALTER TABLE vacancy_touch RENAME COLUMN ai_summery TO ai_summary;
+        ELSE
+            UPDATE vacancy_touch SET ai_summary = ai_summery WHERE ai_summary IS NULL;
+            ALTER TABLE vacancy_touch DROP COLUMN ai_summery;
+        END IF;
+    END IF;
+
+    -- Рейтинги: старое значение приводится к типу целевой колонки (text или уже integer),
+    -- иначе UPDATE падает — присваивающего приведения text -> integer в Postgres нет
+    FOR legacy, target IN SELECT * FROM (VALUES ('meets_creteria_rating', 'meets_criteria_rating'),
+                                                ('meets_criteria', 'meets_criteria_rating'),
+                                                ('motivation_score', 'motivation_rating'),
+                                                ('motivation', 'motivation_rating')) AS pairs LOOP
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'vacancy_touch' AND column_name = legacy) THEN
+            SELECT data_type INTO target_type FROM information_schema.columns
+                WHERE table_name = 'vacancy_touch' AND column_name = target;
+            IF target_type IS NULL THEN
+                EXECUTE format('ALTER TABLE vacancy_touch RENAME COLUMN %I TO %I', legacy, target);
+            ELSE
+                IF target_type IN ('text', 'character varying') THEN
+                    EXECUTE format('UPDATE vacancy_touch SET %I = %I::text WHERE %I IS NULL', target, legacy, target);
+                ELSE
+                    EXECUTE format('UPDATE vacancy_touch SET %I = vacancy_touch_rating(%I::text) WHERE %I IS NULL',
+                                   target, legacy, target);
+                END IF;
+                EXECUTE format('ALTER TABLE vacancy_touch DROP COLUMN %I', legacy);
+            END IF;
+        END IF;
+    END LOOP;
+END $$;
+
+-- 2. Рейтинги храним как целые числа (раньше могли приходить строками)
+ALTER TABLE vacancy_touch
+    ALTER COLUMN meets_criteria_rating TYPE integer USING vacancy_touch_rating(meets_criteria_rating::text),
+    ALTER COLUMN motivation_rating TYPE integer USING vacancy_touch_rating(motivation_rating::text);
+
+DROP FUNCTION vacancy_touch_rating(text);
+
+-- 3. Индексы под постраничную выдачу откликов с сортировкой
+CREATE INDEX IF NOT EXISTS vacancy_touch_vacancy_created_idx
+    ON vacancy_touch (vacancy_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS vacancy_touch_vacancy_criteria_idx
+    ON vacancy_touch (vacancy_id, meets_criteria_rating DESC NULLS LAST);
+CREATE INDEX IF NOT EXISTS vacancy_touch_vacancy_motivation_idx
+    ON vacancy_touch (vacancy_id, motivation_rating DESC NULLS LAST);
@@ -0,0 +1,7 @@
+-- Готовые персональные ленты вакансий (top-K на студента), см. backend/feed.py
+CREATE TABLE IF NOT EXISTS student_feeds (
+    student_id uuid PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+    terms jsonb NOT NULL DEFAULT '[]'::jsonb,
+    items jsonb NOT NULL DEFAULT '[]'::jsonb,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
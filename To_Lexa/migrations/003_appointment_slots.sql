@@ -0,0 +1,27 @@
+-- Длительность встреч и защита от двойного бронирования, см. backend/scheduling.py
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS consultant_id uuid REFERENCES users (id);
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS duration_minutes integer NOT NULL DEFAULT 30;
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS ends_at timestamptz;
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS resource_id text;
+
+UPDATE appointments
+SET ends_at = appointment_date + make_interval(mins => duration_minutes),
+    resource_id = COALESCE('company:' || company_id::text, 'consultant:' || consultant_id::text, 'career_center')
+WHERE ends_at IS NULL OR resource_id IS NULL;
+
+ALTER TABLE appointments ALTER COLUMN ends_at SET NOT NULL;
+ALTER TABLE appointments ALTER COLUMN resource_id SET NOT NULL;
+
+-- Пересекающиеся встречи одного ресурса или одного студента отклоняются атомарно (ошибка 23P01).
+-- Если старые данные уже пересекаются, ограничение не создастся: такие записи нужно отменить заранее.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE appointments ADD CONSTRAINT appointments_resource_no_overlap
+    EXCLUDE USING gist (resource_id WITH =, tstzrange(appointment_date, ends_at) WITH &&)
+    WHERE (status <> 'cancelled');
+
+ALTER TABLE appointments ADD CONSTRAINT appointments_student_no_overlap
+    EXCLUDE USING gist (student_id WITH =, tstzrange(appointment_date, ends_at) WITH &&)
+    WHERE (status <> 'cancelled');
+
+CREATE INDEX IF NOT EXISTS appointments_student_date_idx ON appointments (student_id, appointment_date DESC);
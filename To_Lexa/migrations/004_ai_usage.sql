@@ -0,0 +1,15 @@
+-- Журнал токенов LLM по вызовам, см. backend/usage.py
+CREATE TABLE IF NOT EXISTS ai_usage (
+    id bigserial PRIMARY KEY,
+    owner_id text,
+    feature text NOT NULL,
+    model text NOT NULL,
+    prompt_tokens integer NOT NULL DEFAULT 0,
+    completion_tokens integer NOT NULL DEFAULT 0,
+    ref_id text,
+    latency_ms integer,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ai_usage_owner_created_idx ON ai_usage (owner_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS ai_usage_created_idx ON ai_usage (created_at);
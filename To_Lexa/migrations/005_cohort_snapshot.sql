@@ -0,0 +1,30 @@
+-- Инкрементальное обновление снимка когорт (backend/cohorts.py): изменения
+-- студентов и откликов забираются по updated_at, который ведёт триггер.
+
+ALTER TABLE student_profiles ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+ALTER TABLE vacancy_touch ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+
+UPDATE student_profiles SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+UPDATE vacancy_touch SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+
+ALTER TABLE student_profiles ALTER COLUMN updated_at SET DEFAULT now(), ALTER COLUMN updated_at SET NOT NULL;
+ALTER TABLE vacancy_touch ALTER COLUMN updated_at SET DEFAULT now(), ALTER COLUMN updated_at SET NOT NULL;
+
+-- Любое изменение строки (в том числе статуса отклика из панели Supabase) сдвигает updated_at
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS student_profiles_updated_at ON student_profiles;
+CREATE TRIGGER student_profiles_updated_at BEFORE UPDATE ON student_profiles
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+DROP TRIGGER IF EXISTS vacancy_touch_updated_at ON vacancy_touch;
+CREATE TRIGGER vacancy_touch_updated_at BEFORE UPDATE ON vacancy_touch
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE INDEX IF NOT EXISTS student_profiles_updated_idx ON student_profiles (updated_at);
+CREATE INDEX IF NOT EXISTS vacancy_touch_updated_idx ON vacancy_touch (updated_at);
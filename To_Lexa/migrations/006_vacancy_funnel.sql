@@ -0,0 +1,149 @@
+-- Счётчики воронки откликов (backend/funnel.py). Триггер на vacancy_touch
+-- обновляет их в той же транзакции, что и сам отклик, поэтому счётчики
+-- верны при любом пути записи (API, пакетная вставка, правка в панели Supabase).
+
+-- Текущее число откликов каждой вакансии в каждом статусе
+CREATE TABLE IF NOT EXISTS vacancy_funnel (
+    vacancy_id uuid PRIMARY KEY REFERENCES vacancies (id) ON DELETE CASCADE,
+    company_id uuid NOT NULL,
+    pending integer NOT NULL DEFAULT 0,
+    viewed integer NOT NULL DEFAULT 0,
+    accepted integer NOT NULL DEFAULT 0,
+    rejected integer NOT NULL DEFAULT 0,
+    total integer NOT NULL DEFAULT 0,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS vacancy_funnel_company_idx ON vacancy_funnel (company_id);
+
+-- Сколько откликов перешло в статус за день (pending — новые отклики)
+CREATE TABLE IF NOT EXISTS vacancy_funnel_daily (
+    vacancy_id uuid NOT NULL REFERENCES vacancies (id) ON DELETE CASCADE,
+    company_id uuid NOT NULL,
+    day date NOT NULL,
+    status text NOT NULL,
+    entered integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (vacancy_id, day, status)
+);
+CREATE INDEX IF NOT EXISTS vacancy_funnel_daily_company_idx ON vacancy_funnel_daily (company_id, day);
+
+CREATE TABLE IF NOT EXISTS vacancy_funnel_state (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    reconciled_at timestamptz NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION vacancy_funnel_add(p_vacancy_id uuid, p_status text, p_delta integer) RETURNS void AS $$
+    INSERT INTO vacancy_funnel (vacancy_id, company_id, pending, viewed, accepted, rejected, total)
+    SELECT v.id, v.company_id,
+           CASE WHEN p_status = 'pending' THEN p_delta ELSE 0 END,
+           CASE WHEN p_status = 'viewed' THEN p_delta ELSE 0 END,
+           CASE WHEN p_status = 'accepted' THEN p_delta ELSE 0 END,
+           CASE WHEN p_status = 'rejected' THEN p_delta ELSE 0 END,
+           p_delta
+    FROM vacancies v WHERE v.id = p_vacancy_id
+    ON CONFLICT (vacancy_id) DO UPDATE SET
+        pending = vacancy_funnel.pending + EXCLUDED.pending,
+        viewed = vacancy_funnel.viewed + EXCLUDED.viewed,
+        accepted = vacancy_funnel.accepted + EXCLUDED.accepted,
+        rejected = vacancy_funnel.rejected + EXCLUDED.rejected,
+        total = vacancy_funnel.total + EXCLUDED.total,
+        updated_at = now();
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION vacancy_funnel_track() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.vacancy_id = OLD.vacancy_id
+       AND COALESCE(NEW.status, 'pending') = COALESCE(OLD.status, 'pending') THEN
+        RETURN NEW;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM vacancy_funnel_add(OLD.vacancy_id, COALESCE(OLD.status, 'pending'), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM vacancy_funnel_add(NEW.vacancy_id, COALESCE(NEW.status, 'pending'), 1);
+        INSERT INTO vacancy_funnel_daily (vacancy_id, company_id, day, status, entered)
+        SELECT v.id, v.company_id, current_date, COALESCE(NEW.status, 'pending'), 1
+        FROM vacancies v WHERE v.id = NEW.vacancy_id
+        ON CONFLICT (vacancy_id, day, status) DO UPDATE SET entered = vacancy_funnel_daily.entered + 1;
+    END IF;
+    RETURN COALESCE(NEW, OLD);
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vacancy_touch_funnel ON vacancy_touch;
+CREATE TRIGGER vacancy_touch_funnel AFTER INSERT OR UPDATE OF status, vacancy_id OR DELETE ON vacancy_touch
+    FOR EACH ROW EXECUTE FUNCTION vacancy_funnel_track();
+
+-- Сверка текущих счётчиков с vacancy_touch. Вызывается всеми воркерами периодически,
+-- выполняется не чаще min_interval_seconds; возвращает число исправленных вакансий или -1, если пропущена.
+CREATE OR REPLACE FUNCTION vacancy_funnel_reconcile(min_interval_seconds integer DEFAULT 0) RETURNS integer AS $$
+DECLARE
+    fixed integer;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('vacancy_funnel_reconcile')) THEN
+        RETURN -1;
+    END IF;
+    IF EXISTS (SELECT 1 FROM vacancy_funnel_state
+               WHERE reconciled_at > now() - make_interval(secs => min_interval_seconds)) THEN
+        RETURN -1;
+    END IF;
+
+    WITH actual AS (
+        SELECT v.id AS vacancy_id, v.company_id,
+               count(t.id) FILTER (WHERE COALESCE(t.status, 'pending') = 'pending')::integer AS pending,
+               count(t.id) FILTER (WHERE t.status = 'viewed')::integer AS viewed,
+               count(t.id) FILTER (WHERE t.status = 'accepted')::integer AS accepted,
+               count(t.id) FILTER (WHERE t.status = 'rejected')::integer AS rejected,
+               count(t.id)::integer AS total
+        FROM vacancies v LEFT JOIN vacancy_touch t ON t.vacancy_id = v.id
+        GROUP BY v.id, v.company_id
+    ), drifted AS (
+        -- Разница со счётчиками из того же снимка. Она прибавляется к строке, а не
+        -- заменяет её: если триггер успел закоммитить отклик во время сверки,
+        -- ON CONFLICT дождётся блокировки и сложит разницу с уже обновлённой строкой
+        SELECT a.vacancy_id, a.company_id,
+               a.pending - COALESCE(cur.pending, 0) AS pending,
+               a.viewed - COALESCE(cur.viewed, 0) AS viewed,
+               a.accepted - COALESCE(cur.accepted, 0) AS accepted,
+               a.rejected - COALESCE(cur.rejected, 0) AS rejected,
+               a.total - COALESCE(cur.total, 0) AS total
+        FROM actual a LEFT JOIN vacancy_funnel cur ON cur.vacancy_id = a.vacancy_id
+        WHERE cur.vacancy_id IS NULL
+           OR (cur.company_id, cur.pending, cur.viewed, cur.accepted, cur.rejected, cur.total)
+              IS DISTINCT FROM (a.company_id, a.pending, a.viewed, a.accepted, a.rejected, a.total)
+    ), fixed_rows AS (
+        INSERT INTO vacancy_funnel (vacancy_id, company_id, pending, viewed, accepted, rejected, total, updated_at)
+        SELECT vacancy_id, company_id, pending, viewed, accepted, rejected, total, now() FROM drifted
+        ON CONFLICT (vacancy_id) DO UPDATE SET
+            company_id = EXCLUDED.company_id,
+            pending = vacancy_funnel.pending + EXCLUDED.pending,
+            viewed = vacancy_funnel.viewed + EXCLUDED.viewed,
+            accepted = vacancy_funnel.accepted + EXCLUDED.accepted,
+            rejected = vacancy_funnel.rejected + EXCLUDED.rejected,
+            total = vacancy_funnel.total + EXCLUDED.total,
+            updated_at = now()
+        RETURNING 1
+    )
+    SELECT count(*) INTO fixed FROM fixed_rows;
+
+    INSERT INTO vacancy_funnel_state (id, reconciled_at) VALUES (true, now())
+    ON CONFLICT (id) DO UPDATE SET reconciled_at = now();
+    RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Начальное заполнение: текущие счётчики — сверкой; история по дням — по датам
+-- создания (новые отклики) и последнего изменения (текущий статус), точнее уже не восстановить
+SELECT vacancy_funnel_reconcile(0);
+
+INSERT INTO vacancy_funnel_daily (vacancy_id, company_id, day, status, entered)
+SELECT t.vacancy_id, v.company_id, t.created_at::date, 'pending', count(*)
+FROM vacancy_touch t JOIN vacancies v ON v.id = t.vacancy_id
+GROUP BY t.vacancy_id, v.company_id, t.created_at::date
+ON CONFLICT (vacancy_id, day, status) DO NOTHING;
+
+INSERT INTO vacancy_funnel_daily (vacancy_id, company_id, day, status, entered)
+SELECT t.vacancy_id, v.company_id, t.updated_at::date, t.status, count(*)
+FROM vacancy_touch t JOIN vacancies v ON v.id = t.vacancy_id
+WHERE t.status IN ('viewed', 'accepted', 'rejected')
+GROUP BY t.vacancy_id, v.company_id, t.updated_at::date, t.status
+ON CONFLICT (vacancy_id, day, status) DO NOTHING;
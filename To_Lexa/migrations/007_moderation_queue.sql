@@ -0,0 +1,36 @@
+-- Очередь модерации (backend/moderation.py): приоритет вакансии в очереди,
+-- updated_at для ленты изменений и журнал удалений, которых в самой таблице уже нет.
+
+ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS moderation_priority integer NOT NULL DEFAULT 0;
+ALTER TABLE vacancies ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+
+UPDATE vacancies SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+ALTER TABLE vacancies ALTER COLUMN updated_at SET DEFAULT now(), ALTER COLUMN updated_at SET NOT NULL;
+
+-- touch_updated_at() создана в 005_cohort_snapshot.sql
+DROP TRIGGER IF EXISTS vacancies_updated_at ON vacancies;
+CREATE TRIGGER vacancies_updated_at BEFORE UPDATE ON vacancies
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Очередь: ожидающие модерации по приоритету, затем самые старые
+CREATE INDEX IF NOT EXISTS vacancies_moderation_queue_idx ON vacancies (moderation_priority DESC, created_at)
+    WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS vacancies_updated_idx ON vacancies (updated_at);
+
+CREATE TABLE IF NOT EXISTS vacancy_deletions (
+    vacancy_id uuid PRIMARY KEY,
+    deleted_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS vacancy_deletions_deleted_idx ON vacancy_deletions (deleted_at);
+
+CREATE OR REPLACE FUNCTION vacancy_track_deletion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO vacancy_deletions (vacancy_id, deleted_at) VALUES (OLD.id, now())
+    ON CONFLICT (vacancy_id) DO UPDATE SET deleted_at = now();
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vacancies_track_deletion ON vacancies;
+CREATE TRIGGER vacancies_track_deletion AFTER DELETE ON vacancies
+    FOR EACH ROW EXECUTE FUNCTION vacancy_track_deletion();
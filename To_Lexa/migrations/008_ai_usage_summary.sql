@@ -0,0 +1,18 @@
+-- Суммы расхода токенов считаются в базе (backend/usage.py): выборка сырых строк
+-- ai_usage обрезается лимитом max-rows PostgREST, и квота недосчитывалась.
+-- Страницы через p_limit/p_offset: ответ функции тоже режется max-rows
+CREATE OR REPLACE FUNCTION ai_usage_summary(since timestamptz, p_owner_id text DEFAULT NULL,
+                                            p_limit integer DEFAULT 1000, p_offset integer DEFAULT 0)
+RETURNS TABLE (owner_id text, feature text, calls bigint, prompt_tokens bigint, completion_tokens bigint) AS $$
+    SELECT u.owner_id, u.feature, count(*), COALESCE(sum(u.prompt_tokens), 0), COALESCE(sum(u.completion_tokens), 0)
+    FROM ai_usage u
+    WHERE u.created_at >= since AND (p_owner_id IS NULL OR u.owner_id = p_owner_id)
+    GROUP BY u.owner_id, u.feature
+    ORDER BY u.owner_id NULLS FIRST, u.feature
+    LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION ai_usage_total(p_owner_id text, since timestamptz) RETURNS bigint AS $$
+    SELECT COALESCE(sum(prompt_tokens + completion_tokens), 0)::bigint
+    FROM ai_usage WHERE owner_id = p_owner_id AND created_at >= since;
+$$ LANGUAGE sql STABLE;